@@ -91,7 +91,7 @@ def add_kochi_tenders():
                     origin_url, last_seen_at
                 ) VALUES (
                     %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                ) ON CONFLICT (tender_id) DO NOTHING
+                ) ON CONFLICT DO NOTHING
             """
             
             cursor.execute(insert_query, (
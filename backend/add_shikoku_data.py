@@ -130,7 +130,7 @@ def add_shikoku_tenders():
                         origin_url, last_seen_at
                     ) VALUES (
                         %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    ) ON CONFLICT (tender_id) DO NOTHING
+                    ) ON CONFLICT DO NOTHING
                 """
                 
                 cursor.execute(insert_query, (
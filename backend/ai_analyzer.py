@@ -1,9 +1,79 @@
 import os
+import time
 from typing import Dict, List
 import json
 
+from metrics import AI_FAILURES, AI_REQUEST_SECONDS, AI_TOKENS
+
+def parse_risk_analysis(analysis_text: str) -> Dict:
+    """リスク分析の応答（JSON、コードブロックで囲まれている場合あり）を解析する"""
+    # デフォルトの分析結果
+    analysis = {
+        "risk_factors": [],
+        "opportunities": [],
+        "strategic_advice": "",
+        "confidence_adjustment": 0
+    }
+
+    # JSONとして解析を試みる
+    try:
+        # ```json や ``` を除去
+        cleaned_text = analysis_text.strip()
+        if '```json' in cleaned_text:
+            json_start = cleaned_text.find('```json') + 7
+            json_end = cleaned_text.rfind('```')
+            if json_end > json_start:
+                cleaned_text = cleaned_text[json_start:json_end].strip()
+        elif cleaned_text.startswith('```'):
+            lines = cleaned_text.split('\n')
+            # 最初と最後の```を除去
+            if lines[0].strip() == '```' or lines[0].strip().startswith('```'):
+                lines = lines[1:]
+            if lines and (lines[-1].strip() == '```' or lines[-1].strip().startswith('```')):
+                lines = lines[:-1]
+            cleaned_text = '\n'.join(lines)
+
+        # JSONパース
+        parsed = json.loads(cleaned_text)
+
+        # 必要なキーが存在することを確認し、正しい型であることを確認
+        if isinstance(parsed, dict):
+            # リスク要因が配列であることを確認
+            if 'risk_factors' in parsed and isinstance(parsed['risk_factors'], list):
+                # 文字列のみを保持
+                parsed['risk_factors'] = [r for r in parsed['risk_factors'] if isinstance(r, str)]
+            # opportunitiesも同様に処理
+            if 'opportunities' in parsed and isinstance(parsed['opportunities'], list):
+                parsed['opportunities'] = [o for o in parsed['opportunities'] if isinstance(o, str)]
+            # strategic_adviceが文字列であることを確認
+            if 'strategic_advice' in parsed and not isinstance(parsed['strategic_advice'], str):
+                parsed['strategic_advice'] = str(parsed['strategic_advice'])
+            # confidence_adjustmentが数値であることを確認
+            if 'confidence_adjustment' in parsed:
+                try:
+                    parsed['confidence_adjustment'] = float(parsed['confidence_adjustment'])
+                except:
+                    parsed['confidence_adjustment'] = 0
+
+            analysis = parsed
+
+    except Exception as e:
+        # パースエラーの場合はデフォルト値を使用
+        print(f"AI response parsing error: {e}")
+        print(f"Raw response: {analysis_text[:500]}...")  # デバッグ用
+
+    return analysis
+
+
 class AIAnalyzer:
     def __init__(self):
+        if os.getenv('AI_ANALYZER_STUB', '').lower() in ('1', 'true', 'yes'):
+            # 負荷試験・オフライン開発用（Azure OpenAI に接続しない）
+            from ai_stub import StubChatClient
+            self.client = StubChatClient()
+            self.deployment_name = 'stub'
+            print("AI Analyzer initialized with stub client")
+            return
         try:
             from openai import AzureOpenAI
             
@@ -29,6 +99,23 @@ class AIAnalyzer:
             self.client = None
             self.deployment_name = None
     
+    def _chat(self, operation: str, **kwargs):
+        """chat.completions.create の呼び出し（所要時間・トークン数・失敗をメトリクスに記録）"""
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(model=self.deployment_name, **kwargs)
+        except Exception:
+            AI_FAILURES.inc(operation=operation)
+            raise
+        finally:
+            AI_REQUEST_SECONDS.observe(time.perf_counter() - start, operation=operation)
+        
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            AI_TOKENS.inc(usage.prompt_tokens or 0, operation=operation, kind='prompt')
+            AI_TOKENS.inc(usage.completion_tokens or 0, operation=operation, kind='completion')
+        return response
+    
     def analyze_bid_risks(self, tender: Dict, bid_amount: int, similar_awards: Dict, company_strengths: Dict) -> Dict:
         """AIを使用して詳細なリスク分析を行う"""
         
@@ -44,8 +131,8 @@ class AIAnalyzer:
         prompt = self._build_risk_analysis_prompt(tender, bid_amount, similar_awards, company_strengths)
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
+            response = self._chat(
+                'risk_analysis',
                 messages=[
                     {"role": "system", "content": "あなたは建設業界の入札分析専門家です。過去のデータと企業の実績から、入札のリスクと戦略を分析してください。"},
                     {"role": "user", "content": prompt}
@@ -57,62 +144,7 @@ class AIAnalyzer:
             # レスポンスの解析
             analysis_text = response.choices[0].message.content
             
-            # デフォルトの分析結果
-            analysis = {
-                "risk_factors": [],
-                "opportunities": [],
-                "strategic_advice": "",
-                "confidence_adjustment": 0
-            }
-            
-            # JSONとして解析を試みる
-            try:
-                # ```json や ``` を除去
-                cleaned_text = analysis_text.strip()
-                if '```json' in cleaned_text:
-                    json_start = cleaned_text.find('```json') + 7
-                    json_end = cleaned_text.rfind('```')
-                    if json_end > json_start:
-                        cleaned_text = cleaned_text[json_start:json_end].strip()
-                elif cleaned_text.startswith('```'):
-                    lines = cleaned_text.split('\n')
-                    # 最初と最後の```を除去
-                    if lines[0].strip() == '```' or lines[0].strip().startswith('```'):
-                        lines = lines[1:]
-                    if lines and (lines[-1].strip() == '```' or lines[-1].strip().startswith('```')):
-                        lines = lines[:-1]
-                    cleaned_text = '\n'.join(lines)
-                
-                # JSONパース
-                parsed = json.loads(cleaned_text)
-                
-                # 必要なキーが存在することを確認し、正しい型であることを確認
-                if isinstance(parsed, dict):
-                    # リスク要因が配列であることを確認
-                    if 'risk_factors' in parsed and isinstance(parsed['risk_factors'], list):
-                        # 文字列のみを保持
-                        parsed['risk_factors'] = [r for r in parsed['risk_factors'] if isinstance(r, str)]
-                    # opportunitiesも同様に処理
-                    if 'opportunities' in parsed and isinstance(parsed['opportunities'], list):
-                        parsed['opportunities'] = [o for o in parsed['opportunities'] if isinstance(o, str)]
-                    # strategic_adviceが文字列であることを確認
-                    if 'strategic_advice' in parsed and not isinstance(parsed['strategic_advice'], str):
-                        parsed['strategic_advice'] = str(parsed['strategic_advice'])
-                    # confidence_adjustmentが数値であることを確認
-                    if 'confidence_adjustment' in parsed:
-                        try:
-                            parsed['confidence_adjustment'] = float(parsed['confidence_adjustment'])
-                        except:
-                            parsed['confidence_adjustment'] = 0
-                    
-                    analysis = parsed
-                    
-            except Exception as e:
-                # パースエラーの場合はデフォルト値を使用
-                print(f"AI response parsing error: {e}")
-                print(f"Raw response: {analysis_text[:500]}...")  # デバッグ用
-            
-            return analysis
+            return parse_risk_analysis(analysis_text)
             
         except Exception as e:
             print(f"AI Analysis error: {e}")
@@ -245,8 +277,8 @@ class AIAnalyzer:
 """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
+            response = self._chat(
+                'recommendation',
                 messages=[
                     {"role": "system", "content": "建設業界の入札戦略アドバイザーとして、簡潔で実践的なアドバイスを提供してください。必ず指定されたフォーマットに従い、各セクションを完結させてください。文字数制限を守り、途中で切れないようにしてください。"},
                     {"role": "user", "content": prompt}
@@ -0,0 +1,66 @@
+"""
+Azure OpenAI のスタブ（負荷試験・オフライン開発用）
+
+AI_ANALYZER_STUB=1 のとき AIAnalyzer は AzureOpenAI クライアントの代わりにこのスタブを使う。
+chat.completions.create と同じ形の応答を、実際の API に近い待ち時間をおいて返す
+（ネットワークには接続しない）。
+
+- AI_STUB_LATENCY_MS: 1回あたりの平均待ち時間（既定 800ミリ秒、±50% で揺らす）
+- AI_STUB_ERROR_RATE: 例外を送出する割合（既定 0）
+"""
+import json
+import os
+import random
+import time
+from types import SimpleNamespace
+
+STUB_LATENCY_MS = float(os.getenv('AI_STUB_LATENCY_MS', '800'))
+STUB_ERROR_RATE = float(os.getenv('AI_STUB_ERROR_RATE', '0'))
+
+_RISK_ANALYSIS = {
+    "risk_factors": ["類似案件の落札率のばらつきが大きい", "競合他社の参加が見込まれる"],
+    "opportunities": ["同用途の施工実績がある", "地域での実績がある"],
+    "strategic_advice": "価格は類似案件の中央値付近に設定し、技術提案で差別化してください。",
+    "confidence_adjustment": 0
+}
+
+_RECOMMENDATION = "類似案件の落札額を踏まえた価格設定と、施工実績を強調した技術提案で入札準備を進めてください。"
+
+
+class StubAPIError(Exception):
+    """スタブが意図的に返す失敗"""
+
+
+class _Completions:
+    def __init__(self, latency_ms: float, error_rate: float):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+
+    def create(self, model=None, messages=(), max_tokens=None, **kwargs):
+        time.sleep(max(0.0, random.uniform(0.5, 1.5) * self.latency_ms / 1000))
+        if self.error_rate and random.random() < self.error_rate:
+            raise StubAPIError("Stubbed Azure OpenAI failure")
+
+        prompt = ''.join(message.get('content', '') for message in messages)
+        # リスク分析のプロンプトは JSON で回答させる
+        if 'risk_factors' in prompt:
+            content = json.dumps(_RISK_ANALYSIS, ensure_ascii=False)
+        else:
+            content = _RECOMMENDATION
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason='stop')],
+            usage=SimpleNamespace(
+                # 日本語はおおよそ1文字1トークン
+                prompt_tokens=len(prompt),
+                completion_tokens=len(content),
+                total_tokens=len(prompt) + len(content)
+            ),
+            model=model
+        )
+
+
+class StubChatClient:
+    """AzureOpenAI クライアントのうち chat.completions.create だけを持つスタブ"""
+
+    def __init__(self, latency_ms: float = STUB_LATENCY_MS, error_rate: float = STUB_ERROR_RATE):
+        self.chat = SimpleNamespace(completions=_Completions(latency_ms, error_rate))
@@ -1,15 +1,25 @@
 """
 認証・認可関連のユーティリティ
 """
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from database import get_db
+from http_cache import dataset_version
+from metrics import cache_result
 import models
 
 # 環境変数から取得（本番環境で必須）
@@ -20,16 +30,39 @@ if SECRET_KEY == "your-secret-key-change-this-in-production":
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24時間
 
+# 認証済み企業のキャッシュ有効期間（秒）。0 で無効
+# 他プロセス（バッチ・別ワーカー）での企業情報の変更は companies の data_versions で検知する（DATA_VERSION_TTL 秒以内）
+COMPANY_CACHE_TTL_SECONDS = float(os.getenv("AUTH_COMPANY_CACHE_TTL", "60"))
+# 署名検証済みトークンのキャッシュ件数（トークンの有効期限まで保持）。0 で無効
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+# パスワード検証（bcrypt、1回数百ミリ秒のCPU処理）を行うスレッド数
+PASSWORD_VERIFY_WORKERS = int(os.getenv("AUTH_PASSWORD_WORKERS", "2"))
+# 同じアカウントへの同時ログインで、検証待ちにできる件数（超えた分は 429）
+MAX_PENDING_LOGINS_PER_ACCOUNT = int(os.getenv("AUTH_MAX_PENDING_LOGINS", "3"))
+
 # パスワードハッシュ化のコンテキスト
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # HTTPベアラー認証
 security = HTTPBearer()
 
+# パスワード検証専用のスレッドプール（イベントループと DB 用のスレッドプールを塞がない）
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_VERIFY_WORKERS, thread_name_prefix='password-verify')
+
+# アカウント（メールアドレス）ごとの ログイン処理のロック と 待ち件数
+_login_locks: Dict[str, asyncio.Lock] = {}
+_login_pending: Dict[str, int] = {}
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """パスワードの検証"""
     return pwd_context.verify(plain_password, hashed_password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """パスワードの検証（専用スレッドプールで実行）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     """パスワードのハッシュ化"""
     return pwd_context.hash(password)
@@ -46,13 +79,111 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class _TokenCache:
+    """署名検証済みトークンのペイロードを有効期限まで保持する（LRU）"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._payloads: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            payload = self._payloads.get(token)
+            if payload is None:
+                return None
+            if payload.get("exp", 0) <= time.time():
+                del self._payloads[token]
+                return None
+            self._payloads.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict):
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        with self._lock:
+            self._payloads[token] = payload
+            self._payloads.move_to_end(token)
+            while len(self._payloads) > self.max_size:
+                self._payloads.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+
+
+class _CompanyCache:
+    """有効な企業の情報を company_id ごとに TTL 付きで保持する
+
+    保持するのはセッションから切り離したコピーのため、リクエストをまたいで共有しても遅延ロードは発生しない。
+    保持したときの companies の data_versions と現在の値が異なる場合は破棄する（他プロセスでの変更）
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._companies: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, company_id: int) -> Optional[models.Company]:
+        if self.ttl <= 0:
+            return None
+        version = dataset_version('companies')
+        with self._lock:
+            entry = self._companies.get(company_id)
+            if entry is None:
+                return None
+            expires_at, cached_version, company = entry
+            if expires_at <= time.monotonic() or cached_version != version:
+                del self._companies[company_id]
+                return None
+            return company
+
+    def put(self, company: models.Company, version: Optional[int] = None) -> models.Company:
+        """version は企業情報を読み込む前に dataset_version('companies') で取得した値"""
+        copy = models.Company(**{
+            column.key: getattr(company, column.key) for column in models.Company.__table__.columns
+        })
+        if self.ttl > 0:
+            with self._lock:
+                self._companies[company.id] = (time.monotonic() + self.ttl, version, copy)
+        return copy
+
+    def invalidate(self, company_id: Optional[int] = None):
+        """企業情報のキャッシュを破棄（company_id 省略時はすべて）"""
+        with self._lock:
+            if company_id is None:
+                self._companies.clear()
+            else:
+                self._companies.pop(company_id, None)
+
+
+token_cache = _TokenCache(TOKEN_CACHE_SIZE)
+company_cache = _CompanyCache(COMPANY_CACHE_TTL_SECONDS)
+
+
+def invalidate_company(company_id: Optional[int] = None):
+    """企業情報の変更・無効化時に呼ぶ（ORM 経由の更新・削除では自動で呼ばれる）"""
+    company_cache.invalidate(company_id)
+
+
+@event.listens_for(models.Company, "after_update")
+@event.listens_for(models.Company, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_company(target.id)
+
+
 def verify_token(token: str) -> dict:
     """トークンの検証"""
+    payload = token_cache.get(token)
+    cache_result('auth_token', payload is not None)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    token_cache.put(token, payload)
+    return payload
 
 async def get_current_company(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -79,7 +210,13 @@ async def get_current_company(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # データベースから企業情報を取得
+    # キャッシュになければデータベースから企業情報を取得
+    company = company_cache.get(company_id)
+    cache_result('auth_company', company is not None)
+    if company is not None:
+        return company
+    
+    version = dataset_version('companies')
     company = db.query(models.Company).filter(
         models.Company.id == company_id,
         models.Company.is_active == True
@@ -92,14 +229,17 @@ async def get_current_company(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return company
+    return company_cache.put(company, version)
 
-def authenticate_company(db: Session, email: str, password: str) -> Optional[models.Company]:
-    """企業の認証"""
-    company = db.query(models.Company).filter(
+def _find_active_company(db: Session, email: str) -> Optional[models.Company]:
+    return db.query(models.Company).filter(
         models.Company.email == email,
         models.Company.is_active == True
     ).first()
+
+def authenticate_company(db: Session, email: str, password: str) -> Optional[models.Company]:
+    """企業の認証"""
+    company = _find_active_company(db, email)
     
     if not company:
         return None
@@ -107,4 +247,41 @@ def authenticate_company(db: Session, email: str, password: str) -> Optional[mod
     if not verify_password(password, company.password_hash):
         return None
     
-    return company
\ No newline at end of file
+    return company
+
+@asynccontextmanager
+async def _account_login_guard(email: str):
+    """同じアカウントのログイン処理を1件ずつに制限し、待ちが多すぎる場合は 429 にする"""
+    key = email.strip().lower()
+    if _login_pending.get(key, 0) > MAX_PENDING_LOGINS_PER_ACCOUNT:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="ログイン要求が集中しています。しばらくしてから再度お試しください",
+        )
+    
+    lock = _login_locks.setdefault(key, asyncio.Lock())
+    _login_pending[key] = _login_pending.get(key, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _login_pending[key] -= 1
+        if _login_pending[key] == 0:
+            del _login_pending[key]
+            _login_locks.pop(key, None)
+
+async def authenticate_company_async(db: Session, email: str, password: str) -> Optional[models.Company]:
+    """企業の認証（async ルート用）
+
+    DB 検索はスレッドプール、パスワード検証は専用スレッドプールで実行し、イベントループを塞がない
+    """
+    async with _account_login_guard(email):
+        company = await run_in_threadpool(_find_active_company, db, email)
+        
+        if not company:
+            return None
+        
+        if not await verify_password_async(password, company.password_hash):
+            return None
+        
+        return company
\ No newline at end of file
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+落札実績CSV変換のベンチマーク（iterrows 版 と 列単位変換版 の比較）
+
+company_award_history.csv を --scale 倍に複製したデータで両方の変換を実行し、
+所要時間と結果が一致するかを出力する（DBには接続しない）
+
+使い方:
+    python benchmarks/bench_award_transform.py
+    python benchmarks/bench_award_transform.py --scale 1000 --repeat 3
+"""
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from load_company_awards import award_frame_to_rows, transform_award_frame
+
+DEFAULT_CSV = Path(__file__).resolve().parent.parent.parent / 'data' / 'raw' / 'company_award_history.csv'
+
+
+def legacy_rows(df):
+    """変更前の load_company_awards の変換（1行ずつ iterrows）"""
+    data = []
+    for _, row in df.iterrows():
+        award_date = None
+        if pd.notna(row.get('contract_date')):
+            try:
+                award_date = pd.to_datetime(row['contract_date']).date()
+            except:
+                pass
+
+        data.append((
+            row.get('tender_id'),
+            row.get('project_name'),
+            None,
+            row.get('prefecture'),
+            row.get('municipality'),
+            None,
+            row.get('use_type'),
+            row.get('bid_method', row.get('method')),
+            float(row.get('floor_area_m2', 0)) if pd.notna(row.get('floor_area_m2')) else None,
+            award_date,
+            row.get('contractor', '星田建設株式会社'),
+            int(row.get('contract_amount', 0)) if pd.notna(row.get('contract_amount')) else None,
+            int(row.get('estimated_price', 0)) if pd.notna(row.get('estimated_price')) else None,
+            float(row.get('win_rate', 0)) if pd.notna(row.get('win_rate')) else None,
+            int(row.get('participants_count', 0)) if pd.notna(row.get('participants_count')) else None,
+            float(row.get('evaluation_score', row.get('technical_score', 0))) if pd.notna(row.get('evaluation_score', row.get('technical_score'))) else None
+        ))
+    return data
+
+
+def vectorized_rows(df):
+    return award_frame_to_rows(transform_award_frame(df, default_contractor='星田建設株式会社'))
+
+
+def _normalize(value):
+    # 旧実装は文字列カラムの欠損値を NaN のまま渡していたため、比較時は None とみなす
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _best_of(func, df, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="落札実績CSV変換のベンチマーク")
+    parser.add_argument('--csv', default=str(DEFAULT_CSV), help="元のCSVファイル")
+    parser.add_argument('--scale', type=int, default=100, help="元データを複製する倍率")
+    parser.add_argument('--repeat', type=int, default=1, help="計測回数（最速値を採用）")
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.csv, encoding='utf-8-sig')
+    df = pd.concat([base] * args.scale, ignore_index=True)
+    print(f"Rows: {len(df):,} ({len(base):,} x {args.scale})")
+
+    legacy_seconds, legacy = _best_of(legacy_rows, df, args.repeat)
+    vector_seconds, vector = _best_of(vectorized_rows, df, args.repeat)
+
+    mismatches = sum(
+        1 for a, b in zip(legacy, vector)
+        if tuple(_normalize(v) for v in a) != tuple(_normalize(v) for v in b)
+    )
+
+    print(f"  iterrows   : {legacy_seconds:8.3f}s ({len(df) / legacy_seconds:>12,.0f} rows/sec)")
+    print(f"  vectorized : {vector_seconds:8.3f}s ({len(df) / vector_seconds:>12,.0f} rows/sec)")
+    print(f"  speedup    : {legacy_seconds / vector_seconds:.1f}x")
+    print(f"  mismatched rows: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+ログイン集中時の他エンドポイントの応答時間ベンチマーク
+
+起動中のAPIサーバーに対して、まず関係のないエンドポイント（既定: GET /）だけに
+一定並列でリクエストを送り続けて応答時間を測り（ベースライン）、
+次に同時ログイン（POST /auth/login）を流しながら同じ測定を行って p50 / p99 を比較する。
+
+パスワード検証（bcrypt）がイベントループ上で実行されていると、ログイン中は
+他のリクエストの応答が bcrypt 1回分（数百ミリ秒）単位で遅れる。
+パスワードが一致しない場合も検証は行われるため、ログインが成功するかどうかは問わない
+
+使い方:
+    uvicorn main:app --port 8000 &
+    python benchmarks/bench_login_latency.py
+    python benchmarks/bench_login_latency.py --logins 32 --duration 15 --email demo@example.com --password demo123
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from typing import List
+
+import httpx
+
+DEFAULT_EMAILS = ['admin@hoshida-kensetsu.co.jp', 'demo@demo-kensetsu.co.jp']
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def _probe(client, path, deadline, latencies, statuses):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] += 1
+
+
+async def _login(client, email, password, deadline, latencies, statuses):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post('/auth/login', json={'email': email, 'password': password})
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] += 1
+        if response.status_code == 429:
+            # 同じアカウントへの要求が多すぎて拒否された場合は、利用者の再試行と同程度に間をあける
+            await asyncio.sleep(1.0)
+
+
+async def run_phase(args, logins: int):
+    probe_latencies, login_latencies = [], []
+    probe_statuses, login_statuses = Counter(), Counter()
+    limits = httpx.Limits(max_connections=args.probes + logins + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        deadline = time.perf_counter() + args.duration
+        tasks = [_probe(client, args.probe_path, deadline, probe_latencies, probe_statuses)
+                 for _ in range(args.probes)]
+        tasks += [_login(client, args.email[i % len(args.email)], args.password, deadline,
+                         login_latencies, login_statuses)
+                  for i in range(logins)]
+        await asyncio.gather(*tasks)
+    return probe_latencies, probe_statuses, login_latencies, login_statuses
+
+
+def _report(label, latencies, statuses):
+    if not latencies:
+        print(f"  {label:<22}no requests completed")
+        return
+    codes = ', '.join(f"{code}×{count}" for code, count in sorted(statuses.items()))
+    print(f"  {label:<22}{len(latencies):>7,}  p50 {statistics.median(latencies):8.1f} ms  "
+          f"p99 {_percentile(latencies, 99):8.1f} ms  max {max(latencies):8.1f} ms  ({codes})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ログイン集中時の他エンドポイントの応答時間ベンチマーク")
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--probe-path', default='/', help="応答時間を測るエンドポイント")
+    parser.add_argument('--probes', type=int, default=4, help="測定用リクエストの並列数")
+    parser.add_argument('--logins', type=int, default=16, help="同時ログインの並列数")
+    parser.add_argument('--duration', type=float, default=10.0, help="各フェーズの秒数")
+    parser.add_argument('--email', action='append', help="ログインに使うメールアドレス（複数指定可）")
+    parser.add_argument('--password', default='password')
+    args = parser.parse_args()
+    args.email = args.email or DEFAULT_EMAILS
+
+    print(f"📊 {args.base_url}{args.probe_path}: {args.probes} probes, {args.duration:.0f}s per phase")
+
+    probe, probe_statuses, _, _ = asyncio.run(run_phase(args, logins=0))
+    print("\nBaseline (no logins)")
+    _report(f"GET {args.probe_path}", probe, probe_statuses)
+
+    probe_load, probe_load_statuses, login, login_statuses = asyncio.run(run_phase(args, logins=args.logins))
+    print(f"\nUnder {args.logins} concurrent logins")
+    _report(f"GET {args.probe_path}", probe_load, probe_load_statuses)
+    _report("POST /auth/login", login, login_statuses)
+
+    if probe and probe_load:
+        print(f"\np99 slowdown: ×{_percentile(probe_load, 99) / _percentile(probe, 99):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+大きなレスポンスのシリアライズ時間と転送量のベンチマーク
+
+/tenders/search（最大2000件）と /predict-bulk の応答データを DB から作り、
+- 変更前: response_model の検証 → jsonable_encoder → JSONResponse（標準の json）
+- 変更後: FastJSONResponse（orjson、検証・jsonable_encoder なし）
+のシリアライズ時間と、無圧縮・gzip・br での本文のバイト数を出力する
+
+使い方:
+    python benchmarks/bench_response_encoding.py
+    python benchmarks/bench_response_encoding.py --repeat 20 --prefecture 東京都
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from data_loader import DataLoader, format_search_results
+from http_responses import FastJSONResponse, brotli, compress
+from old_models import PredictionResponse
+from predictor import BidPredictor
+
+
+def _best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def bench(label, payload, adapter, repeat):
+    def before():
+        content = adapter.validate_python(payload) if adapter else payload
+        return JSONResponse(jsonable_encoder(content)).body
+
+    def after():
+        return FastJSONResponse(payload).body
+
+    before_time, before_body = _best_of(before, repeat)
+    after_time, after_body = _best_of(after, repeat)
+
+    print(f"\n{label}")
+    print(f"  {'':<10}{'time':>12}{'raw':>12}{'gzip':>12}{'br':>12}")
+    for name, elapsed, body in (('before', before_time, before_body), ('after', after_time, after_body)):
+        br = f"{len(compress(body, 'br')):,}" if brotli is not None else '-'
+        print(f"  {name:<10}{elapsed * 1000:>9.1f} ms{len(body):>12,}{len(compress(body, 'gzip')):>12,}{br:>12}")
+    print(f"  speedup ×{before_time / after_time:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大きなレスポンスのシリアライズ時間と転送量のベンチマーク")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--prefecture', default=None, help="一括予測の対象都道府県")
+    parser.add_argument('--company', default='星田建設株式会社')
+    args = parser.parse_args()
+
+    data_loader = DataLoader(preload=False)
+    predictor = BidPredictor(data_loader, use_ai=False)
+
+    search_results = format_search_results(data_loader.search_tenders({}))
+    bulk_params = {'prefecture': args.prefecture} if args.prefecture else {}
+    bulk_results = predictor.predict_bulk(bulk_params, 90, args.company, use_ratio=True)
+
+    print(f"📊 /tenders/search: {len(search_results):,} rows, /predict-bulk: {len(bulk_results):,} predictions "
+          f"(best of {args.repeat})")
+    bench('/tenders/search', search_results, None, args.repeat)
+    bench('/predict-bulk', bulk_results, TypeAdapter(List[PredictionResponse]), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
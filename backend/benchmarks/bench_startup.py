@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+起動時間のベンチマーク
+
+1. `python -X importtime -c "import main"` を --repeat 回実行し、main の import にかかる時間
+   （中央値）と、累積時間の大きいモジュールの上位 --top 件を出力する
+2. --serve を指定した場合は uvicorn を起動し、プロセスの開始から /health/live と /health/ready が
+   200 を返すまでの時間を計測する（ウォームアップでの DB からの読み込みを含む）
+
+import 時に重い処理（全データの読み込み、openai・pandas の import）が入り込んでいないかの確認に使う
+
+使い方:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --top 15 --serve --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# import 時に読み込まれていないことを確認するモジュール（ウォームアップ・初回利用時に読み込む）
+DEFERRED_MODULES = ('openai', 'pandas')
+
+
+def measure_import(env: Dict[str, str]) -> Dict[str, int]:
+    """main の import を1回実行し、トップレベルのモジュールごとの累積時間（µs）を返す"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=str(BACKEND_DIR), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        _, total, indent, module = match.groups()
+        # 同じモジュールは1回しか import されないので、名前をキーにして累積時間を持つ
+        cumulative[module] = int(total)
+    return cumulative
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, process: subprocess.Popen, start: float, timeout: float) -> Optional[float]:
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def measure_serve(env: Dict[str, str], timeout: float) -> Dict:
+    """uvicorn を起動し、/health/live と /health/ready が 200 を返すまでの秒数を返す"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=str(BACKEND_DIR), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        live = _wait_for(f"{base_url}/health/live", process, start, timeout)
+        ready = _wait_for(f"{base_url}/health/ready", process, start, timeout)
+        steps = httpx.get(f"{base_url}/health/ready", timeout=5).json().get('steps') if ready else None
+        return {'live_seconds': live, 'ready_seconds': ready, 'steps': steps}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="main の import 時間と、起動から live/ready までの時間を計測")
+    parser.add_argument('--repeat', type=int, default=5, help="import を計測する回数（中央値を出力）")
+    parser.add_argument('--top', type=int, default=10, help="出力する累積時間の大きいモジュールの数")
+    parser.add_argument('--serve', action='store_true', help="uvicorn を起動して live/ready までの時間も計測")
+    parser.add_argument('--timeout', type=float, default=300, help="--serve で ready を待つ最大秒数")
+    parser.add_argument('--output', help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        parser.error("DATABASE_URL is not set")
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+
+    runs: List[Dict[str, int]] = [measure_import(env) for _ in range(args.repeat)]
+    modules = {module for run in runs for module in run}
+    median_us = {
+        module: int(statistics.median(run.get(module, 0) for run in runs))
+        for module in modules
+    }
+
+    print(f"\nimport main: {median_us['main'] / 1000:.0f} ms (median of {args.repeat})")
+    print(f"  {'module':<40}{'cumulative':>14}")
+    top = sorted((m for m in modules if m != 'main'), key=lambda m: median_us[m], reverse=True)
+    for module in top[:args.top]:
+        print(f"  {module:<40}{median_us[module] / 1000:>11.1f} ms")
+
+    deferred = [module for module in DEFERRED_MODULES if module in modules]
+    if deferred:
+        print(f"⚠️ Imported while importing main: {', '.join(deferred)}")
+    else:
+        print(f"✅ Not imported at import time: {', '.join(DEFERRED_MODULES)}")
+
+    report = {
+        'import_main_ms': median_us['main'] / 1000,
+        'top_modules_ms': {module: median_us[module] / 1000 for module in top[:args.top]},
+        'deferred_imported': deferred,
+    }
+
+    if args.serve:
+        serve = measure_serve(env, args.timeout)
+        report['serve'] = serve
+        print(f"\nuvicorn start → /health/live : {serve['live_seconds']:.2f}s" if serve['live_seconds'] is not None
+              else "\nuvicorn start → /health/live : timed out")
+        if serve['ready_seconds'] is not None:
+            print(f"uvicorn start → /health/ready: {serve['ready_seconds']:.2f}s")
+            for name, step in (serve['steps'] or {}).items():
+                print(f"  {name:<20}{step.get('state'):<10}{step.get('seconds') or 0:>8.2f}s")
+        else:
+            print("uvicorn start → /health/ready: timed out")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📝 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
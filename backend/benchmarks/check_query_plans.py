@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+DataLoader の主要クエリの実行計画チェック
+
+data_loader.py が発行するクエリと同じ条件を EXPLAIN し、Seq Scan が含まれていれば失敗（終了コード1）にする。
+シードしたローカルDBは件数が少なく、インデックスがあってもプランナーが Seq Scan を選ぶため、
+enable_seqscan = off で実行する（それでも Seq Scan になるのは使えるインデックスがない場合）
+
+パラメータは DB 内の実データから選ぶため、seed_data.py や ETL で投入済みのDBに対して実行する
+
+使い方:
+    python benchmarks/check_query_plans.py
+    python benchmarks/check_query_plans.py --verbose     # 実行計画も表示
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# (名前, SQL) — 条件・並び順は data_loader.py の各メソッドと同じ
+HOT_QUERIES = [
+    ('get_similar_awards (all conditions)', """
+        SELECT * FROM awards
+        WHERE prefecture_code = %(prefecture_code)s AND use_type_code = %(use_type_code)s
+        AND bid_method_code = %(bid_method_code)s
+        AND floor_area_m2 BETWEEN %(area_min)s AND %(area_max)s
+        AND estimated_price BETWEEN %(price_min)s AND %(price_max)s
+    """),
+    ('get_similar_awards (prefecture, use_type)', """
+        SELECT * FROM awards WHERE prefecture_code = %(prefecture_code)s AND use_type_code = %(use_type_code)s
+    """),
+    ('get_similar_awards (floor area range)', """
+        SELECT * FROM awards WHERE floor_area_m2 BETWEEN %(area_min)s AND %(area_max)s
+    """),
+    ('get_similar_awards (contract amount range)', """
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY contractor_code ORDER BY ABS(contract_amount - %(price)s)) AS rn
+        FROM awards WHERE contract_amount BETWEEN %(price_min)s AND %(price_max)s
+    """),
+    ('get_company_strengths', """
+        SELECT COUNT(*), AVG(contract_amount) FROM awards WHERE contractor_code = %(contractor_code)s
+    """),
+    ('load_all_data (upcoming tenders)', """
+        SELECT tender_id, title, bid_date FROM tenders_open
+        WHERE bid_date >= CURRENT_DATE ORDER BY bid_date
+    """),
+    ('search_tenders (prefecture)', """
+        SELECT * FROM tenders_open
+        WHERE tender_id NOT LIKE 'tender_id%%' AND prefecture_code = %(prefecture_code)s
+        ORDER BY bid_date LIMIT 2000
+    """),
+    ('get_tender_by_id', """
+        SELECT * FROM tenders_open WHERE tender_id = %(tender_id)s
+    """),
+    ('get_filter_options', """
+        SELECT DISTINCT prefecture FROM (
+            SELECT prefecture FROM tenders_open WHERE prefecture IS NOT NULL ORDER BY bid_date DESC LIMIT 1000
+        ) t
+    """),
+    ('company awards list', """
+        SELECT * FROM company_awards WHERE company_id = %(company_id)s ORDER BY award_date DESC LIMIT 100
+    """),
+]
+
+
+def sample_parameters(cursor) -> Dict:
+    """クエリのパラメータを投入済みのデータから選ぶ"""
+    cursor.execute("""
+        SELECT prefecture_code, use_type_code, bid_method_code, floor_area_m2, estimated_price, contractor_code
+        FROM awards
+        WHERE prefecture_code IS NOT NULL AND use_type_code IS NOT NULL AND bid_method_code IS NOT NULL
+        AND floor_area_m2 IS NOT NULL AND estimated_price IS NOT NULL
+        LIMIT 1
+    """)
+    award = cursor.fetchone()
+    if award is None:
+        raise RuntimeError("awards is empty; seed the database first (python seed_data.py)")
+
+    cursor.execute("SELECT tender_id FROM tenders_open WHERE bid_date >= CURRENT_DATE LIMIT 1")
+    tender = cursor.fetchone()
+    cursor.execute("SELECT company_id FROM company_awards LIMIT 1")
+    company = cursor.fetchone()
+
+    area = float(award['floor_area_m2'])
+    price = int(award['estimated_price'])
+    return {
+        'prefecture_code': award['prefecture_code'],
+        'use_type_code': award['use_type_code'],
+        'bid_method_code': award['bid_method_code'],
+        'contractor_code': award['contractor_code'],
+        'area_min': area * 0.7,
+        'area_max': area * 1.3,
+        'price': price,
+        'price_min': int(price * 0.8),
+        'price_max': int(price * 1.2),
+        'tender_id': tender['tender_id'] if tender else '',
+        'company_id': company['company_id'] if company else 0,
+    }
+
+
+def seq_scans(plan: Dict) -> List[str]:
+    """実行計画に含まれる Seq Scan の対象テーブル"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name', '?'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def check_plans(conn, verbose: bool = False) -> int:
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    params = sample_parameters(cursor)
+    cursor.execute("SET enable_seqscan = off")
+
+    failures = 0
+    for name, query in HOT_QUERIES:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cursor.fetchone()['QUERY PLAN']
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scanned = seq_scans(plan[0]['Plan'])
+        if scanned:
+            failures += 1
+            print(f"  ❌ {name:<46}Seq Scan on {', '.join(sorted(set(scanned)))}")
+        else:
+            print(f"  ✅ {name}")
+        if verbose or scanned:
+            cursor.execute("EXPLAIN " + query, params)
+            for row in cursor.fetchall():
+                print(f"       {row['QUERY PLAN']}")
+    cursor.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DataLoader の主要クエリの実行計画チェック")
+    parser.add_argument('--verbose', action='store_true', help="すべてのクエリの実行計画を表示")
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), help="既定は環境変数 DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    conn = psycopg2.connect(args.database_url)
+    try:
+        print(f"🔍 Checking {len(HOT_QUERIES)} query plans")
+        failures = check_plans(conn, verbose=args.verbose)
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"\n❌ {failures} queries use sequential scans")
+        sys.exit(1)
+    print("\n✅ No sequential scans")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+予測・検索のホットパスのマイクロベンチマーク
+
+DBから記録したフィクスチャ（benchmarks/fixtures/microbench.json.gz）を入力に、関数ごとの
+1回あたりの処理時間を測り、保存済みのベースライン（benchmarks/baselines.json）と比較する。
+ベースラインより --threshold（既定 25%）以上遅い関数があれば終了コード 1 を返す。
+計測にはDB・APIサーバー・Azure OpenAI は不要
+
+対象:
+- BidPredictor._calculate_prediction / _generate_basis / _generate_judgment_reason / _get_similar_cases_details
+- ai_analyzer.parse_risk_analysis（コードブロックの除去とJSONの解析）
+- data_loader.format_search_results（/tenders/search の応答整形）
+- csv_validation.read_award_csv + validate_award_frame（アップロードCSVの行の変換・検証）
+
+ベースラインは計測したマシンに依存するため、比較は同じマシン（CI のランナー等）で記録したものと行う
+
+使い方:
+    python benchmarks/microbench.py record              # DBからフィクスチャを記録（DATABASE_URL が必要）
+    python benchmarks/microbench.py run                 # 計測してベースラインと比較
+    python benchmarks/microbench.py run --filter predictor --threshold 0.1
+    python benchmarks/microbench.py run --update-baselines
+"""
+import argparse
+import csv
+import decimal
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BENCH_DIR = Path(__file__).resolve().parent
+FIXTURE_PATH = BENCH_DIR / 'fixtures' / 'microbench.json.gz'
+BASELINE_PATH = BENCH_DIR / 'baselines.json'
+
+DEFAULT_THRESHOLD = float(os.getenv('MICROBENCH_THRESHOLD', '0.25'))
+COMPANY_NAME = '星田建設株式会社'
+# 入札額（予定価格比）: ランク A〜E の分岐をすべて通す
+BID_RATIOS = (0.70, 0.85, 0.93, 0.98, 1.03, 1.10)
+
+
+# --- フィクスチャの記録 ----------------------------------------------------
+
+def _json_default(obj):
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _risk_analysis_texts() -> List[str]:
+    """モデルが返す形式のばらつき（素のJSON・```json・```）"""
+    analysis = {
+        "risk_factors": ["類似案件の落札率のばらつきが大きい", "競合他社の参加が見込まれる", "工期が短い"],
+        "opportunities": ["同用途の施工実績がある", "地域での実績がある"],
+        "strategic_advice": "価格は類似案件の中央値付近に設定し、技術提案で差別化してください。",
+        "confidence_adjustment": "0.05"
+    }
+    text = json.dumps(analysis, ensure_ascii=False, indent=2)
+    return [text, f"```json\n{text}\n```", f"```\n{text}\n```", f"分析結果は以下の通りです。\n```json\n{text}\n```\n以上"]
+
+
+def record(args):
+    import psycopg2
+    from csv_validation import AWARD_COLUMNS
+    from data_loader import DataLoader
+
+    rng = random.Random(args.seed)
+    data_loader = DataLoader(preload=False)
+
+    search_results = data_loader.search_tenders({})
+    search_sample = rng.sample(search_results, min(args.search_rows, len(search_results)))
+
+    cases = []
+    candidates = [r for r in search_results if r.get('estimated_price')]
+    for row in rng.sample(candidates, min(args.tenders, len(candidates))):
+        tender = data_loader.get_tender_by_id(row['tender_id'])
+        if not tender:
+            continue
+        similar_awards = data_loader.get_similar_awards(
+            prefecture=tender['prefecture'],
+            use_type=tender['use_type'],
+            floor_area=tender.get('floor_area_m2'),
+            bid_method=tender['bid_method'],
+            estimated_price=tender['estimated_price']
+        )
+        cases.append({'tender': tender, 'similar_awards': similar_awards})
+    company_strengths = data_loader.get_company_strengths(COMPANY_NAME)
+
+    conn = psycopg2.connect(data_loader.db_connection_str)
+    try:
+        cursor = conn.cursor()
+        # CSVと同じく文字列で（欠損は空文字）
+        columns = ', '.join(f"COALESCE({column}::text, '')" for column in AWARD_COLUMNS)
+        cursor.execute(f"SELECT {columns} FROM company_awards ORDER BY id LIMIT %s", (args.csv_rows,))
+        csv_rows = [list(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+    fixture = {
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'cases': cases,
+        'company_strengths': company_strengths,
+        'search_results': search_sample,
+        'risk_analysis_texts': _risk_analysis_texts(),
+        'csv_columns': AWARD_COLUMNS,
+        'csv_rows': csv_rows,
+    }
+    FIXTURE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(FIXTURE_PATH, 'wt', encoding='utf-8') as f:
+        json.dump(fixture, f, ensure_ascii=False, default=_json_default)
+    print(f"💾 Recorded {len(cases)} tenders, {len(search_sample)} search rows, {len(csv_rows)} CSV rows "
+          f"to {FIXTURE_PATH} ({FIXTURE_PATH.stat().st_size:,} bytes)")
+
+
+def load_fixture() -> Dict:
+    with gzip.open(FIXTURE_PATH, 'rt', encoding='utf-8') as f:
+        fixture = json.load(f)
+    # 検索結果の日付はDBから読んだときと同じ date 型に戻す
+    for row in fixture['search_results']:
+        for key in ('bid_date', 'notice_date'):
+            if row.get(key):
+                row[key] = date.fromisoformat(row[key])
+    return fixture
+
+
+# --- ベンチマーク ----------------------------------------------------------
+
+def build_benchmarks(fixture: Dict) -> Dict[str, Tuple[Callable, Callable]]:
+    """名前 -> (setup, func)。setup() の戻り値を引数に func を呼んだ時間だけを計測する"""
+    from ai_analyzer import parse_risk_analysis
+    from csv_validation import read_award_csv, validate_award_frame
+    from data_loader import format_search_results
+    from predictor import BidPredictor
+
+    predictor = BidPredictor(data_loader=None, use_ai=False, mode='rule')
+    strengths = fixture['company_strengths']
+    inputs = [(int(case['tender']['estimated_price'] * ratio), case['tender'], case['similar_awards'])
+              for case in fixture['cases'] for ratio in BID_RATIOS]
+    predictions = [predictor._calculate_prediction(bid, tender, awards, strengths)
+                   for bid, tender, awards in inputs]
+
+    def no_setup():
+        return ()
+
+    def calculate_prediction():
+        for bid, tender, awards in inputs:
+            predictor._calculate_prediction(bid, tender, awards, strengths)
+
+    def generate_basis():
+        for bid, tender, awards in inputs:
+            predictor._generate_basis(bid, tender, awards)
+
+    def judgment_reason():
+        for (bid, tender, awards), (rank, win_prob, _) in zip(inputs, predictions):
+            predictor._generate_judgment_reason(rank, win_prob, bid, tender, awards, strengths)
+
+    def similar_cases_details():
+        for case in fixture['cases']:
+            predictor._get_similar_cases_details(case['similar_awards'])
+
+    def parse_analysis():
+        for text in fixture['risk_analysis_texts']:
+            parse_risk_analysis(text)
+
+    search_results = fixture['search_results']
+
+    def search_setup():
+        # 整形はその場で書き換えるため、毎回複製したものを渡す
+        return ([dict(row) for row in search_results],)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fixture['csv_columns'])
+    writer.writerows(fixture['csv_rows'])
+    csv_bytes = buffer.getvalue().encode('utf-8')
+
+    def csv_conversion():
+        validate_award_frame(read_award_csv(io.BytesIO(csv_bytes)))
+
+    return {
+        'predictor._calculate_prediction': (no_setup, calculate_prediction),
+        'predictor._generate_basis': (no_setup, generate_basis),
+        'predictor._generate_judgment_reason': (no_setup, judgment_reason),
+        'predictor._get_similar_cases_details': (no_setup, similar_cases_details),
+        'ai_analyzer.parse_risk_analysis': (no_setup, parse_analysis),
+        'data_loader.format_search_results': (search_setup, format_search_results),
+        'csv_validation.validate_award_csv': (no_setup, csv_conversion),
+    }
+
+
+def measure(setup: Callable, func: Callable, repeat: int, min_time: float) -> float:
+    """1回あたりの処理時間（秒）。min_time 秒以上かかる回数を repeat 回計測し、最も速い回の平均を返す"""
+    def run(number):
+        total = 0.0
+        for _ in range(number):
+            args = setup()
+            start = time.perf_counter()
+            func(*args)
+            total += time.perf_counter() - start
+        return total
+
+    number = 1
+    while True:
+        elapsed = run(number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    return min(run(number) for _ in range(repeat)) / number
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def run_benchmarks(args) -> int:
+    if not FIXTURE_PATH.exists():
+        print(f"❌ Fixture not found: {FIXTURE_PATH} (run 'microbench.py record' first)")
+        return 2
+    fixture = load_fixture()
+    benchmarks = build_benchmarks(fixture)
+    if args.filter:
+        benchmarks = {name: bench for name, bench in benchmarks.items() if args.filter in name}
+
+    baselines = {}
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baselines = json.load(f)
+    baseline_times = baselines.get('benchmarks', {})
+    if baselines.get('meta', {}).get('machine') not in (None, platform.machine()):
+        print(f"⚠️ Baselines were recorded on {baselines['meta']['machine']}, this is {platform.machine()}")
+
+    print(f"{'benchmark':<42}{'time':>12}{'baseline':>12}{'change':>9}")
+    results, regressions = {}, []
+    for name, (setup, func) in benchmarks.items():
+        seconds = measure(setup, func, args.repeat, args.min_time)
+        results[name] = seconds
+        baseline = baseline_times.get(name)
+        if baseline:
+            change = seconds / baseline - 1
+            flag = ''
+            if change > args.threshold:
+                regressions.append(name)
+                flag = '  ❌'
+            print(f"{name:<42}{_format_time(seconds):>12}{_format_time(baseline):>12}{change:>+9.1%}{flag}")
+        else:
+            print(f"{name:<42}{_format_time(seconds):>12}{'-':>12}{'':>9}")
+
+    if args.update_baselines:
+        baseline_times.update(results)
+        baselines = {
+            'meta': {
+                'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'processor': platform.processor() or None,
+            },
+            'benchmarks': dict(sorted(baseline_times.items())),
+        }
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"\n💾 Baselines written to {BASELINE_PATH}")
+        return 0
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="予測・検索のホットパスのマイクロベンチマーク")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = sub.add_parser('record', help="DBからフィクスチャを記録する")
+    record_parser.add_argument('--tenders', type=int, default=20)
+    record_parser.add_argument('--search-rows', type=int, default=500)
+    record_parser.add_argument('--csv-rows', type=int, default=2000)
+    record_parser.add_argument('--seed', type=int, default=42)
+
+    run_parser = sub.add_parser('run', help="計測してベースラインと比較する")
+    run_parser.add_argument('--filter', default=None, help="名前にこの文字列を含むベンチマークだけを実行")
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--min-time', type=float, default=0.2, help="1回の計測の最低秒数")
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="ベースラインからの許容する遅れ（0.25 = 25%%）")
+    run_parser.add_argument('--update-baselines', action='store_true', help="計測結果をベースラインとして保存")
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args)
+    else:
+        sys.exit(run_benchmarks(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+tenders_open への高速一括投入
+
+行データを COPY FROM STDIN で一時ステージングテーブルに流し込み、
+INSERT ... SELECT ... ON CONFLICT の1文で tenders_open にマージする。
+大量投入時はセカンダリインデックスを一旦削除し、投入後に再作成できる。
+"""
+import csv
+import io
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import psycopg2
+
+from dimensions import encode_stage
+
+# tenders_open の投入対象カラム（JSONのキーとの対応は tender_to_row を参照）
+TENDER_COLUMNS = [
+    'tender_id', 'source', 'publisher', 'title', 'prefecture', 'municipality',
+    'address_text', 'use_type', 'method', 'jv_allowed', 'floor_area_m2',
+    'bid_date', 'notice_date', 'estimated_price_jpy', 'minimum_price_jpy',
+    'origin_url', 'last_seen_at'
+]
+
+
+def tender_to_row(item: Dict) -> Tuple:
+    """案件JSONの1レコードを TENDER_COLUMNS 順のタプルに変換"""
+    return (
+        item.get('tender_id'),
+        item.get('source'),
+        item.get('publisher'),
+        item.get('title'),
+        item.get('prefecture'),
+        item.get('municipality'),
+        item.get('address_text'),
+        item.get('use'),
+        item.get('method'),
+        item.get('jv_allowed', False),
+        item.get('floor_area_m2'),
+        item.get('bid_date'),
+        item.get('notice_date'),
+        item.get('estimated_price_jpy'),
+        item.get('minimum_price_jpy'),
+        item.get('origin_url'),
+        item.get('last_seen_at')
+    )
+
+
+_BID_DATE_INDEX = TENDER_COLUMNS.index('bid_date')
+
+
+def partitioned_tender_row(item: Dict) -> Tuple:
+    """tender_to_row と同じ変換で、bid_date のないレコードは ValueError
+
+    tenders_open は bid_date で月別にパーティション分割されており、主キーに bid_date を含む
+    """
+    row = tender_to_row(item)
+    if row[_BID_DATE_INDEX] is None:
+        raise ValueError(f"bid_date is missing: {row[0]}")
+    return row
+
+
+class CopyRowStream:
+    """行のイテレータを COPY ... FORMAT csv 用のファイルライクオブジェクトとして読み出す
+
+    psycopg2 の copy_expert は read(size) を繰り返し呼ぶため、
+    全行を一度にメモリ上の文字列にすることなく送信できる
+    """
+
+    def __init__(self, rows: Iterable[Tuple]):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+        self.row_count = 0
+
+    def _encode_row(self, row):
+        # None も空文字も空欄になり、COPY ... FORMAT csv では NULL として投入される
+        # （空文字の値は NULL と区別されない。空欄の数値・日付も NULL になる）
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        self._writer.writerow(['' if v is None else v for v in row])
+        return self._buffer.getvalue()
+
+    def read(self, size=-1):
+        chunks = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            line = self._encode_row(row)
+            chunks.append(line)
+            length += len(line)
+            self.row_count += 1
+
+        data = ''.join(chunks)
+        if size < 0 or len(data) <= size:
+            self._pending = ''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def copy_rows(cursor, table: str, columns: List[str], rows: Iterable[Tuple]) -> int:
+    """行データを COPY FROM STDIN でテーブルに流し込み、行数を返す（None・空文字は NULL になる）"""
+    stream = CopyRowStream(rows)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        stream,
+        size=65536
+    )
+    return stream.row_count
+
+
+def copy_frame(cursor, table: str, frame, columns: List[str] = None) -> int:
+    """DataFrame を COPY FROM STDIN でテーブルに流し込み、行数を返す
+
+    文字列の空文字は空文字のまま投入される。数値・日付カラムの欠損値は NULL になるが、
+    文字列カラム（dtype が object）の欠損値は QUOTE_NONNUMERIC で "" と書かれるため空文字になる
+    """
+    columns = columns or list(frame.columns)
+    buffer = io.StringIO()
+    frame[columns].to_csv(buffer, header=False, index=False, date_format='%Y-%m-%d',
+                          quoting=csv.QUOTE_NONNUMERIC)
+    buffer.seek(0)
+    # QUOTE_NONNUMERIC では数値・日付カラムの欠損値も "" になるため、文字列以外のカラムは NULL として読む
+    force_null = [c for c in columns if frame[c].dtype != object]
+    options = f", FORCE_NULL ({', '.join(force_null)})" if force_null else ''
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv{options})",
+        buffer,
+        size=65536
+    )
+    return len(frame)
+
+
+def drop_secondary_indexes(cursor, table: str) -> List[str]:
+    """主キー・一意制約以外のインデックスを削除し、再作成用の定義を返す"""
+    cursor.execute("""
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = current_schema()
+        AND i.tablename = %s
+        AND i.indexname NOT IN (
+            SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+        )
+    """, (table, table))
+    indexes = cursor.fetchall()
+
+    definitions = []
+    for row in indexes:
+        name, definition = (row['indexname'], row['indexdef']) if isinstance(row, dict) else row
+        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+        definitions.append(definition)
+    return definitions
+
+
+def rebuild_indexes(cursor, definitions: List[str]):
+    """drop_secondary_indexes で削除したインデックスを再作成"""
+    for definition in definitions:
+        cursor.execute(definition)
+
+
+def delete_moved_rows(cursor, table: str, source: str, key_column: str, partition_column: str) -> int:
+    """source と同じキーで partition_column の値が変わった行を本テーブルから削除し、件数を返す
+
+    パーティションキーを含む複合主キー（tenders_open の (tender_id, bid_date)）では、
+    bid_date が変わった案件を投入すると旧パーティションの行が残り、同じ tender_id が2行になる。
+    source はテーブル名または副問い合わせ（キーごとに1行であること）
+    """
+    cursor.execute(f"""
+        DELETE FROM {table} t
+        USING {source} s
+        WHERE t.{key_column} = s.{key_column}
+        AND t.{partition_column} IS DISTINCT FROM s.{partition_column}
+    """)
+    return cursor.rowcount
+
+
+def stage_and_merge(cursor, table: str, columns: List[str], rows: Iterable[Tuple],
+                    conflict_column: str, partition_column: str = None) -> Tuple[int, int]:
+    """一時ステージングテーブルへ COPY し、ON CONFLICT DO NOTHING で本テーブルにマージ
+
+    呼び出し側のトランザクション内で実行される（ステージングテーブルはコミット時に削除）。
+    衝突判定は本テーブルの一意制約すべてが対象（パーティションテーブルの複合主キーにも対応）。
+    ステージ内で重複するキーは後のレコードを優先する。
+    partition_column を指定した場合、その値が変わったキーの既存行は削除してから投入する
+
+    Returns:
+        (ステージ件数, 投入件数)
+    """
+    stage_table = f"{table}_stage"
+    # _seq は COPY での投入順（encode_stage の UPDATE で ctid は並び替わるため、順序はこれで判定する）
+    cursor.execute(f"""
+        CREATE TEMP TABLE {stage_table}
+        (LIKE {table} INCLUDING DEFAULTS, _seq bigserial)
+        ON COMMIT DROP
+    """)
+    staged = copy_rows(cursor, stage_table, columns, rows)
+
+    # カテゴリ値の整数コードをステージ上で埋めてから一緒にマージする
+    columns = columns + encode_stage(cursor, table, stage_table, columns)
+
+    # ステージ内で重複するキーは投入順で最後の1件にまとめる
+    column_list = ', '.join(columns)
+    latest = f"""(
+        SELECT DISTINCT ON ({conflict_column}) {column_list}
+        FROM {stage_table}
+        WHERE {conflict_column} IS NOT NULL
+        ORDER BY {conflict_column}, _seq DESC
+    )"""
+    if partition_column:
+        delete_moved_rows(cursor, table, latest, conflict_column, partition_column)
+
+    cursor.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {latest} s
+        ON CONFLICT DO NOTHING
+    """)
+    return staged, cursor.rowcount
+
+
+def copy_tenders(conn, records: Iterable[Dict], drop_indexes: bool = False) -> Dict:
+    """案件レコードを COPY + ON CONFLICT で tenders_open に一括投入
+
+    Args:
+        conn: psycopg2 接続（処理全体を1トランザクションでコミットする）
+        records: 案件JSONレコードのイテレータ
+        drop_indexes: Trueの場合、投入前にセカンダリインデックスを削除し投入後に再作成
+
+    Returns:
+        ステージ件数・投入件数・各段階の所要時間
+    """
+    stats = {'staged': 0, 'inserted': 0, 'rejected': 0}
+    start_time = time.time()
+    cursor = conn.cursor()
+
+    try:
+        index_definitions = []
+        if drop_indexes:
+            index_definitions = drop_secondary_indexes(cursor, 'tenders_open')
+
+        def rows():
+            for item in records:
+                try:
+                    yield partitioned_tender_row(item)
+                except ValueError:
+                    stats['rejected'] += 1
+
+        stats['staged'], stats['inserted'] = stage_and_merge(
+            cursor, 'tenders_open', TENDER_COLUMNS, rows(), 'tender_id', partition_column='bid_date'
+        )
+        stats['load_seconds'] = time.time() - start_time
+
+        if index_definitions:
+            index_start = time.time()
+            rebuild_indexes(cursor, index_definitions)
+            stats['index_seconds'] = time.time() - index_start
+            stats['rebuilt_indexes'] = len(index_definitions)
+
+        cursor.execute("ANALYZE tenders_open")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    stats['elapsed_seconds'] = time.time() - start_time
+    stats['rows_per_second'] = stats['staged'] / stats['elapsed_seconds'] if stats['elapsed_seconds'] > 0 else 0
+    return stats
+
+
+def insert_tenders_rowwise(conn, records: Iterable[Dict], commit_every: int = 5000) -> Dict:
+    """案件レコードを1件ずつ SAVEPOINT を切って tenders_open に投入（copy_tenders が失敗した場合の代替）
+
+    COPY は1件でも型・長さの合わないレコードがあると全体が失敗するため、
+    そのようなレコードはスキップして件数を数える。commit_every 件ごとにコミットする
+
+    Returns:
+        投入件数・スキップした件数
+    """
+    stats = {'inserted': 0, 'rejected': 0}
+    insert_query = f"""
+        INSERT INTO tenders_open ({', '.join(TENDER_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(TENDER_COLUMNS))})
+        ON CONFLICT DO NOTHING
+    """
+    cursor = conn.cursor()
+    try:
+        for count, item in enumerate(records, 1):
+            try:
+                row = partitioned_tender_row(item)
+            except ValueError:
+                stats['rejected'] += 1
+                continue
+
+            cursor.execute("SAVEPOINT tender_row")
+            try:
+                # bid_date が変わった案件は旧パーティションの行を削除
+                cursor.execute(
+                    "DELETE FROM tenders_open WHERE tender_id = %s AND bid_date IS DISTINCT FROM %s",
+                    (row[0], row[_BID_DATE_INDEX])
+                )
+                cursor.execute(insert_query, row)
+                stats['inserted'] += cursor.rowcount
+                cursor.execute("RELEASE SAVEPOINT tender_row")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT tender_row")
+                stats['rejected'] += 1
+                print(f"⚠️ Skipped tender {row[0]}: {str(e).splitlines()[0]}")
+
+            if count % commit_every == 0:
+                conn.commit()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return stats
@@ -0,0 +1,103 @@
+"""
+企業ダッシュボードの集計（company_awards）
+
+/company/strengths・/company/performance-by-region・/company/performance-by-type が使う集計を
+GROUPING SETS の1クエリで求め、企業ごとにメモリ上にキャッシュする。
+CSVアップロードの取り込み完了時（csv_import_worker）に該当企業のキャッシュを破棄する。
+キャッシュには company_awards の data_versions を記録し、他のプロセス（serve.py の別ワーカー・バッチ）での
+更新はバージョンが変わった時点で（DATA_VERSION_TTL 秒以内に）反映される
+
+集計はディメンションの整数コード単位で保持し、文字列への変換は各エンドポイントで行う
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+import models
+from http_cache import dataset_version
+from metrics import cache_result
+
+CACHE_TTL_SECONDS = float(os.getenv('COMPANY_STATS_CACHE_TTL', '300'))
+
+# GROUPING() の値（集約されたカラムのビットが立つ。最上位ビットから 都道府県, 市区町村, 用途, 入札方式）
+_ALL = 0b1111
+_PREFECTURE = 0b0111
+_REGION = 0b0011
+_USE_TYPE = 0b1101
+_METHOD = 0b1110
+
+_cache: Dict[int, tuple] = {}
+_lock = threading.Lock()
+
+
+def _aggregate(db: Session, company_id: int) -> Dict:
+    award = models.CompanyAward
+    keys = (award.prefecture_code, award.municipality_code, award.use_type_code, award.method_code)
+    rows = db.query(
+        func.grouping(*keys).label('grouping'),
+        *keys,
+        func.count(award.id).label('count'),
+        func.sum(award.award_amount_jpy).label('total_amount'),
+        func.avg(award.award_amount_jpy).label('avg_amount'),
+        func.avg(award.win_rate).label('avg_win_rate'),
+        func.avg(award.floor_area_m2).label('avg_floor_area'),
+        func.avg(award.technical_score).label('avg_tech_score')
+    ).filter(
+        award.company_id == company_id
+    ).group_by(
+        func.grouping_sets(
+            tuple_(),
+            tuple_(award.prefecture_code),
+            tuple_(award.prefecture_code, award.municipality_code),
+            tuple_(award.use_type_code),
+            tuple_(award.method_code)
+        )
+    ).all()
+
+    stats = {'totals': None, 'prefectures': [], 'regions': [], 'use_types': [], 'methods': []}
+    for row in rows:
+        if row.grouping == _ALL:
+            stats['totals'] = row
+        elif row.grouping == _PREFECTURE:
+            stats['prefectures'].append(row)
+        elif row.grouping == _REGION:
+            stats['regions'].append(row)
+        elif row.grouping == _USE_TYPE:
+            stats['use_types'].append(row)
+        elif row.grouping == _METHOD:
+            stats['methods'].append(row)
+
+    # 件数の多い順
+    for key in ('prefectures', 'regions', 'use_types', 'methods'):
+        stats[key].sort(key=lambda r: -r.count)
+    return stats
+
+
+def get_company_stats(db: Session, company_id: int) -> Dict:
+    """企業の集計（キャッシュになければ1クエリで集計）"""
+    version = dataset_version('company_awards')
+    with _lock:
+        entry = _cache.get(company_id)
+    hit = entry is not None and entry[0] > time.monotonic() and entry[1] == version
+    cache_result('company_stats', hit)
+    if hit:
+        return entry[2]
+
+    stats = _aggregate(db, company_id)
+    if CACHE_TTL_SECONDS > 0:
+        with _lock:
+            _cache[company_id] = (time.monotonic() + CACHE_TTL_SECONDS, version, stats)
+    return stats
+
+
+def invalidate(company_id: Optional[int] = None):
+    """企業の集計キャッシュを破棄（company_id 省略時はすべて）"""
+    with _lock:
+        if company_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(company_id, None)
@@ -0,0 +1,163 @@
+"""
+競合入札のモンテカルロシミュレーション
+
+類似案件の落札率（win_rate）と参加社数（participants_count）の経験分布から
+競合各社の入札比率（入札額 / 予定価格）をサンプリングし、
+指定した入札比率での落札確率を推定する。
+
+落札率は「参加社の中の最低入札比率」の分布であるため、参加社数 k の順序統計量の関係
+    F_落札(x) = 1 - (1 - F_1社(x))^k
+を用いて1社あたりの入札比率分布に変換してからサンプリングする。
+最低制限価格を下回った競合は失格として除外し、有効な競合の最低入札比率を
+試行ごとに1つだけ生成するため、10万試行でも数ミリ秒で計算できる。
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_TRIALS = 100_000
+DEFAULT_SEED = 42
+
+# 経験分布として使うのに必要な最小件数
+MIN_SAMPLES = 5
+
+# 類似案件が少ない場合の事前分布（落札率 90% ± 4%、参加社数 5社）
+PRIOR_WIN_RATIO_MEAN = 0.90
+PRIOR_WIN_RATIO_STD = 0.04
+PRIOR_PARTICIPANTS = 5
+
+
+class CompetitorSimulator:
+    def __init__(self, n_trials: int = DEFAULT_TRIALS, seed: int = DEFAULT_SEED, bandwidth: float = 0.005):
+        self.n_trials = n_trials
+        self.seed = seed
+        # 経験分布の階段状の形を滑らかにするためのノイズ幅（比率）
+        self.bandwidth = bandwidth
+
+    def _empirical_distribution(self, similar_awards: List[Dict], rng):
+        """類似案件から落札比率と参加社数の経験分布を作成"""
+        ratios = []
+        participants = []
+        for award in similar_awards:
+            ratio = None
+            if award.get('win_rate'):
+                ratio = float(award['win_rate']) / 100
+            elif award.get('contract_amount') and award.get('estimated_price'):
+                ratio = float(award['contract_amount']) / float(award['estimated_price'])
+            if ratio is not None and 0.3 < ratio < 1.5:
+                ratios.append(ratio)
+            if award.get('participants_count'):
+                participants.append(int(award['participants_count']))
+
+        if len(ratios) >= MIN_SAMPLES:
+            win_ratios = np.sort(np.asarray(ratios, dtype=np.float64))
+        else:
+            win_ratios = np.sort(np.clip(
+                rng.normal(PRIOR_WIN_RATIO_MEAN, PRIOR_WIN_RATIO_STD, 200), 0.6, 1.0
+            ))
+
+        if len(participants) >= MIN_SAMPLES:
+            participants = np.asarray(participants, dtype=np.int64)
+        else:
+            participants = np.full(1, PRIOR_PARTICIPANTS, dtype=np.int64)
+
+        return win_ratios, np.maximum(participants, 1)
+
+    def simulate_rival_floor(self, tender: Dict, similar_awards: List[Dict]) -> np.ndarray:
+        """試行ごとの「有効な競合の最低入札比率」をソート済み配列で返す
+
+        有効な競合がいない試行は inf になる
+        """
+        rng = np.random.default_rng(self.seed)
+        win_ratios, participants = self._empirical_distribution(similar_awards, rng)
+        n = len(win_ratios)
+        k_ref = float(np.median(participants))
+
+        # 落札比率の経験分布関数とその逆関数（線形補間）
+        probs = (np.arange(n) + 0.5) / n
+
+        def winner_quantile(q):
+            return np.interp(q, probs, win_ratios)
+
+        # 最低制限価格を下回る1社あたりの確率
+        min_ratio = self._minimum_ratio(tender)
+        if min_ratio > 0:
+            winner_cdf = np.searchsorted(win_ratios, min_ratio, side='left') / n
+            p_low = 1.0 - (1.0 - winner_cdf) ** (1.0 / k_ref)
+        else:
+            p_low = 0.0
+
+        # 自社を除いた競合数と、そのうち最低制限価格以上で入札する社数
+        n_rivals = rng.choice(participants, size=self.n_trials) - 1
+        n_valid = rng.binomial(np.maximum(n_rivals, 0), 1.0 - p_low)
+
+        # 有効な競合 m 社の最低値の分位点: 1 - V^(1/m)（V ~ 一様分布）
+        valid = n_valid > 0
+        v = rng.random(self.n_trials)
+        u_min = np.zeros(self.n_trials)
+        u_min[valid] = 1.0 - v[valid] ** (1.0 / n_valid[valid])
+        u = p_low + (1.0 - p_low) * u_min
+
+        # 1社あたりの分位点を落札比率の分位点に変換して比率を得る
+        floor = winner_quantile(1.0 - (1.0 - u) ** k_ref)
+        floor = floor + rng.normal(0.0, self.bandwidth, self.n_trials)
+        if min_ratio > 0:
+            floor = np.maximum(floor, min_ratio)
+        floor[~valid] = np.inf
+
+        return np.sort(floor)
+
+    def win_probabilities(self, bid_ratios, tender: Dict, similar_awards: List[Dict],
+                          rival_floor: Optional[np.ndarray] = None) -> np.ndarray:
+        """複数の入札比率に対する落札確率をまとめて推定"""
+        if rival_floor is None:
+            rival_floor = self.simulate_rival_floor(tender, similar_awards)
+        bid_ratios = np.asarray(bid_ratios, dtype=np.float64)
+
+        # 競合の最低入札比率を下回れば落札
+        beaten = len(rival_floor) - np.searchsorted(rival_floor, bid_ratios, side='right')
+        probs = beaten / len(rival_floor)
+
+        # 最低制限価格未満・予定価格超過は失格
+        min_ratio = self._minimum_ratio(tender)
+        probs[(bid_ratios < min_ratio) | (bid_ratios > 1.0)] = 0.0
+        return probs
+
+    def win_probability(self, bid_amount: int, tender: Dict, similar_awards: List[Dict]) -> float:
+        """単一の入札額に対する落札確率を推定"""
+        estimated_price = tender.get('estimated_price') or 0
+        if estimated_price <= 0:
+            return 0.0
+        ratio = bid_amount / estimated_price
+        return float(self.win_probabilities([ratio], tender, similar_awards)[0])
+
+    @staticmethod
+    def _minimum_ratio(tender: Dict) -> float:
+        """最低制限価格の予定価格比"""
+        estimated_price = tender.get('estimated_price') or 0
+        minimum_price = tender.get('minimum_price') or 0
+        if estimated_price <= 0 or minimum_price <= 0:
+            return 0.0
+        return minimum_price / estimated_price
+
+
+if __name__ == "__main__":
+    # 簡易ベンチマーク: python competitor_simulator.py
+    import time
+
+    sample_rng = np.random.default_rng(0)
+    sample_awards = [
+        {'win_rate': float(r), 'participants_count': int(p)}
+        for r, p in zip(sample_rng.normal(91, 3, 60), sample_rng.integers(2, 15, 60))
+    ]
+    sample_tender = {'estimated_price': 500_000_000, 'minimum_price': 400_000_000}
+
+    simulator = CompetitorSimulator()
+    simulator.win_probability(450_000_000, sample_tender, sample_awards)  # ウォームアップ
+
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        prob = simulator.win_probability(450_000_000, sample_tender, sample_awards)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / runs
+    print(f"win_probability(90%) = {prob:.3f} ({simulator.n_trials:,} trials, {elapsed_ms:.1f} ms/run)")
@@ -0,0 +1,271 @@
+"""
+落札実績CSVのバックグラウンド取り込み
+
+アップロードされたCSVは一時ファイルに保存して即座に受け付け（status: queued）、
+ワーカースレッドが以下を行う。
+- CSVをチャンクごとにカラム単位で検証し（csv_validation）、エラーのある行を除外
+- エラーのない行をチャンクごとに COPY で一時ステージングテーブルに流し込み、進捗を書き込む
+- チャンクをまたぐ tender_id の重複を除き（後の行を採用）、カテゴリ値の整数コードを埋める
+- ON CONFLICT (company_id, tender_id) DO UPDATE の1文で company_awards にマージ
+- 取り込み後に企業の集計キャッシュ（company_stats）を破棄
+- 処理件数・エラー件数を csv_upload_history に、行ごとのエラーを csv_upload_errors に書き込む
+  （/csv/upload-history, /csv/upload-history/{id}/errors で参照）
+"""
+import csv
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List
+
+import pandas as pd
+import psycopg2
+
+import company_stats
+from bulk_loader import copy_frame
+from csv_validation import AWARD_COLUMNS, REQUIRED_COLUMNS, validate_award_csv_chunks
+from dimensions import code_columns, encode_stage
+from database import DATABASE_URL
+
+UPLOAD_DIR = os.getenv('CSV_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'bid_kacho_csv_uploads'))
+MAX_WORKERS = int(os.getenv('CSV_IMPORT_WORKERS', '2'))
+
+# 1回に読み込んで検証する行数（ファイル全体をメモリに載せない）
+CHUNK_ROWS = int(os.getenv('CSV_IMPORT_CHUNK_ROWS', '50000'))
+
+# 進捗を書き込む間隔（秒）
+PROGRESS_INTERVAL = 1.0
+
+# error_message に残すエラーの件数
+MAX_ERROR_MESSAGES = 5
+
+# csv_upload_errors に保存するエラーの上限（件数自体は error_count に記録）
+MAX_STORED_ERRORS = 10000
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='csv-import')
+
+
+def upload_path(upload_id: int) -> str:
+    """アップロードIDに対応する一時ファイルのパス"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.csv")
+
+
+def missing_columns(path: str) -> List[str]:
+    """CSVのヘッダーに不足している必須カラム"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        headers = next(csv.reader(f), [])
+    return [c for c in REQUIRED_COLUMNS if c not in headers]
+
+
+class _Progress:
+    """処理件数・エラー件数を別接続で csv_upload_history に書き込む"""
+
+    def __init__(self, upload_id: int):
+        self.upload_id = upload_id
+        self.processed = 0
+        self.errors = 0
+        self._last_published = 0.0
+        self._conn = psycopg2.connect(DATABASE_URL)
+        self._conn.autocommit = True
+
+    def publish(self, force: bool = False, **fields):
+        now = time.time()
+        if not force and now - self._last_published < PROGRESS_INTERVAL:
+            return
+        self._last_published = now
+
+        values = {'processed_count': self.processed, 'error_count': self.errors}
+        values.update(fields)
+        assignments = ', '.join(f"{k} = %({k})s" for k in values)
+        cursor = self._conn.cursor()
+        cursor.execute(
+            f"UPDATE csv_upload_history SET {assignments} WHERE id = %(upload_id)s",
+            dict(values, upload_id=self.upload_id)
+        )
+        cursor.close()
+
+    def close(self):
+        self._conn.close()
+
+
+def _store_errors(cursor, upload_id: int, errors: pd.DataFrame, limit: int) -> int:
+    """行ごとのエラーを limit 件まで csv_upload_errors に保存し、保存した件数を返す"""
+    if errors.empty or limit <= 0:
+        return 0
+    stored = errors.head(limit).rename(columns={'row': 'row_number', 'column': 'column_name'})
+    stored.insert(0, 'upload_id', upload_id)
+    return copy_frame(cursor, 'csv_upload_errors', stored)
+
+
+def _drop_cross_chunk_duplicates(cursor) -> pd.DataFrame:
+    """チャンクをまたいで重複する tender_id をステージから除き（後の行を採用）、エラー一覧を返す"""
+    cursor.execute("""
+        DELETE FROM company_awards_stage s
+        USING (
+            SELECT tender_id, max(line_no) AS kept_line_no
+            FROM company_awards_stage
+            GROUP BY tender_id
+            HAVING count(*) > 1
+        ) d
+        WHERE s.tender_id = d.tender_id AND s.line_no < d.kept_line_no
+        RETURNING s.line_no, d.kept_line_no
+    """)
+    removed = sorted(cursor.fetchall())
+    return pd.DataFrame({
+        'row': pd.Series([line_no for line_no, _ in removed], dtype='int64'),
+        'column': 'tender_id',
+        'reason': pd.Series(
+            [f"同じ tender_id が後の行にもあるため除外しました（{kept}行目を採用）" for _, kept in removed],
+            dtype=str
+        ),
+    })
+
+
+def _error_summary(valid_rows: int, rejected_rows: int, first_errors: pd.DataFrame) -> str:
+    lines = []
+    if rejected_rows:
+        lines.append(f"{valid_rows}行を取り込み、{rejected_rows}行はエラーのため除外しました")
+    lines.extend(
+        f"{row}行目 {column}: {reason}"
+        for row, column, reason in first_errors.head(MAX_ERROR_MESSAGES).itertuples(index=False, name=None)
+    )
+    return '\n'.join(lines)
+
+
+def import_upload(upload_id: int, company_id: int, path: str):
+    """アップロードされたCSVを company_awards に取り込む（ワーカースレッドで実行）
+
+    CHUNK_ROWS 行ずつ検証してステージングテーブルに COPY し、チャンクごとに進捗を書き込む
+    """
+    progress = _Progress(upload_id)
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        progress.publish(force=True, upload_status='processing')
+
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM csv_upload_errors WHERE upload_id = %s", (upload_id,))
+
+        columns = ['company_id'] + AWARD_COLUMNS
+        stage_columns = columns + code_columns('company_awards')
+        # line_no はチャンクをまたぐ tender_id の重複の判定用
+        cursor.execute(f"""
+            CREATE TEMP TABLE company_awards_stage ON COMMIT DROP AS
+            SELECT {', '.join(stage_columns)}, NULL::bigint AS line_no FROM company_awards WITH NO DATA
+        """)
+
+        staged = 0
+        stored_errors = 0
+        first_errors = []
+        for result in validate_award_csv_chunks(path, CHUNK_ROWS):
+            if result.valid_rows:
+                rows = result.rows
+                rows.insert(0, 'company_id', company_id)
+                staged += copy_frame(cursor, 'company_awards_stage', rows, columns + ['line_no'])
+            stored_errors += _store_errors(cursor, upload_id, result.errors, MAX_STORED_ERRORS - stored_errors)
+            if len(first_errors) < MAX_ERROR_MESSAGES and not result.errors.empty:
+                first_errors.append(result.errors.head(MAX_ERROR_MESSAGES))
+
+            progress.processed += result.total_rows
+            progress.errors += result.rejected_rows
+            progress.publish()
+
+        duplicates = _drop_cross_chunk_duplicates(cursor)
+        if not duplicates.empty:
+            _store_errors(cursor, upload_id, duplicates, MAX_STORED_ERRORS - stored_errors)
+            first_errors.append(duplicates.head(MAX_ERROR_MESSAGES))
+            progress.errors += len(duplicates)
+        valid_rows = staged - len(duplicates)
+
+        merged = 0
+        if valid_rows:
+            encode_stage(cursor, 'company_awards', 'company_awards_stage')
+
+            column_list = ', '.join(stage_columns)
+            update_list = ', '.join(
+                f"{c} = EXCLUDED.{c}" for c in stage_columns if c not in ('company_id', 'tender_id')
+            )
+            cursor.execute(f"""
+                INSERT INTO company_awards ({column_list})
+                SELECT {column_list} FROM company_awards_stage
+                ON CONFLICT (company_id, tender_id) DO UPDATE
+                SET {update_list}, updated_at = CURRENT_TIMESTAMP
+            """)
+            merged = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        company_stats.invalidate(company_id)
+
+        if first_errors:
+            first_errors = pd.concat(first_errors, ignore_index=True).sort_values('row', kind='stable')
+        else:
+            first_errors = pd.DataFrame(columns=['row', 'column', 'reason'])
+        progress.publish(
+            force=True,
+            upload_status='completed' if valid_rows or not progress.processed else 'failed',
+            record_count=merged,
+            error_message=_error_summary(valid_rows, progress.errors, first_errors) or None,
+            completed_at=datetime.utcnow()
+        )
+        print(f"✅ CSV upload {upload_id}: {merged} records merged, "
+              f"{progress.errors} rows rejected")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ CSV upload {upload_id} failed: {e}")
+        traceback.print_exc()
+        progress.publish(
+            force=True,
+            upload_status='failed',
+            error_message=str(e),
+            completed_at=datetime.utcnow()
+        )
+    finally:
+        conn.close()
+        progress.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def submit_upload(upload_id: int, company_id: int, path: str):
+    """取り込みをワーカーに投入"""
+    return _executor.submit(import_upload, upload_id, company_id, path)
+
+
+def recover_pending_uploads():
+    """起動時に未完了のアップロードを再投入（一時ファイルが残っていない場合は失敗扱い）"""
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, company_id FROM csv_upload_history
+            WHERE upload_status IN ('queued', 'processing')
+            ORDER BY id
+        """)
+        pending = cursor.fetchall()
+
+        resubmit = []
+        for upload_id, company_id in pending:
+            path = upload_path(upload_id)
+            if os.path.exists(path):
+                cursor.execute(
+                    "UPDATE csv_upload_history SET upload_status = 'queued' WHERE id = %s", (upload_id,)
+                )
+                resubmit.append((upload_id, company_id, path))
+            else:
+                cursor.execute("""
+                    UPDATE csv_upload_history
+                    SET upload_status = 'failed', error_message = %s, completed_at = %s
+                    WHERE id = %s
+                """, ("処理中にサーバーが再起動されました。再度アップロードしてください", datetime.utcnow(), upload_id))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    for upload_id, company_id, path in resubmit:
+        submit_upload(upload_id, company_id, path)
+
+    if pending:
+        print(f"📥 CSV uploads recovered: {len(resubmit)} resubmitted, {len(pending) - len(resubmit)} marked failed")
@@ -0,0 +1,223 @@
+"""
+落札実績CSVの検証
+
+CSVを文字列として読み込み（大きいファイルはチャンクごと）、カラム単位のベクトル演算で
+型（数値・整数・日付）、値の範囲、文字数、tender_id の重複をまとめて検査する。
+エラーは (行番号, カラム, 理由) の一覧として返し、エラーのない行だけを取り込み対象にする（部分取り込み）
+"""
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = [
+    'tender_id', 'project_name', 'publisher', 'prefecture',
+    'municipality', 'use_type', 'method', 'floor_area_m2',
+    'award_date', 'award_amount_jpy', 'estimated_price_jpy',
+    'win_rate', 'participants_count'
+]
+
+# company_awards への投入カラム（company_id 以外）
+AWARD_COLUMNS = REQUIRED_COLUMNS + ['technical_score']
+
+# 文字列カラムの最大文字数（company_awards の定義に合わせる）
+STRING_MAX_LENGTHS = {
+    'tender_id': 100,
+    'project_name': 500,
+    'publisher': 200,
+    'prefecture': 50,
+    'municipality': 100,
+    'use_type': 100,
+    'method': 100,
+}
+
+# 数値カラム: (整数か, 必須か, 下限, 下限を含むか, 上限)
+NUMERIC_RULES = {
+    'floor_area_m2': (False, True, 0, False, 99999999.99),
+    'award_amount_jpy': (True, True, 0, False, 10 ** 15),
+    'estimated_price_jpy': (True, True, 0, False, 10 ** 15),
+    'win_rate': (False, True, 0, True, 100),
+    'participants_count': (True, True, 1, True, 2 ** 31 - 1),
+    'technical_score': (False, False, 0, True, 999.99),
+}
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# ヘッダーが1行目のため、データ行は2行目から
+FIRST_LINE_NO = 2
+
+
+class ValidationResult:
+    def __init__(self, rows: pd.DataFrame, errors: pd.DataFrame, total_rows: int):
+        # 取り込み可能な行（AWARD_COLUMNS + line_no、型変換済み）
+        self.rows = rows
+        # エラー一覧（row, column, reason。行番号順）
+        self.errors = errors
+        self.total_rows = total_rows
+
+    @property
+    def valid_rows(self) -> int:
+        return len(self.rows)
+
+    @property
+    def rejected_rows(self) -> int:
+        return self.total_rows - self.valid_rows
+
+    def error_report(self, limit: int = None) -> List[Dict]:
+        errors = self.errors if limit is None else self.errors.head(limit)
+        return [
+            {'row': int(row), 'column': column, 'reason': reason}
+            for row, column, reason in errors.itertuples(index=False, name=None)
+        ]
+
+    def summary(self) -> Dict:
+        return {
+            'total_rows': self.total_rows,
+            'valid_rows': self.valid_rows,
+            'rejected_rows': self.rejected_rows,
+            'error_count': len(self.errors),
+        }
+
+
+def _normalize_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    frame.columns = [str(c).strip() for c in frame.columns]
+    return frame
+
+
+def read_award_csv(path) -> pd.DataFrame:
+    """CSV（パスまたはファイルオブジェクト）をすべて文字列として読み込む（欠損は空文字）"""
+    return _normalize_columns(pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig'))
+
+
+def missing_columns(frame: pd.DataFrame) -> List[str]:
+    return [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+
+
+def _format_number(value) -> str:
+    return f"{int(value):,}" if float(value).is_integer() else f"{value:,}"
+
+
+def _error_frame(line_no: pd.Series, mask: pd.Series, column: str, reason: str,
+                 values: pd.Series = None) -> pd.DataFrame:
+    rows = line_no[mask]
+    if values is not None:
+        reason = reason + values[mask]
+    return pd.DataFrame({'row': rows.to_numpy(), 'column': column,
+                         'reason': reason if isinstance(reason, str) else reason.to_numpy()})
+
+
+def _parse_with_retry(values: pd.Series, parse) -> pd.Series:
+    """変換できなかった値だけ前後の空白を除いて再変換（全行の strip を避ける）"""
+    parsed = parse(values)
+    retry = parsed.isna() & (values != '')
+    if retry.any():
+        parsed[retry] = parse(values[retry].str.strip())
+    return parsed
+
+
+def validate_award_frame(frame: pd.DataFrame, first_line_no: int = FIRST_LINE_NO) -> ValidationResult:
+    """文字列の DataFrame を検証し、取り込み可能な行とエラー一覧を返す
+
+    first_line_no は frame の先頭行のファイル上の行番号（チャンクごとに検証する場合に指定）
+    """
+    total_rows = len(frame)
+    frame = frame.reset_index(drop=True)
+    line_no = pd.Series(np.arange(first_line_no, first_line_no + total_rows), dtype=np.int64)
+    if 'technical_score' not in frame.columns:
+        frame['technical_score'] = ''
+
+    parsed = {}
+    errors = []
+    invalid = pd.Series(False, index=frame.index)
+
+    def reject(mask, column, reason, values=None):
+        nonlocal invalid
+        if mask.any():
+            errors.append(_error_frame(line_no, mask, column, reason, values))
+            invalid |= mask
+
+    # 文字列（tender_id のみ前後の空白を除く）
+    tender_ids = frame['tender_id'].str.strip()
+    reject(tender_ids == '', 'tender_id', '必須項目が空です')
+    for column, max_length in STRING_MAX_LENGTHS.items():
+        values = tender_ids if column == 'tender_id' else frame[column]
+        reject(values.str.len() > max_length, column, f'{max_length}文字を超えています')
+        parsed[column] = values
+
+    # 数値
+    for column, (integer, required, lower, lower_inclusive, upper) in NUMERIC_RULES.items():
+        values = frame[column]
+        numbers = _parse_with_retry(values, lambda v: pd.to_numeric(v, errors='coerce'))
+        blank = numbers.isna() & (values.str.strip() == '') if numbers.isna().any() else numbers.isna()
+        if required:
+            reject(blank, column, '必須項目が空です')
+        not_number = ~blank & (numbers.isna() | np.isinf(numbers))
+        reject(not_number, column, '数値ではありません: ', values)
+        checked = ~blank & ~not_number
+        if integer:
+            reject(checked & (numbers != np.floor(numbers)), column, '整数ではありません: ', values)
+        below = numbers < lower if lower_inclusive else numbers <= lower
+        out_of_range = checked & (below | (numbers > upper))
+        bound = f"{_format_number(lower)}以上" if lower_inclusive else f"{_format_number(lower)}より大きい値"
+        reject(out_of_range, column, f"範囲外の値です（{bound}、{_format_number(upper)}以下）: ", values)
+        parsed[column] = numbers
+
+    # 日付
+    values = frame['award_date']
+    dates = _parse_with_retry(values, lambda v: pd.to_datetime(v, format=DATE_FORMAT, errors='coerce'))
+    blank = dates.isna() & (values.str.strip() == '')
+    reject(blank, 'award_date', '必須項目が空です')
+    reject(~blank & dates.isna(), 'award_date', '日付の形式が正しくありません（YYYY-MM-DD）: ', values)
+    parsed['award_date'] = dates
+
+    # tender_id の重複（エラーのない行の中で、後の行を採用）
+    valid = ~invalid
+    valid_ids = tender_ids.where(valid)
+    duplicated = valid & valid_ids.duplicated(keep='last')
+    if duplicated.any():
+        last_line = line_no.groupby(valid_ids).transform('max')
+        reject(duplicated, 'tender_id', '同じ tender_id が後の行にもあるため除外しました（',
+               last_line.astype('Int64').astype(str) + '行目を採用）')
+
+    if errors:
+        error_frame = pd.concat(errors, ignore_index=True).sort_values('row', kind='stable')
+    else:
+        error_frame = pd.DataFrame({'row': pd.Series(dtype=np.int64), 'column': pd.Series(dtype=str),
+                                    'reason': pd.Series(dtype=str)})
+
+    valid = ~invalid
+    rows = pd.DataFrame({c: parsed[c][valid] for c in AWARD_COLUMNS})
+    for column, (integer, *_rest) in NUMERIC_RULES.items():
+        if integer:
+            rows[column] = rows[column].astype('Int64')
+    rows['line_no'] = line_no[valid]
+
+    return ValidationResult(rows.reset_index(drop=True), error_frame.reset_index(drop=True), total_rows)
+
+
+def validate_award_csv(path) -> ValidationResult:
+    """落札実績CSVファイルを検証（必須カラムが不足している場合は ValueError）"""
+    frame = read_award_csv(path)
+    missing = missing_columns(frame)
+    if missing:
+        raise ValueError(f"必須カラムが不足しています: {', '.join(missing)}")
+    return validate_award_frame(frame)
+
+
+def validate_award_csv_chunks(path, chunksize: int) -> Iterator[ValidationResult]:
+    """落札実績CSVファイルを chunksize 行ずつ読み込んで検証（行番号はファイル全体での番号）
+
+    tender_id の重複はチャンク内でのみ検査するため、チャンクをまたぐ重複は呼び出し側で除外する。
+    必須カラムが不足している場合は最初のチャンクで ValueError
+    """
+    first_line_no = FIRST_LINE_NO
+    reader = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=chunksize)
+    with reader:
+        for frame in reader:
+            frame = _normalize_columns(frame)
+            if first_line_no == FIRST_LINE_NO:
+                missing = missing_columns(frame)
+                if missing:
+                    raise ValueError(f"必須カラムが不足しています: {', '.join(missing)}")
+            yield validate_award_frame(frame, first_line_no)
+            first_line_no += len(frame)
@@ -2,15 +2,70 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from urllib.parse import urlparse, unquote
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
+from data_version import get_data_versions
+from dimensions import shared_cache
+from metrics import DATALOADER_ERRORS, DATALOADER_SECONDS, instrument
+from snapshot import Snapshot, open_current_snapshot, read_current
+
 # 環境変数を読み込み（ローカル開発時のみ）
 # Docker/App Serviceでは環境変数が直接設定されるため不要
 if os.path.exists('.env'):
     load_dotenv()
 
+# 類似案件の抽出で件数を1件までに制限する落札業者（他の業者の実績を優先する）
+HOSHIDA_CONTRACTOR = '星田建設株式会社'
+
+# 用途のマッピング（詳細な用途を落札データ側の汎用カテゴリに変換）
+USE_TYPE_MAPPING = {
+    '下水道施設': '施設',  # インフラ系
+    '福祉施設': '施設',
+    '環境施設': '施設',
+    '交通施設': '道路',    # 交通インフラ
+    '観光施設': '施設',
+    '公園施設': '施設',
+    '文化施設': '公民館',  # 文化系
+    '研究施設': '施設',
+    '体育施設': '体育館',
+    '公営住宅': '住宅',
+    '市民センター': '公民館',
+    '駐車場': '施設',
+    '消防署': '庁舎',
+    '警察署': '庁舎',
+}
+
+# 検索結果の文字列カラム（None は空文字で返す）
+SEARCH_RESULT_TEXT_COLUMNS = ['tender_id', 'title', 'publisher', 'prefecture', 'municipality',
+                              'address_text', 'use_type', 'bid_method', 'origin_url']
+
+
+def format_search_results(results):
+    """search_tenders の結果を /tenders/search の応答形式に整形（辞書をその場で書き換える）"""
+    for result in results:
+        # 日付型を文字列に変換
+        if result.get('bid_date'):
+            result['bid_date'] = result['bid_date'].strftime('%Y-%m-%d')
+        if result.get('notice_date'):
+            result['notice_date'] = result['notice_date'].strftime('%Y-%m-%d')
+        
+        # Noneをデフォルト値に変換
+        result['floor_area_m2'] = result.get('floor_area_m2') or 0
+        result['estimated_price'] = result.get('estimated_price') or 0
+        result['minimum_price'] = result.get('minimum_price') or 0
+        result['jv_allowed'] = result.get('jv_allowed') or False
+        
+        # 文字列のNoneを空文字に
+        for key in SEARCH_RESULT_TEXT_COLUMNS:
+            if key in result and result[key] is None:
+                result[key] = ''
+    return results
+
+
 class DataLoader:
-    def __init__(self):
+    def __init__(self, preload: bool = True):
         self.db_url = os.getenv('DATABASE_URL')
         print(f"DEBUG: DATABASE_URL from env: {self.db_url[:50] if self.db_url else 'NOT SET'}...")
         if not self.db_url:
@@ -37,12 +92,30 @@ class DataLoader:
         self.company_data = None
         self.tender_data = None
         self._data_loaded = False
+        # ウォームアップでの読み込みとリクエスト時の再試行が重ならないようにする
+        self._load_lock = threading.Lock()
+        
+        # 設定されている場合はDBの代わりにスナップショット（snapshot.py で書き出し）を読み込む
+        self.snapshot_dir = os.getenv('DATA_SNAPSHOT_DIR')
+        self.snapshot = None
+        # serve.py のワーカーとして起動された場合、スナップショットの更新はローダープロセスが行う
+        # （バージョンの確認やDBからの読み込みはせず、CURRENT が指すものを使う）
+        self.snapshot_managed = os.getenv('DATA_SNAPSHOT_MANAGED', '').lower() in ('1', 'true', 'yes')
+        self._pending_snapshot = None
+        
+        # カテゴリ値の 文字列 <-> 整数コード（検索条件をコードに変換する。company_router と共有）
+        self.dimensions = shared_cache(lambda: psycopg2.connect(self.db_connection_str))
+        
+        # バッチ処理などメモリ上のデータが不要な場合は読み込みを省略
+        if not preload:
+            self.award_data = []
+            self.company_data = []
+            self.tender_data = []
+            return
         
         # 起動時の接続を試みるが、失敗してもアプリケーションは起動する
         try:
-            self.load_all_data()
-            self._data_loaded = True
-            print("DataLoader: Successfully loaded all data")
+            self.preload()
         except Exception as e:
             print(f"DataLoader: Failed to load data on startup: {e}")
             print("DataLoader: Will retry on first request")
@@ -51,6 +124,15 @@ class DataLoader:
             self.company_data = []
             self.tender_data = []
     
+    def preload(self):
+        """全データを読み込む（失敗した場合は例外を送出）"""
+        with self._load_lock:
+            if self._data_loaded:
+                return
+            self.load_all_data()
+            self._data_loaded = True
+        print("DataLoader: Successfully loaded all data")
+    
     def get_db_connection(self):
         """データベース接続を取得"""
         parsed = urlparse(self.db_url)
@@ -89,8 +171,105 @@ class DataLoader:
         )
         return conn
     
+    @instrument(DATALOADER_SECONDS, DATALOADER_ERRORS)
+    def load_snapshot(self) -> bool:
+        """スナップショットをメモリマップで読み込む
+        
+        DBの data_versions と一致しない場合は読み込まずに False を返す（DBから読み込む）。
+        DBに接続できない場合はスナップショットをそのまま使う
+        """
+        try:
+            snapshot = open_current_snapshot(self.snapshot_dir)
+        except Exception as e:
+            print(f"DataLoader: Failed to open snapshot in {self.snapshot_dir}: {e}")
+            return False
+        if snapshot is None:
+            print(f"DataLoader: No snapshot found in {self.snapshot_dir}")
+            return False
+        if self.snapshot_managed:
+            self._apply_snapshot(snapshot)
+            return True
+        
+        try:
+            conn = self.get_db_connection()
+            try:
+                db_versions = get_data_versions(conn)
+            finally:
+                conn.close()
+            if not snapshot.is_current(db_versions):
+                print(f"DataLoader: Snapshot {snapshot.name} is stale "
+                      f"(snapshot {snapshot.data_versions}, database {db_versions})")
+                return False
+        except psycopg2.Error as e:
+            print(f"DataLoader: Could not check snapshot version ({e}), using snapshot {snapshot.name}")
+        
+        self._apply_snapshot(snapshot)
+        return True
+    
+    def _apply_snapshot(self, snapshot: Snapshot):
+        award_data, company_data = snapshot.award_records()
+        tender_data = snapshot.tender_records()
+        self.award_data, self.company_data, self.tender_data = award_data, company_data, tender_data
+        self.snapshot = snapshot
+        
+        print(f"Loaded {len(self.award_data)} award records from snapshot {snapshot.name}")
+        print(f"Loaded {len(self.company_data)} company records from snapshot {snapshot.name}")
+        print(f"Loaded {len(self.tender_data)} tender records from snapshot {snapshot.name}")
+    
+    def refresh_snapshot(self):
+        """CURRENT が新しいスナップショットを指していれば切り替える
+        
+        切り替え時刻が指定されている場合は先に開いておき、時刻になってから切り替える
+        （全ワーカーが同じ時刻に新しいバージョンに揃う）。
+        切り替え待ちの場合は切り替え時刻までの秒数を返す
+        """
+        current = read_current(self.snapshot_dir)
+        if current is None:
+            return None
+        name, activate_at = current
+        if self.snapshot is not None and self.snapshot.name == name:
+            self._pending_snapshot = None
+            return None
+        
+        pending = self._pending_snapshot
+        if pending is None or pending.name != name:
+            try:
+                pending = Snapshot(os.path.join(self.snapshot_dir, name))
+            except Exception as e:
+                print(f"DataLoader: Failed to open snapshot {name}: {e}")
+                return None
+            self._pending_snapshot = pending
+        
+        wait = activate_at - time.time()
+        if wait > 0:
+            return wait
+        self._apply_snapshot(pending)
+        self._pending_snapshot = None
+        print(f"DataLoader: Switched to snapshot {name}")
+        return None
+    
+    def start_snapshot_watcher(self, interval: float = 1.0):
+        """CURRENT を interval 秒ごとに確認するスレッドを開始"""
+        def watch():
+            while True:
+                try:
+                    wait = self.refresh_snapshot()
+                except Exception as e:
+                    print(f"DataLoader: Snapshot refresh failed: {e}")
+                    wait = None
+                time.sleep(min(interval, wait) if wait is not None else interval)
+        
+        thread = threading.Thread(target=watch, name='snapshot-watcher', daemon=True)
+        thread.start()
+        return thread
+    
+    @instrument(DATALOADER_SECONDS, DATALOADER_ERRORS)
     def load_all_data(self):
         """データベースからすべてのデータを読み込み"""
+        if self.snapshot_dir and self.load_snapshot():
+            return
+        self.snapshot = None
+        
         conn = self.get_db_connection()
         
         try:
@@ -200,8 +379,10 @@ class DataLoader:
         if not self._data_loaded:
             try:
                 print("Retrying data load...")
-                self.load_all_data()
-                self._data_loaded = True
+                with self._load_lock:
+                    if not self._data_loaded:
+                        self.load_all_data()
+                        self._data_loaded = True
                 print("Data successfully loaded on retry")
             except Exception as e:
                 print(f"Failed to load data on retry: {e}")
@@ -232,6 +413,7 @@ class DataLoader:
             # リストを結合
             return self.award_data + self.company_data
     
+    @instrument(DATALOADER_SECONDS, DATALOADER_ERRORS)
     def get_filter_options(self):
         """フィルタオプションを取得"""
         conn = psycopg2.connect(self.db_connection_str, cursor_factory=RealDictCursor)
@@ -282,6 +464,7 @@ class DataLoader:
             cursor.close()
             conn.close()
     
+    @instrument(DATALOADER_SECONDS, DATALOADER_ERRORS)
     def search_tenders(self, filters=None):
         """条件に基づいて入札案件を検索"""
         try:
@@ -314,21 +497,21 @@ class DataLoader:
             if filters:
                 print(f"DEBUG search_tenders: Received filters: {filters}")
                 if filters.get('prefecture'):
-                    query += " AND prefecture = %s"
-                    params.append(filters['prefecture'])
+                    query += " AND prefecture_code = %s"
+                    params.append(self.dimensions.code('prefecture', filters['prefecture']))
                     print(f"DEBUG search_tenders: Added prefecture filter: {filters['prefecture']}")
                 
                 if filters.get('municipality'):
-                    query += " AND municipality = %s"
-                    params.append(filters['municipality'])
+                    query += " AND municipality_code = %s"
+                    params.append(self.dimensions.code('municipality', filters['municipality']))
                 
                 if filters.get('use_type'):
-                    query += " AND use_type = %s"
-                    params.append(filters['use_type'])
+                    query += " AND use_type_code = %s"
+                    params.append(self.dimensions.code('use_type', filters['use_type']))
                 
                 if filters.get('bid_method'):
-                    query += " AND method = %s"
-                    params.append(filters['bid_method'])
+                    query += " AND method_code = %s"
+                    params.append(self.dimensions.code('method', filters['bid_method']))
                 
                 if filters.get('min_floor_area'):
                     query += " AND floor_area_m2 >= %s"
@@ -373,6 +556,7 @@ class DataLoader:
             # エラー時は空のリストを返す
             return []
     
+    @instrument(DATALOADER_SECONDS, DATALOADER_ERRORS)
     def get_tender_by_id(self, tender_id: str):
         """特定のIDの案件を取得"""
         try:
@@ -384,13 +568,20 @@ class DataLoader:
                        address_text, use_type, method as bid_method, jv_allowed, floor_area_m2, 
                        bid_date, notice_date, origin_url, estimated_price_jpy as estimated_price, 
                        minimum_price_jpy as minimum_price
-                FROM tenders_open
+                FROM {table}
                 WHERE tender_id = %s
             """
-            
-            cursor.execute(query, (tender_id,))
+
+            cursor.execute(query.format(table='tenders_open'), (tender_id,))
             result = cursor.fetchone()
-            
+
+            # 入札日を過ぎた案件は履歴テーブルに移されている（tender_partitions）
+            if not result:
+                cursor.execute("SELECT to_regclass('tenders_archive') IS NOT NULL AS archived")
+                if cursor.fetchone()['archived']:
+                    cursor.execute(query.format(table='tenders_archive'), (tender_id,))
+                    result = cursor.fetchone()
+
             cursor.close()
             conn.close()
             
@@ -407,237 +598,237 @@ class DataLoader:
             print(f"Error in get_tender_by_id: {e}")
             return None
     
+    @instrument(DATALOADER_SECONDS, DATALOADER_ERRORS)
     def get_similar_awards(self, prefecture=None, use_type=None, floor_area=None, bid_method=None, estimated_price=None):
         """類似案件の落札実績を取得"""
         try:
             conn = psycopg2.connect(self.db_connection_str)
-            cursor = conn.cursor()
-            
-            # 用途のマッピング（詳細な用途を汎用カテゴリに変換）
-            use_type_mapping = {
-                '下水道施設': '施設',  # インフラ系
-                '福祉施設': '施設',
-                '環境施設': '施設',
-                '交通施設': '道路',    # 交通インフラ
-                '観光施設': '施設',
-                '公園施設': '施設',
-                '文化施設': '公民館',  # 文化系
-                '研究施設': '施設',
-                '体育施設': '体育館',
-                '公営住宅': '住宅',
-                '市民センター': '公民館',
-                '駐車場': '施設',
-                '消防署': '庁舎',
-                '警察署': '庁舎',
-            }
-            
-            # マッピングを適用
-            mapped_use_type = use_type_mapping.get(use_type, use_type) if use_type else None
-            
-            print(f"DEBUG get_similar_awards: Input params - prefecture={prefecture}, use_type={use_type}→{mapped_use_type}, floor_area={floor_area}, bid_method={bid_method}, estimated_price={estimated_price}")
-            
-            # まず全条件で検索（企業の多様性を確保）
-            base_conditions = []
-            params = []
-            conditions_used = []
-            
-            # 条件を追加
-            if prefecture:
-                base_conditions.append("prefecture = %s")
-                params.append(prefecture)
-                conditions_used.append(f"prefecture={prefecture}")
-            if use_type:
-                base_conditions.append("use_type = %s")
-                params.append(mapped_use_type if mapped_use_type else use_type)
-                conditions_used.append(f"use_type={use_type}→{mapped_use_type if mapped_use_type else use_type}")
-            if bid_method:
-                base_conditions.append("bid_method = %s")
-                params.append(bid_method)
-                conditions_used.append(f"bid_method={bid_method}")
-            if floor_area:
-                # 面積の±30%範囲で検索
-                base_conditions.append("floor_area_m2 BETWEEN %s AND %s")
-                params.extend([float(floor_area) * 0.7, float(floor_area) * 1.3])
-                conditions_used.append(f"floor_area={floor_area}±30%")
-            if estimated_price:
-                # 予定価格の±20%範囲で検索
-                base_conditions.append("estimated_price BETWEEN %s AND %s")
-                params.extend([float(estimated_price) * 0.8, float(estimated_price) * 1.2])
-                conditions_used.append(f"estimated_price={estimated_price}±20%")
-            
-            # WHERE句を構築
-            where_clause = " AND ".join(base_conditions) if base_conditions else "1=1"
-            
-            # 企業の多様性を確保するクエリ（星田建設を除外or制限）
-            query = f"""
-                WITH ranked_awards AS (
-                    SELECT *,
-                           ROW_NUMBER() OVER (PARTITION BY contractor ORDER BY contract_date DESC) as rn,
-                           CASE WHEN contractor = '星田建設株式会社' THEN 1 ELSE 0 END as is_hoshida
-                    FROM awards
-                    WHERE {where_clause}
+            try:
+                cursor = conn.cursor()
+                results = self.select_similar_awards(
+                    cursor, prefecture, use_type, floor_area, bid_method, estimated_price, debug=True
                 )
-                SELECT * FROM ranked_awards
-                WHERE (is_hoshida = 0 AND rn <= 3) OR (is_hoshida = 1 AND rn <= 1)  -- 星田は1件、他は3件まで
-                ORDER BY is_hoshida ASC, contract_date DESC  -- 星田以外を優先
-                LIMIT 100
-            """
-            
-            print(f"DEBUG get_similar_awards: Conditions used: {conditions_used}")
-            print(f"DEBUG get_similar_awards: Query: {query}")
-            print(f"DEBUG get_similar_awards: Params: {params}")
-            
-            cursor.execute(query, params)
-            columns = [desc[0] for desc in cursor.description]
-            results = cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
+            return results
+                
+        except Exception as e:
+            print(f"Error in get_similar_awards: {e}")
+            return []
+    
+    def select_similar_awards(self, cursor, prefecture=None, use_type=None, floor_area=None, bid_method=None,
+                              estimated_price=None, debug=False):
+        """類似案件の抽出（件数が少なければ条件を段階的に緩和）
+
+        /predict（get_similar_awards）と夜間バッチ（opportunity_scorer）が同じ抽出を使うよう、
+        呼び出し側の接続のカーソルで実行する（通常のカーソルと RealDictCursor のどちらでもよい）
+        """
+        log = print if debug else (lambda *args: None)
+        
+        # マッピングを適用
+        mapped_use_type = USE_TYPE_MAPPING.get(use_type, use_type) if use_type else None
+        
+        log(f"DEBUG get_similar_awards: Input params - prefecture={prefecture}, use_type={use_type}→{mapped_use_type}, floor_area={floor_area}, bid_method={bid_method}, estimated_price={estimated_price}")
+        
+        # まず全条件で検索（企業の多様性を確保）
+        base_conditions = []
+        params = []
+        conditions_used = []
+        
+        # 条件を追加
+        # カテゴリ値は整数コードで比較（ディメンションにない値は NULL となり一致しない）
+        prefecture_code = self.dimensions.code('prefecture', prefecture)
+        use_type_code = self.dimensions.code('use_type', mapped_use_type or use_type)
+        if prefecture:
+            base_conditions.append("prefecture_code = %s")
+            params.append(prefecture_code)
+            conditions_used.append(f"prefecture={prefecture}")
+        if use_type:
+            base_conditions.append("use_type_code = %s")
+            params.append(use_type_code)
+            conditions_used.append(f"use_type={use_type}→{mapped_use_type if mapped_use_type else use_type}")
+        if bid_method:
+            base_conditions.append("bid_method_code = %s")
+            params.append(self.dimensions.code('method', bid_method))
+            conditions_used.append(f"bid_method={bid_method}")
+        if floor_area:
+            # 面積の±30%範囲で検索
+            base_conditions.append("floor_area_m2 BETWEEN %s AND %s")
+            params.extend([float(floor_area) * 0.7, float(floor_area) * 1.3])
+            conditions_used.append(f"floor_area={floor_area}±30%")
+        if estimated_price:
+            # 予定価格の±20%範囲で検索
+            # BIGINT カラムの範囲は整数で渡す（小数だと numeric 比較になりインデックスが使われない）
+            base_conditions.append("estimated_price BETWEEN %s AND %s")
+            params.extend([int(float(estimated_price) * 0.8), int(float(estimated_price) * 1.2)])
+            conditions_used.append(f"estimated_price={estimated_price}±20%")
+        
+        # WHERE句を構築
+        where_clause = " AND ".join(base_conditions) if base_conditions else "1=1"
+        
+        # 企業の多様性を確保するクエリ（星田建設を除外or制限）
+        query = f"""
+            WITH ranked_awards AS (
+                SELECT *,
+                       ROW_NUMBER() OVER (PARTITION BY contractor_code ORDER BY contract_date DESC) as rn,
+                       CASE WHEN contractor = '{HOSHIDA_CONTRACTOR}' THEN 1 ELSE 0 END as is_hoshida
+                FROM awards
+                WHERE {where_clause}
+            )
+            SELECT * FROM ranked_awards
+            WHERE (is_hoshida = 0 AND rn <= 3) OR (is_hoshida = 1 AND rn <= 1)  -- 星田は1件、他は3件まで
+            ORDER BY is_hoshida ASC, contract_date DESC  -- 星田以外を優先
+            LIMIT 100
+        """
+        
+        log(f"DEBUG get_similar_awards: Conditions used: {conditions_used}")
+        log(f"DEBUG get_similar_awards: Query: {query}")
+        log(f"DEBUG get_similar_awards: Params: {params}")
+        
+        cursor.execute(query, params)
+        columns = [desc[0] for desc in cursor.description]
+        results = cursor.fetchall()
+        
+        # 結果が少ない場合は条件を緩和
+        if len(results) < 5:
+            log(f"DEBUG get_similar_awards: Only {len(results)} results found, relaxing conditions...")
             
-            # 結果が少ない場合は条件を緩和
-            if len(results) < 5:
-                print(f"DEBUG get_similar_awards: Only {len(results)} results found, relaxing conditions...")
+            # STEP 1: 都道府県と用途の優先順位付きで価格範囲を広げる
+            if estimated_price:
+                query = f"""
+                    WITH ranked_awards AS (
+                        SELECT *,
+                               CASE 
+                                   WHEN prefecture_code = %s AND use_type_code = %s THEN 1  -- 完全一致
+                                   WHEN prefecture_code = %s THEN 2                     -- 同じ都道府県優先
+                                   WHEN use_type_code = %s THEN 3                       -- 同じ用途
+                                   ELSE 4                                           -- その他
+                               END as priority,
+                               ABS(contract_amount - %s) as price_distance,
+                               ROW_NUMBER() OVER (PARTITION BY contractor_code ORDER BY 
+                                   CASE 
+                                       WHEN prefecture_code = %s AND use_type_code = %s THEN 1
+                                       WHEN prefecture_code = %s THEN 2
+                                       WHEN use_type_code = %s THEN 3
+                                       ELSE 4
+                                   END, ABS(contract_amount - %s)) as rn,
+                               CASE WHEN contractor = '{HOSHIDA_CONTRACTOR}' THEN 1 ELSE 0 END as is_hoshida
+                        FROM awards
+                        WHERE contract_amount BETWEEN %s AND %s
+                    )
+                    SELECT * FROM ranked_awards
+                    WHERE (is_hoshida = 0 AND rn <= 3) OR (is_hoshida = 1 AND rn <= 1)  -- 星田は1件まで
+                    ORDER BY is_hoshida ASC, priority, price_distance  -- 星田以外を優先
+                    LIMIT 100
+                """
+                target_price = float(estimated_price) * 0.9
+                params = [
+                    prefecture_code,
+                    use_type_code,     # for CASE - 完全一致
+                    prefecture_code,  # for CASE - 県のみ
+                    use_type_code,     # for CASE - 用途のみ
+                    target_price,                      # for price_distance
+                    # ROW_NUMBER用のパラメータ
+                    prefecture_code,
+                    use_type_code,
+                    prefecture_code,
+                    use_type_code,
+                    target_price,                      # for ROW_NUMBER price distance
+                    int(target_price * 0.5),           # price range min
+                    int(target_price * 1.5)            # price range max
+                ]
+                
+                log(f"DEBUG get_similar_awards: Relaxed query with prefecture/use_type priority")
+                cursor.execute(query, params)
+                columns = [desc[0] for desc in cursor.description]
+                results = cursor.fetchall()
+            
+            # STEP 2: より広い価格帯で検索（±60%）
+            if len(results) < 10 and estimated_price:
+                query = f"""
+                    WITH ranked_awards AS (
+                        SELECT *,
+                               CASE 
+                                   WHEN prefecture_code = %s THEN 1    -- 同じ都道府県を最優先
+                                   WHEN use_type_code = %s THEN 2      -- 同じ用途は次
+                                   ELSE 3                          -- その他
+                               END as similarity_score,
+                               ABS(contract_amount - %s) as price_distance,
+                               ROW_NUMBER() OVER (PARTITION BY contractor_code ORDER BY ABS(contract_amount - %s)) as rn,
+                               CASE WHEN contractor = '{HOSHIDA_CONTRACTOR}' THEN 1 ELSE 0 END as is_hoshida
+                        FROM awards
+                        WHERE contract_amount BETWEEN %s AND %s
+                    )
+                    SELECT * FROM ranked_awards
+                    WHERE (is_hoshida = 0 AND rn <= 2) OR (is_hoshida = 1 AND rn <= 1)  -- 星田は1件まで
+                    ORDER BY is_hoshida ASC, similarity_score, price_distance
+                    LIMIT 100
+                """
+                target_price = float(estimated_price) * 0.9
+                params = [
+                    prefecture_code,
+                    use_type_code,
+                    target_price,  # for price_distance
+                    target_price,  # for ROW_NUMBER price distance
+                    int(target_price * 0.4),  # より広い範囲（40%～160%）
+                    int(target_price * 1.6),
+                ]
+                log(f"DEBUG get_similar_awards: Extended price range with prefecture priority ({target_price * 0.4/100000000:.1f}億～{target_price * 1.6/100000000:.1f}億)")
+                cursor.execute(query, params)
+                columns = [desc[0] for desc in cursor.description]
+                results = cursor.fetchall()
                 
-                # STEP 1: 都道府県と用途の優先順位付きで価格範囲を広げる
+            # 最終手段：全データから価格が近いもの（企業の多様性を確保）
+            if len(results) < 5:
                 if estimated_price:
-                    query = """
+                    # 価格が近いものを取得しつつ、企業の多様性を確保
+                    query = f"""
                         WITH ranked_awards AS (
                             SELECT *,
-                                   CASE 
-                                       WHEN prefecture = %s AND use_type = %s THEN 1  -- 完全一致
-                                       WHEN prefecture = %s THEN 2                     -- 同じ都道府県優先
-                                       WHEN use_type = %s THEN 3                       -- 同じ用途
-                                       ELSE 4                                           -- その他
-                                   END as priority,
-                                   ABS(contract_amount - %s) as price_distance,
-                                   ROW_NUMBER() OVER (PARTITION BY contractor ORDER BY 
-                                       CASE 
-                                           WHEN prefecture = %s AND use_type = %s THEN 1
-                                           WHEN prefecture = %s THEN 2
-                                           WHEN use_type = %s THEN 3
-                                           ELSE 4
-                                       END, ABS(contract_amount - %s)) as rn,
-                                   CASE WHEN contractor = '星田建設株式会社' THEN 1 ELSE 0 END as is_hoshida
+                                   ROW_NUMBER() OVER (PARTITION BY contractor_code ORDER BY ABS(contract_amount - %s)) as rn,
+                                   ABS(contract_amount - %s) as price_distance
                             FROM awards
                             WHERE contract_amount BETWEEN %s AND %s
                         )
                         SELECT * FROM ranked_awards
-                        WHERE (is_hoshida = 0 AND rn <= 3) OR (is_hoshida = 1 AND rn <= 1)  -- 星田は1件まで
-                        ORDER BY is_hoshida ASC, priority, price_distance  -- 星田以外を優先
+                        WHERE (contractor != '{HOSHIDA_CONTRACTOR}' AND rn <= 2) OR (contractor = '{HOSHIDA_CONTRACTOR}' AND rn <= 1)  -- 星田は1件まで
+                        ORDER BY price_distance
                         LIMIT 100
                     """
                     target_price = float(estimated_price) * 0.9
                     params = [
-                        prefecture if prefecture else '', 
-                        mapped_use_type if mapped_use_type else '',     # for CASE - 完全一致
-                        prefecture if prefecture else '',  # for CASE - 県のみ
-                        mapped_use_type if mapped_use_type else '',     # for CASE - 用途のみ
-                        target_price,                      # for price_distance
-                        # ROW_NUMBER用のパラメータ
-                        prefecture if prefecture else '',
-                        mapped_use_type if mapped_use_type else '',
-                        prefecture if prefecture else '',
-                        mapped_use_type if mapped_use_type else '',
-                        target_price,                      # for ROW_NUMBER price distance
-                        target_price * 0.5,                # price range min
-                        target_price * 1.5                 # price range max
+                        target_price,  # for price distance calculation
+                        target_price,  # for price distance in SELECT
+                        int(target_price * 0.3),  # 広い範囲（30%～170%）
+                        int(target_price * 1.7)
                     ]
-                    
-                    print(f"DEBUG get_similar_awards: Relaxed query with prefecture/use_type priority")
+                    log(f"DEBUG get_similar_awards: Using diverse contractor data with price proximity")
                     cursor.execute(query, params)
-                    columns = [desc[0] for desc in cursor.description]
-                    results = cursor.fetchall()
-                
-                # STEP 2: より広い価格帯で検索（±60%）
-                if len(results) < 10 and estimated_price:
-                    query = """
+                else:
+                    # 予定価格がない場合は単純に多様性を確保
+                    query = f"""
                         WITH ranked_awards AS (
                             SELECT *,
-                                   CASE 
-                                       WHEN prefecture = %s THEN 1    -- 同じ都道府県を最優先
-                                       WHEN use_type = %s THEN 2      -- 同じ用途は次
-                                       ELSE 3                          -- その他
-                                   END as similarity_score,
-                                   ABS(contract_amount - %s) as price_distance,
-                                   ROW_NUMBER() OVER (PARTITION BY contractor ORDER BY ABS(contract_amount - %s)) as rn,
-                                   CASE WHEN contractor = '星田建設株式会社' THEN 1 ELSE 0 END as is_hoshida
+                                   ROW_NUMBER() OVER (PARTITION BY contractor_code ORDER BY contract_amount DESC) as rn
                             FROM awards
-                            WHERE contract_amount BETWEEN %s AND %s
                         )
                         SELECT * FROM ranked_awards
-                        WHERE (is_hoshida = 0 AND rn <= 2) OR (is_hoshida = 1 AND rn <= 1)  -- 星田は1件まで
-                        ORDER BY is_hoshida ASC, similarity_score, price_distance
+                        WHERE (contractor != '{HOSHIDA_CONTRACTOR}' AND rn <= 2) OR (contractor = '{HOSHIDA_CONTRACTOR}' AND rn <= 1)  -- 星田は1件まで
+                        ORDER BY contract_amount DESC
                         LIMIT 100
                     """
-                    target_price = float(estimated_price) * 0.9
-                    params = [
-                        prefecture if prefecture else '',
-                        mapped_use_type if mapped_use_type else '',
-                        target_price,  # for price_distance
-                        target_price,  # for ROW_NUMBER price distance
-                        target_price * 0.4,  # より広い範囲（40%～160%）
-                        target_price * 1.6,
-                    ]
-                    print(f"DEBUG get_similar_awards: Extended price range with prefecture priority ({target_price * 0.4/100000000:.1f}億～{target_price * 1.6/100000000:.1f}億)")
-                    cursor.execute(query, params)
-                    columns = [desc[0] for desc in cursor.description]
-                    results = cursor.fetchall()
-                    
-                # 最終手段：全データから価格が近いもの（企業の多様性を確保）
-                if len(results) < 5:
-                    if estimated_price:
-                        # 価格が近いものを取得しつつ、企業の多様性を確保
-                        query = """
-                            WITH ranked_awards AS (
-                                SELECT *,
-                                       ROW_NUMBER() OVER (PARTITION BY contractor ORDER BY ABS(contract_amount - %s)) as rn,
-                                       ABS(contract_amount - %s) as price_distance
-                                FROM awards
-                                WHERE contract_amount BETWEEN %s AND %s
-                            )
-                            SELECT * FROM ranked_awards
-                            WHERE (contractor != '星田建設株式会社' AND rn <= 2) OR (contractor = '星田建設株式会社' AND rn <= 1)  -- 星田は1件まで
-                            ORDER BY price_distance
-                            LIMIT 100
-                        """
-                        target_price = float(estimated_price) * 0.9
-                        params = [
-                            target_price,  # for price distance calculation
-                            target_price,  # for price distance in SELECT
-                            target_price * 0.3,  # 広い範囲（30%～170%）
-                            target_price * 1.7
-                        ]
-                        print(f"DEBUG get_similar_awards: Using diverse contractor data with price proximity")
-                        cursor.execute(query, params)
-                    else:
-                        # 予定価格がない場合は単純に多様性を確保
-                        query = """
-                            WITH ranked_awards AS (
-                                SELECT *,
-                                       ROW_NUMBER() OVER (PARTITION BY contractor ORDER BY contract_amount DESC) as rn
-                                FROM awards
-                            )
-                            SELECT * FROM ranked_awards
-                            WHERE (contractor != '星田建設株式会社' AND rn <= 2) OR (contractor = '星田建設株式会社' AND rn <= 1)  -- 星田は1件まで
-                            ORDER BY contract_amount DESC
-                            LIMIT 100
-                        """
-                        print(f"DEBUG get_similar_awards: Using diverse contractor data sorted by price")
-                        cursor.execute(query)
-                    columns = [desc[0] for desc in cursor.description]
-                    results = cursor.fetchall()
-            
-            print(f"DEBUG get_similar_awards: Final result count: {len(results)}")
-            cursor.close()
-            conn.close()
-            
-            # 辞書のリストとして返す
-            if results:
-                return [dict(zip(columns, row)) for row in results]
-            else:
-                return []
-                
-        except Exception as e:
-            print(f"Error in get_similar_awards: {e}")
-            return []
+                    log(f"DEBUG get_similar_awards: Using diverse contractor data sorted by price")
+                    cursor.execute(query)
+                columns = [desc[0] for desc in cursor.description]
+                results = cursor.fetchall()
+        
+        log(f"DEBUG get_similar_awards: Final result count: {len(results)}")
+        
+        # 辞書のリストとして返す
+        return [dict(row) if isinstance(row, dict) else dict(zip(columns, row)) for row in results]
     
+    @instrument(DATALOADER_SECONDS, DATALOADER_ERRORS)
     def get_company_strengths(self, company_name: str):
         """会社の強み情報を取得"""
         try:
@@ -652,23 +843,24 @@ class DataLoader:
                     MAX(contract_amount) as max_amount,
                     MIN(contract_amount) as min_amount
                 FROM awards
-                WHERE contractor = %s
+                WHERE contractor_code = %s
             """
             
-            cursor.execute(query, (company_name,))
+            contractor_code = self.dimensions.code('contractor', company_name)
+            cursor.execute(query, (contractor_code,))
             result = cursor.fetchone()
             
             if result and result[0] > 0:  # 落札実績がある場合
                 # 都道府県別の実績を取得
                 query_prefecture = """
-                    SELECT a.prefecture, COUNT(*) as count
+                    SELECT a.prefecture_code, COUNT(*) as count
                     FROM awards a
-                    WHERE a.contractor = %s AND a.prefecture IS NOT NULL
-                    GROUP BY a.prefecture
+                    WHERE a.contractor_code = %s AND a.prefecture_code IS NOT NULL
+                    GROUP BY a.prefecture_code
                     ORDER BY count DESC
                     LIMIT 5
                 """
-                cursor.execute(query_prefecture, (company_name,))
+                cursor.execute(query_prefecture, (contractor_code,))
                 prefecture_results = cursor.fetchall()
                 
                 cursor.close()
@@ -680,7 +872,7 @@ class DataLoader:
                     'avg_amount': float(result[1]) if result[1] else 0,
                     'max_amount': float(result[2]) if result[2] else 0,
                     'min_amount': float(result[3]) if result[3] else 0,
-                    'top_prefectures': {row[0]: row[1] for row in prefecture_results}
+                    'top_prefectures': {self.dimensions.name('prefecture', row[0]): row[1] for row in prefecture_results}
                 }
             else:
                 cursor.close()
@@ -0,0 +1,169 @@
+"""
+データセットのバージョン管理
+
+awards / tenders_open への INSERT・UPDATE・DELETE・TRUNCATE のたびに
+ステートメント単位のトリガーで data_versions.version を1つ進める。
+書き込み元（ETL・CSV取り込み・シード）を問わずバージョンが変わるため、
+スナップショットや応答キャッシュが最新かどうかをこの値で判定できる。
+company_awards / companies も同じトリガーでバージョンを進め、プロセスごとのキャッシュ
+（company_stats・auth の企業情報）が別のワーカーでの更新を検知するのに使う（スナップショットには含めない）
+
+内容の変わらない書き込みではバージョンを進めない（ETag・スナップショットを無駄に無効にしないため）:
+- INSERT / DELETE は遷移テーブルを見て、1行も変わらなかったステートメント
+  （ON CONFLICT DO NOTHING で全件衝突、該当行のない DELETE）を無視する
+- UPDATE は内容のカラムを SET するものだけが対象（last_seen_at だけを更新する差分同期などは除く）
+"""
+from typing import Dict, List, Tuple
+
+# バージョンを管理するテーブル（スナップショットの鮮度判定の対象）
+VERSIONED_TABLES = ['awards', 'tenders_open']
+
+# プロセスごとのキャッシュの鮮度判定のためだけにバージョンを管理するテーブル
+CACHE_VERSIONED_TABLES = ['company_awards', 'companies']
+
+# 更新してもバージョンを進めないカラム（取得日時・タイムスタンプ）
+UNVERSIONED_COLUMNS = ['last_seen_at', 'created_at', 'updated_at']
+
+DATA_VERSION_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        dataset VARCHAR(100) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO data_versions (dataset, version, updated_at)
+        VALUES (TG_TABLE_NAME, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (dataset) DO UPDATE
+        SET version = data_versions.version + 1, updated_at = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # INSERT / DELETE 用（遷移テーブル changed_rows が空なら何もしない）
+    """
+    CREATE OR REPLACE FUNCTION bump_data_version_if_changed() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM changed_rows) THEN
+            INSERT INTO data_versions (dataset, version, updated_at)
+            VALUES (TG_TABLE_NAME, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (dataset) DO UPDATE
+            SET version = data_versions.version + 1, updated_at = CURRENT_TIMESTAMP;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+def _table_exists(cursor, table: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS exists", (table,))
+    row = cursor.fetchone()
+    return bool(row['exists'] if isinstance(row, dict) else row[0])
+
+
+def _versioned_columns(cursor, table: str) -> List[str]:
+    """UPDATE でバージョンを進める対象のカラム（UNVERSIONED_COLUMNS 以外）"""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name <> ALL(%s)
+        ORDER BY ordinal_position
+    """, (table, UNVERSIONED_COLUMNS))
+    return [row['column_name'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+
+def data_version_trigger_ddl(table: str, columns: List[str]) -> List[str]:
+    """変更検知のトリガー（migrations/0005_data_version_triggers.sql・0006 と同じ定義）"""
+    return [
+        f"DROP TRIGGER IF EXISTS trg_{table}_data_version ON {table}",
+        f"""
+        CREATE TRIGGER trg_{table}_data_version
+        AFTER UPDATE OF {', '.join(columns)} OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+        """,
+        f"DROP TRIGGER IF EXISTS trg_{table}_data_version_insert ON {table}",
+        f"""
+        CREATE TRIGGER trg_{table}_data_version_insert
+        AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version_if_changed()
+        """,
+        f"DROP TRIGGER IF EXISTS trg_{table}_data_version_delete ON {table}",
+        f"""
+        CREATE TRIGGER trg_{table}_data_version_delete
+        AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version_if_changed()
+        """,
+    ]
+
+
+def ensure_data_versions(conn):
+    """data_versions テーブルと、存在する対象テーブルへのトリガーを用意"""
+    cursor = conn.cursor()
+    for ddl in DATA_VERSION_DDL:
+        cursor.execute(ddl)
+    for table in VERSIONED_TABLES + CACHE_VERSIONED_TABLES:
+        if not _table_exists(cursor, table):
+            continue
+        cursor.execute(
+            "INSERT INTO data_versions (dataset) VALUES (%s) ON CONFLICT (dataset) DO NOTHING", (table,)
+        )
+        for ddl in data_version_trigger_ddl(table, _versioned_columns(cursor, table)):
+            cursor.execute(ddl)
+    conn.commit()
+    cursor.close()
+
+
+def bump_data_version(conn, dataset: str):
+    """トリガーが発火しない変更（パーティションの DETACH など）の後にバージョンを進める"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO data_versions (dataset, version, updated_at)
+        VALUES (%s, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (dataset) DO UPDATE
+        SET version = data_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+    """, (dataset,))
+    conn.commit()
+    cursor.close()
+
+
+def get_data_versions(conn) -> Dict[str, int]:
+    """データセットごとの現在のバージョン（テーブルが未作成なら空）"""
+    cursor = conn.cursor()
+    try:
+        if not _table_exists(cursor, 'data_versions'):
+            return {}
+        cursor.execute("SELECT dataset, version FROM data_versions")
+        versions = {}
+        for row in cursor.fetchall():
+            dataset, version = (row['dataset'], row['version']) if isinstance(row, dict) else row
+            versions[dataset] = int(version)
+        return versions
+    finally:
+        cursor.close()
+
+
+def get_data_version_info(conn) -> Dict[str, Tuple[int, float]]:
+    """データセットごとの (バージョン, 更新時刻の UNIX 時間)（テーブルが未作成なら空）"""
+    cursor = conn.cursor()
+    try:
+        if not _table_exists(cursor, 'data_versions'):
+            return {}
+        cursor.execute("""
+            SELECT dataset, version, EXTRACT(EPOCH FROM updated_at::timestamptz) AS updated_epoch
+            FROM data_versions
+        """)
+        info = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = (row['dataset'], row['version'], row['updated_epoch'])
+            dataset, version, updated_epoch = row
+            info[dataset] = (int(version), float(updated_epoch) if updated_epoch is not None else 0.0)
+        return info
+    finally:
+        cursor.close()
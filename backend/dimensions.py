@@ -0,0 +1,223 @@
+"""
+カテゴリ値のディメンション（整数コード）
+
+都道府県・市区町村・用途・入札方式・落札業者の文字列は dim_* テーブルで整数コードに対応付け、
+awards / tenders_open / company_awards の *_code カラムに持たせる（migrations/0003_dimension_tables.sql）。
+
+- 投入時: ステージングテーブルに encode_stage でコードを埋めてから本テーブルにマージする
+  （文字列だけを INSERT した行は fill_dimension_codes トリガーが埋める。migrations/0004）
+- 検索・集計: WHERE / GROUP BY はコードで行い、文字列は DimensionCache で応答を作るときに引く
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from metrics import cache_result
+
+# ディメンション名 -> テーブル
+DIMENSION_TABLES = {
+    'prefecture': 'dim_prefecture',
+    'municipality': 'dim_municipality',
+    'use_type': 'dim_use_type',
+    'method': 'dim_method',
+    'contractor': 'dim_contractor',
+}
+
+# テーブルごとの (文字列カラム, コードカラム, ディメンション名)
+TABLE_DIMENSIONS: Dict[str, List[Tuple[str, str, str]]] = {
+    'awards': [
+        ('prefecture', 'prefecture_code', 'prefecture'),
+        ('municipality', 'municipality_code', 'municipality'),
+        ('use_type', 'use_type_code', 'use_type'),
+        ('bid_method', 'bid_method_code', 'method'),
+        ('contractor', 'contractor_code', 'contractor'),
+    ],
+    'tenders_open': [
+        ('prefecture', 'prefecture_code', 'prefecture'),
+        ('municipality', 'municipality_code', 'municipality'),
+        ('use_type', 'use_type_code', 'use_type'),
+        ('method', 'method_code', 'method'),
+    ],
+    'company_awards': [
+        ('prefecture', 'prefecture_code', 'prefecture'),
+        ('municipality', 'municipality_code', 'municipality'),
+        ('use_type', 'use_type_code', 'use_type'),
+        ('method', 'method_code', 'method'),
+    ],
+}
+
+
+def code_columns(table: str, columns: Optional[List[str]] = None) -> List[str]:
+    """テーブルのコードカラム（columns を指定した場合は、その中の文字列カラムに対応するものだけ）"""
+    return [code for text, code, _ in TABLE_DIMENSIONS.get(table, []) if columns is None or text in columns]
+
+
+def encode_stage(cursor, table: str, stage_table: str, columns: Optional[List[str]] = None) -> List[str]:
+    """table と同じカラムを持つステージングテーブルのコードカラムを埋め、埋めたコードカラムを返す
+
+    呼び出し側のトランザクション内で実行される（新しい値はディメンションに登録される）
+    """
+    encoded = []
+    for text, code, dimension in TABLE_DIMENSIONS.get(table, []):
+        if columns is not None and text not in columns:
+            continue
+        cursor.execute(
+            "SELECT encode_dimension(%s::regclass, %s, %s, %s::regclass)",
+            (stage_table, text, code, DIMENSION_TABLES[dimension])
+        )
+        encoded.append(code)
+    return encoded
+
+
+def encode_missing(conn) -> int:
+    """コードが未設定の行（コードに対応していない投入スクリプトで入った行）のコードを埋める"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regproc('encode_dimension') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        cursor.close()
+        return 0
+
+    encoded = 0
+    for table, mappings in TABLE_DIMENSIONS.items():
+        for text, code, dimension in mappings:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table} WHERE {code} IS NULL AND {text} IS NOT NULL)")
+            if not cursor.fetchone()[0]:
+                continue
+            cursor.execute(
+                "SELECT encode_dimension(%s::regclass, %s, %s, %s::regclass, true)",
+                (table, text, code, DIMENSION_TABLES[dimension])
+            )
+            encoded += 1
+    conn.commit()
+    cursor.close()
+    if encoded:
+        print(f"🔢 Dimension codes filled for {encoded} columns")
+    return encoded
+
+
+def _code_trigger_ddl(table: str) -> List[str]:
+    """コードを埋める行トリガー（migrations/0004_dimension_code_triggers.sql と同じ定義）"""
+    mappings = TABLE_DIMENSIONS[table]
+    arguments = ', '.join(f"'{text}', '{code}', '{DIMENSION_TABLES[dimension]}'" for text, code, dimension in mappings)
+    missing = ' OR '.join(f"NEW.{code} IS NULL AND NEW.{text} IS NOT NULL" for text, code, _ in mappings)
+    changed = ' OR '.join(f"NEW.{text} IS DISTINCT FROM OLD.{text}" for text, _, _ in mappings)
+    text_columns = ', '.join(text for text, _, _ in mappings)
+    return [
+        f"DROP TRIGGER IF EXISTS trg_{table}_dimension_codes ON {table}",
+        f"""
+        CREATE TRIGGER trg_{table}_dimension_codes
+            BEFORE INSERT ON {table}
+            FOR EACH ROW WHEN ({missing})
+            EXECUTE FUNCTION fill_dimension_codes({arguments})
+        """,
+        f"DROP TRIGGER IF EXISTS trg_{table}_dimension_codes_update ON {table}",
+        f"""
+        CREATE TRIGGER trg_{table}_dimension_codes_update
+            BEFORE UPDATE OF {text_columns} ON {table}
+            FOR EACH ROW WHEN ({changed})
+            EXECUTE FUNCTION fill_dimension_codes({arguments})
+        """,
+    ]
+
+
+def ensure_code_triggers(conn, table: str):
+    """テーブルを作り直した後（パーティションへの変換など）にコードを埋めるトリガーを作り直す"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regproc('fill_dimension_codes') IS NOT NULL AS exists")
+    row = cursor.fetchone()
+    if row['exists'] if isinstance(row, dict) else row[0]:
+        for ddl in _code_trigger_ddl(table):
+            cursor.execute(ddl)
+        conn.commit()
+    cursor.close()
+
+
+class DimensionCache:
+    """ディメンションの 文字列 <-> コード の対応をメモリに保持する
+
+    値の追加は投入時のみのため、キャッシュにない値を引いたときだけ読み直す。
+    コードはDBの *_code カラムから来るため、キャッシュにないコードは常に読み直す。
+    キャッシュにない文字列はディメンションにない値（検索条件の入力ミスなど）のこともあるため、
+    dim_* テーブルに1件問い合わせ、存在した場合だけ読み直す
+    """
+
+    def __init__(self, connect):
+        # connect: 引数なしで psycopg2 の接続を返す関数
+        self._connect = connect
+        self._codes: Dict[str, Dict[str, int]] = {}
+        self._names: Dict[str, Dict[int, str]] = {}
+        self._lock = threading.Lock()
+
+    def reload(self):
+        codes = {}
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            for dimension, table in DIMENSION_TABLES.items():
+                cursor.execute(f"SELECT to_regclass('{table}') IS NOT NULL AS exists")
+                row = cursor.fetchone()
+                if not (row['exists'] if isinstance(row, dict) else row[0]):
+                    codes[dimension] = {}
+                    continue
+                cursor.execute(f"SELECT id, name FROM {table}")
+                codes[dimension] = {
+                    (r['name'] if isinstance(r, dict) else r[1]): (r['id'] if isinstance(r, dict) else r[0])
+                    for r in cursor.fetchall()
+                }
+            cursor.close()
+        finally:
+            conn.close()
+        with self._lock:
+            self._codes = codes
+            self._names = {d: {c: n for n, c in m.items()} for d, m in codes.items()}
+
+    def _exists(self, dimension: str, name: str) -> bool:
+        """文字列がディメンションテーブルにあるか（キャッシュが古いかどうかの確認）"""
+        table = DIMENSION_TABLES[dimension]
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT to_regclass('{table}') IS NOT NULL AS exists")
+            row = cursor.fetchone()
+            found = False
+            if row['exists'] if isinstance(row, dict) else row[0]:
+                cursor.execute(f"SELECT 1 FROM {table} WHERE name = %s", (name,))
+                found = cursor.fetchone() is not None
+            cursor.close()
+            return found
+        finally:
+            conn.close()
+
+    def code(self, dimension: str, name: Optional[str]) -> Optional[int]:
+        """文字列のコード（ディメンションにない値は None）"""
+        if name is None:
+            return None
+        code = self._codes.get(dimension, {}).get(name)
+        cache_result('dimension', code is not None)
+        if code is None and (not self._codes or self._exists(dimension, name)):
+            self.reload()
+            code = self._codes.get(dimension, {}).get(name)
+        return code
+
+    def name(self, dimension: str, code: Optional[int]) -> Optional[str]:
+        """コードの文字列"""
+        if code is None:
+            return None
+        name = self._names.get(dimension, {}).get(code)
+        cache_result('dimension', name is not None)
+        if name is None:
+            self.reload()
+            name = self._names.get(dimension, {}).get(code)
+        return name
+
+
+_shared_cache: Optional[DimensionCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache(connect) -> DimensionCache:
+    """プロセスで1つの DimensionCache（最初に呼んだ側の connect を使う）"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = DimensionCache(connect)
+        return _shared_cache
@@ -0,0 +1,6 @@
+"""
+データ投入（ETL）パッケージ
+
+入力ソース（JSON / NDJSON / CSV）をバッチに分割し、複数プロセスで
+tenders_open / awards に投入する。実行入口は daily_batch.py
+"""
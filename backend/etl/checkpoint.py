@@ -0,0 +1,49 @@
+"""
+ETLのバッチ単位チェックポイント
+
+バッチの投入とチェックポイントの記録は同じトランザクションでコミットするため、
+中断後に同じソースで再実行すると、コミット済みのバッチを読み飛ばして再開できる
+（etl_checkpoints テーブルは migrations/0001_baseline.sql で作成する）
+"""
+from typing import Set
+
+
+def make_run_key(source_fingerprint: str, batch_size: int) -> str:
+    """ソースの識別子とバッチサイズから再開用のキーを作成
+
+    バッチ番号はバッチサイズに依存するため、サイズが変わった場合は別の実行として扱う
+    """
+    return f"{source_fingerprint}:batch={batch_size}"
+
+
+def completed_batches(conn, job_name: str, run_key: str) -> Set[int]:
+    """コミット済みのバッチ番号を取得"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT batch_no FROM etl_checkpoints WHERE job_name = %s AND run_key = %s",
+        (job_name, run_key)
+    )
+    batches = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return batches
+
+
+def record_batch(cursor, job_name: str, run_key: str, batch_no: int,
+                 record_count: int, inserted_count: int):
+    """バッチの完了を記録（呼び出し側のトランザクション内で実行）"""
+    cursor.execute("""
+        INSERT INTO etl_checkpoints (job_name, run_key, batch_no, record_count, inserted_count)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (job_name, run_key, batch_no)
+        DO UPDATE SET record_count = EXCLUDED.record_count,
+                      inserted_count = EXCLUDED.inserted_count,
+                      completed_at = CURRENT_TIMESTAMP
+    """, (job_name, run_key, batch_no, record_count, inserted_count))
+
+
+def clear_checkpoints(conn, job_name: str):
+    """ジョブのチェックポイントを削除（--restart 用）"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM etl_checkpoints WHERE job_name = %s", (job_name,))
+    conn.commit()
+    cursor.close()
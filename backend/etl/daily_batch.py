@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+ETLの実行入口
+
+既定では data/raw 配下の以下のファイルを投入する（存在しないファイルはスキップ）
+    tenders         mock_tender_data_224560.json -> tenders_open（差分同期）
+    awards          mock_award_data_2000.csv     -> awards
+    company_awards  company_award_history.csv    -> awards
+
+投入後に tenders_open のパーティションを整備し（翌月以降の作成、入札日を過ぎた月の tenders_archive への移動）、
+環境変数 DATA_SNAPSHOT_DIR が設定されている場合は DataLoader 用のスナップショットを書き出す
+
+バッチ単位でチェックポイントを記録するため、中断しても同じコマンドを再実行すれば
+未投入のバッチから再開する。ファイルが変わっていなければ再実行しても何もしない
+
+使い方:
+    python etl/daily_batch.py --once                       # 全ジョブを1回実行
+    python etl/daily_batch.py --once --job tenders --workers 4
+    python etl/daily_batch.py --once --source new.ndjson --target tenders
+    python etl/daily_batch.py --once --restart             # チェックポイントを破棄して再投入
+    python etl/daily_batch.py --at 02:00                   # 常駐して毎日02:00に実行
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# スクリプトとして実行された場合も backend 直下のモジュールを読み込めるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import psycopg2
+
+from dimensions import encode_missing
+from migrate import run_migrations
+from snapshot import export_snapshot
+from tender_partitions import run_maintenance
+
+from etl.pipeline import DEFAULT_BATCH_SIZE, EtlJob, print_summary, run_job
+from etl.sources import SOURCE_FORMATS, open_source
+from etl.targets import TARGETS
+
+# データファイルのディレクトリ（Docker環境では ./data が /app/data にマウントされる）
+if os.getenv('ETL_DATA_DIR'):
+    DATA_DIR = Path(os.getenv('ETL_DATA_DIR'))
+elif os.path.exists('/app/data/raw'):
+    DATA_DIR = Path('/app/data/raw')
+else:
+    DATA_DIR = Path(__file__).resolve().parent.parent.parent / 'data' / 'raw'
+
+# ジョブ名: (ファイル名, 投入先)
+DEFAULT_JOBS = {
+    'tenders': ('mock_tender_data_224560.json', 'tenders_sync'),
+    'awards': ('mock_award_data_2000.csv', 'awards'),
+    'company_awards': ('company_award_history.csv', 'awards'),
+}
+
+
+def build_jobs(args):
+    """コマンドライン引数から実行するジョブ一覧を作成"""
+    if args.source:
+        name = args.job[0] if args.job else f"{args.target}:{Path(args.source).name}"
+        return [EtlJob(name, open_source(args.source, args.format), args.target)]
+
+    jobs = []
+    for name in args.job or DEFAULT_JOBS:
+        file_name, target = DEFAULT_JOBS[name]
+        path = DATA_DIR / file_name
+        if not path.exists():
+            print(f"⚠️ [{name}] file not found, skipped: {path}")
+            continue
+        jobs.append(EtlJob(name, open_source(str(path)), target))
+    return jobs
+
+
+def run_once(args):
+    jobs = build_jobs(args)
+    if not jobs:
+        print("No ETL jobs to run")
+        return
+
+    start_time = time.time()
+    run_migrations(args.database_url)
+    print(f"🚀 ETL started: {len(jobs)} jobs, workers={args.workers}, batch_size={args.batch_size:,}")
+
+    results = []
+    try:
+        for job in jobs:
+            print(f"\n▶ {job.name}: {job.source} -> {TARGETS[job.target].table}")
+            results.append(run_job(job, args.database_url, workers=args.workers,
+                                   batch_size=args.batch_size, restart=args.restart))
+    except KeyboardInterrupt:
+        print("\n⏹ Interrupted. Committed batches are checkpointed; rerun the same command to resume")
+        print_summary(results)
+        sys.exit(130)
+
+    print_summary(results)
+
+    conn = psycopg2.connect(args.database_url)
+    try:
+        print()
+        encode_missing(conn)
+        run_maintenance(conn)
+        snapshot_dir = os.getenv('DATA_SNAPSHOT_DIR')
+        if snapshot_dir:
+            path = export_snapshot(conn, snapshot_dir)
+            print(f"\n📦 Snapshot written to {path}")
+    finally:
+        conn.close()
+
+    print(f"\n✅ ETL completed in {time.time() - start_time:.1f} seconds")
+
+
+def seconds_until(at: str) -> float:
+    """次の HH:MM までの秒数"""
+    hour, minute = (int(v) for v in at.split(':'))
+    now = datetime.now()
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入札・落札データのETL")
+    parser.add_argument('--once', action='store_true', help="1回だけ実行して終了")
+    parser.add_argument('--at', default='02:00', help="常駐時の毎日の実行時刻（HH:MM）")
+    parser.add_argument('--job', action='append', choices=list(DEFAULT_JOBS),
+                        help="実行するジョブ（複数指定可、既定は全ジョブ）")
+    parser.add_argument('--source', help="任意の入力ファイル（--target と併用）")
+    parser.add_argument('--target', choices=list(TARGETS), help="--source の投入先")
+    parser.add_argument('--format', choices=SOURCE_FORMATS, help="--source の形式（既定は拡張子で判定）")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="1バッチの件数")
+    parser.add_argument('--restart', action='store_true', help="チェックポイントを破棄して最初から投入")
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), help="既定は環境変数 DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+    if args.source and not args.target:
+        parser.error("--source requires --target")
+
+    if args.once:
+        run_once(args)
+        return
+
+    while True:
+        wait = seconds_until(args.at)
+        print(f"⏰ Next ETL run at {args.at} (in {wait / 3600:.1f} hours)")
+        time.sleep(wait)
+        try:
+            run_once(args)
+        except Exception as e:
+            print(f"❌ ETL failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
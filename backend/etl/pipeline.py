@@ -0,0 +1,203 @@
+"""
+ETLパイプライン本体
+
+メインプロセスがソースを逐次読み込んでバッチに分割し、ワーカープロセスが
+「変換 → COPY でステージング → ON CONFLICT でマージ → チェックポイント記録」
+を1バッチ1トランザクションで実行する。
+
+各段階の所要時間と件数を集計し、段階ごとのスループットを出力する
+"""
+import signal
+import time
+from collections import deque
+from multiprocessing import Pool
+from typing import Dict
+
+import psycopg2
+
+from migrate import apply_migrations
+from tender_stream import iter_batches
+
+from etl.checkpoint import (
+    clear_checkpoints, completed_batches, make_run_key, record_batch
+)
+from etl.targets import TARGETS
+
+DEFAULT_BATCH_SIZE = 5000
+
+# 変換エラーの詳細を出力する件数の上限（バッチごと）
+MAX_REPORTED_ERRORS = 3
+
+# ワーカープロセスごとのDB接続
+_conn = None
+
+
+class EtlJob:
+    def __init__(self, name: str, source, target: str):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target: {target}")
+        self.name = name
+        self.source = source
+        self.target = target
+
+    def __repr__(self):
+        return f"EtlJob({self.name}: {self.source} -> {self.target})"
+
+
+def _init_worker(database_url):
+    global _conn
+    # Ctrl+C はメインプロセスで受けてプールごと終了させる
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _conn = psycopg2.connect(database_url)
+
+
+def load_batch(task):
+    """1バッチを変換して投入し、チェックポイントを記録"""
+    job_name, run_key, target_name, batch_no, records = task
+    target = TARGETS[target_name]
+
+    transform_start = time.time()
+    rows = []
+    rejected = 0
+    for record in records:
+        try:
+            rows.append(target.to_row(record))
+        except (ValueError, TypeError) as e:
+            rejected += 1
+            if rejected <= MAX_REPORTED_ERRORS:
+                print(f"  ⚠️ [{job_name}] batch {batch_no}: skipped record ({e})")
+    transform_seconds = time.time() - transform_start
+
+    load_start = time.time()
+    cursor = _conn.cursor()
+    try:
+        counts = target.merge(cursor, rows)
+        record_batch(cursor, job_name, run_key, batch_no, len(records), counts.get('inserted', 0))
+        _conn.commit()
+    except Exception:
+        _conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    load_seconds = time.time() - load_start
+
+    return {
+        'batch_no': batch_no,
+        'records': len(records),
+        'inserted': counts.get('inserted', 0),
+        'updated': counts.get('updated', 0),
+        'unchanged': counts.get('unchanged', 0),
+        'archived': counts.get('archived', 0),
+        'rejected': rejected,
+        'transform_seconds': transform_seconds,
+        'load_seconds': load_seconds,
+    }
+
+
+def _timed(iterator, stats: Dict, key: str):
+    """イテレータの各要素の取得にかかった時間を stats[key] に加算"""
+    iterator = iter(iterator)
+    while True:
+        start = time.time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats[key] += time.time() - start
+            return
+        stats[key] += time.time() - start
+        yield item
+
+
+def run_job(job: EtlJob, database_url: str, workers: int = 1,
+            batch_size: int = DEFAULT_BATCH_SIZE, restart: bool = False) -> Dict:
+    """ジョブを実行して集計結果を返す"""
+    target = TARGETS[job.target]
+    run_key = make_run_key(job.source.fingerprint(), batch_size)
+
+    conn = psycopg2.connect(database_url)
+    try:
+        # etl_checkpoints・tender_change_log の作成と tenders_open のパーティション化
+        apply_migrations(conn)
+        if restart:
+            clear_checkpoints(conn, job.name)
+        done = completed_batches(conn, job.name, run_key)
+    finally:
+        conn.close()
+
+    stats = {
+        'job': job.name, 'table': target.table,
+        'records': 0, 'skipped': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0,
+        'archived': 0, 'rejected': 0, 'batches': 0,
+        'parse_seconds': 0.0, 'transform_seconds': 0.0, 'load_seconds': 0.0,
+    }
+    if done:
+        print(f"  ↩️ [{job.name}] resuming: {len(done)} batches already committed")
+
+    def collect(result):
+        stats['batches'] += 1
+        stats['records'] += result['records']
+        for key in ('inserted', 'updated', 'unchanged', 'archived'):
+            stats[key] += result[key]
+        stats['rejected'] += result['rejected']
+        stats['transform_seconds'] += result['transform_seconds']
+        stats['load_seconds'] += result['load_seconds']
+        if stats['batches'] % 10 == 0:
+            print(f"  [{job.name}] {stats['records'] + stats['skipped']:,} records processed...")
+
+    start_time = time.time()
+    batches = _timed(iter_batches(job.source.iter_records(), batch_size), stats, 'parse_seconds')
+
+    # 投入待ちのバッチ数を制限し、メモリ使用量を一定に保つ
+    max_pending = max(1, workers) * 2
+    with Pool(processes=max(1, workers), initializer=_init_worker, initargs=(database_url,)) as pool:
+        pending = deque()
+        for batch_no, records in enumerate(batches):
+            if batch_no in done:
+                stats['skipped'] += len(records)
+                continue
+            pending.append(pool.apply_async(
+                load_batch, ((job.name, run_key, job.target, batch_no, records),)
+            ))
+            while len(pending) >= max_pending:
+                collect(pending.popleft().get())
+        while pending:
+            collect(pending.popleft().get())
+
+    conn = psycopg2.connect(database_url)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"ANALYZE {target.table}")
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    stats['elapsed_seconds'] = time.time() - start_time
+    return stats
+
+
+def _rate(rows, seconds):
+    return f"{rows / seconds:>12,.0f}" if seconds > 0 else f"{'-':>12}"
+
+
+def print_summary(results):
+    """ジョブ・段階ごとのスループットを出力
+
+    transform / load はワーカーの処理時間の合計（並列実行時は経過時間より長くなる）
+    """
+    print("\n📊 ETL summary")
+    for stats in results:
+        parsed = stats['records'] + stats['skipped']
+        print(f"  {stats['job']} -> {stats['table']}")
+        print(f"    {'stage':<11}{'rows':>10}{'seconds':>10}{'rows/sec':>12}")
+        print(f"    {'parse':<11}{parsed:>10,}{stats['parse_seconds']:>10.1f}"
+              f"{_rate(parsed, stats['parse_seconds'])}")
+        print(f"    {'transform':<11}{stats['records']:>10,}{stats['transform_seconds']:>10.1f}"
+              f"{_rate(stats['records'], stats['transform_seconds'])}")
+        print(f"    {'load':<11}{stats['records']:>10,}{stats['load_seconds']:>10.1f}"
+              f"{_rate(stats['records'], stats['load_seconds'])}")
+        print(f"    {'total':<11}{parsed:>10,}{stats['elapsed_seconds']:>10.1f}"
+              f"{_rate(parsed, stats['elapsed_seconds'])}")
+        print(f"    → {stats['inserted']:,} inserted, {stats['updated']:,} updated, "
+              f"{stats['unchanged']:,} unchanged, {stats['archived']:,} archived (past bid date), "
+              f"{stats['skipped']:,} skipped (checkpoint), {stats['rejected']:,} rejected")
@@ -0,0 +1,77 @@
+"""
+ETLの入力ソース
+
+各ソースはレコード（dict）を1件ずつ返す iter_records() を持つ。
+どのソースもファイル全体をメモリに載せずに読み進める
+"""
+import csv
+import os
+from typing import Dict, Iterator
+
+from tender_stream import iter_tender_records
+
+SOURCE_FORMATS = ('json', 'ndjson', 'csv')
+
+
+class FileSource:
+    """ファイルを入力とするソースの基底クラス"""
+    format = None
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fingerprint(self) -> str:
+        """ファイルの識別子（パス・サイズ・更新時刻）
+
+        チェックポイントはこの値ごとに記録されるため、
+        ファイルが差し替えられた場合は最初から投入し直す
+        """
+        stat = os.stat(self.path)
+        return f"{os.path.abspath(self.path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    def iter_records(self) -> Iterator[Dict]:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.path})"
+
+
+class JSONSource(FileSource):
+    """JSON配列ファイル（逐次デコード）"""
+    format = 'json'
+
+    def iter_records(self) -> Iterator[Dict]:
+        return iter_tender_records(self.path)
+
+
+class NDJSONSource(JSONSource):
+    """1行1レコードのNDJSONファイル"""
+    format = 'ndjson'
+
+
+class CSVSource(FileSource):
+    """ヘッダー付きCSVファイル（BOM付きUTF-8に対応）"""
+    format = 'csv'
+
+    def __init__(self, path: str, encoding: str = 'utf-8-sig'):
+        super().__init__(path)
+        self.encoding = encoding
+
+    def iter_records(self) -> Iterator[Dict]:
+        with open(self.path, 'r', encoding=self.encoding, newline='') as f:
+            yield from csv.DictReader(f)
+
+
+def open_source(path: str, format: str = None) -> FileSource:
+    """パスと形式からソースを作成（形式未指定の場合は拡張子で判定）"""
+    if format is None:
+        ext = os.path.splitext(path)[1].lower().lstrip('.')
+        format = {'jsonl': 'ndjson'}.get(ext, ext)
+
+    if format == 'json':
+        return JSONSource(path)
+    if format == 'ndjson':
+        return NDJSONSource(path)
+    if format == 'csv':
+        return CSVSource(path)
+    raise ValueError(f"Unsupported source format: {format} ({path})")
@@ -0,0 +1,78 @@
+"""
+ETLの投入先テーブル定義
+
+各ターゲットは「テーブル名・投入カラム・重複判定キー・レコード→行の変換関数」を持つ。
+既定の投入方法は既存キーを読み飛ばす追記（ON CONFLICT DO NOTHING）で、
+merge を指定したターゲットは独自の方法で投入する（tenders_sync は差分同期）
+"""
+from typing import Callable, Dict, List, Tuple
+
+from bulk_loader import TENDER_COLUMNS, partitioned_tender_row, stage_and_merge
+from tender_sync import sync_tender_rows
+
+# awards の投入対象カラム（CSVのヘッダー名と同じ）
+AWARD_COLUMNS = [
+    'award_id', 'tender_id', 'project_name', 'contractor', 'contractor_id',
+    'contract_amount', 'contract_date', 'participants_count', 'prefecture',
+    'municipality', 'use_type', 'floor_area_m2', 'bid_method', 'evaluation_score',
+    'price_score', 'estimated_price', 'win_rate', 'jv_partner'
+]
+
+_AWARD_INT_COLUMNS = {'contract_amount', 'participants_count', 'estimated_price'}
+_AWARD_FLOAT_COLUMNS = {'floor_area_m2', 'evaluation_score', 'price_score', 'win_rate'}
+
+
+def _blank_to_none(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def award_to_row(record: Dict) -> Tuple:
+    """落札実績CSVの1行を AWARD_COLUMNS 順のタプルに変換
+
+    CSVに存在しないカラムは NULL。数値に変換できない値は ValueError
+    """
+    row = []
+    for column in AWARD_COLUMNS:
+        value = _blank_to_none(record.get(column))
+        if value is not None:
+            if column in _AWARD_INT_COLUMNS:
+                value = int(float(value))
+            elif column in _AWARD_FLOAT_COLUMNS:
+                value = float(value)
+        row.append(value)
+    return tuple(row)
+
+
+class Target:
+    def __init__(self, name: str, table: str, columns: List[str], conflict_column: str,
+                 to_row: Callable[[Dict], Tuple], merge: Callable = None, partition_column: str = None):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.conflict_column = conflict_column
+        self.to_row = to_row
+        self._merge = merge
+        # パーティションキー（値が変わった既存行は削除してから投入する）
+        self.partition_column = partition_column
+
+    def merge(self, cursor, rows: List[Tuple]) -> Dict:
+        """変換済みの行を投入し、件数（inserted / updated / unchanged）を返す"""
+        if self._merge:
+            return self._merge(cursor, rows)
+        _, inserted = stage_and_merge(cursor, self.table, self.columns, rows, self.conflict_column,
+                                      partition_column=self.partition_column)
+        return {'inserted': inserted}
+
+
+TARGETS = {
+    'tenders': Target('tenders', 'tenders_open', TENDER_COLUMNS, 'tender_id', partitioned_tender_row,
+                      partition_column='bid_date'),
+    'tenders_sync': Target('tenders_sync', 'tenders_open', TENDER_COLUMNS, 'tender_id', partitioned_tender_row,
+                           merge=sync_tender_rows),
+    'awards': Target('awards', 'awards', AWARD_COLUMNS, 'award_id', award_to_row),
+}
@@ -0,0 +1,140 @@
+"""
+HTTP の条件付きリクエスト（ETag / Last-Modified）
+
+読み取り中心のエンドポイントの応答に、data_versions（投入のたびにトリガーで進む）から作った
+ETag・Last-Modified と Cache-Control を付ける。If-None-Match / If-Modified-Since が一致すれば
+応答を作らずに 304 を返すため、ブラウザや前段のプロキシが繰り返しのリクエストを吸収できる
+
+data_versions は DATA_VERSION_TTL 秒ごとにしか読み直さないため、投入後の反映はその分遅れる
+"""
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from data_version import get_data_version_info
+from database import engine
+from metrics import cache_result
+
+DATA_VERSION_TTL = float(os.getenv('DATA_VERSION_TTL', '5'))
+DEFAULT_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '60'))
+
+
+class CacheValidators(NamedTuple):
+    etag: str
+    last_modified: Optional[float]
+    max_age: int
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            'ETag': self.etag,
+            'Cache-Control': f'public, max-age={self.max_age}',
+        }
+        if self.last_modified:
+            headers['Last-Modified'] = formatdate(self.last_modified, usegmt=True)
+        return headers
+
+
+class _DataVersionCache:
+    """data_versions を TTL 付きで保持する"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._info = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict:
+        with self._lock:
+            if self._info is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._info
+        conn = engine.raw_connection()
+        try:
+            info = get_data_version_info(conn)
+        finally:
+            conn.close()
+        with self._lock:
+            self._info = info
+            self._loaded_at = time.monotonic()
+        return info
+
+
+_versions = _DataVersionCache(DATA_VERSION_TTL)
+
+
+def dataset_version(dataset: str) -> Optional[int]:
+    """データセットの現在のバージョン（プロセス内キャッシュの鮮度判定用。取得できない場合は None）"""
+    try:
+        info = _versions.get()
+    except Exception as e:
+        print(f"⚠️ Could not read data versions: {e}")
+        return None
+    entry = info.get(dataset)
+    return entry[0] if entry is not None else None
+
+
+def validators_for(datasets: Iterable[str], max_age: int = DEFAULT_MAX_AGE) -> Optional[CacheValidators]:
+    """データセットの現在のバージョンから ETag と Last-Modified を作る（取得できない場合は None）"""
+    try:
+        info = _versions.get()
+    except Exception as e:
+        print(f"⚠️ Could not read data versions: {e}")
+        return None
+
+    datasets = list(datasets)
+    if not all(dataset in info for dataset in datasets):
+        return None
+    tag = '-'.join(f"{dataset}.{info[dataset][0]}" for dataset in datasets)
+    last_modified = max(info[dataset][1] for dataset in datasets) or None
+    # 圧縮の有無で本文が変わるため弱い ETag
+    return CacheValidators(f'W/"{tag}"', last_modified, max_age)
+
+
+def validators_for_content(content: bytes, max_age: int) -> CacheValidators:
+    """データに依存しない固定の応答の ETag（本文のハッシュ）"""
+    return CacheValidators(f'W/"{hashlib.sha256(content).hexdigest()[:16]}"', None, max_age)
+
+
+def _etag_value(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def is_not_modified(request: Request, validators: Optional[CacheValidators]) -> bool:
+    """クライアントのキャッシュが最新か（If-None-Match を優先し、なければ If-Modified-Since）"""
+    fresh = _is_fresh(request, validators)
+    cache_result('http_conditional', fresh)
+    return fresh
+
+
+def _is_fresh(request: Request, validators: Optional[CacheValidators]) -> bool:
+    if validators is None:
+        return False
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        current = _etag_value(validators.etag)
+        return any(_etag_value(tag) == current for tag in if_none_match.split(','))
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and validators.last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(validators.last_modified) <= since
+    return False
+
+
+def not_modified(validators: CacheValidators) -> Response:
+    return Response(status_code=304, headers=validators.headers())
+
+
+def cache_headers(validators: Optional[CacheValidators]) -> Dict[str, str]:
+    return validators.headers() if validators is not None else {}
@@ -0,0 +1,136 @@
+"""
+JSONレスポンスの高速化と圧縮
+
+- FastJSONResponse: orjson でシリアライズする（アプリ全体の既定のレスポンスクラス）。
+  検証済みの dict / list をこのクラスで直接返すと、FastAPI の jsonable_encoder と
+  response_model による再検証を経由しない
+- CompressionMiddleware: Accept-Encoding に応じて br（brotli がインストールされている場合）または
+  gzip で圧縮する。MIN_COMPRESS_SIZE バイト未満の応答と、ストリーミング応答は圧縮しない
+"""
+import datetime
+import decimal
+import gzip
+import os
+import uuid
+from typing import Any
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli は任意（なければ gzip のみ）
+    brotli = None
+
+MIN_COMPRESS_SIZE = int(os.getenv('RESPONSE_COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# 圧縮しても小さくならない形式
+_INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip')
+
+
+def _default(obj: Any):
+    """orjson が直接扱えない型の変換（jsonable_encoder と同じ結果にする）"""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson でシリアライズする JSONResponse"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def choose_encoding(accept_encoding: str):
+    """Accept-Encoding から使う圧縮方式を選ぶ（br を優先、q=0 は除外）"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """一括で送られる応答本文を、クライアントが対応する方式で圧縮する ASGI ミドルウェア"""
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                # 本文を見るまで送らない
+                start_message = message
+                return
+            if message['type'] != 'http.response.body' or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start['headers'])
+            body = message.get('body', b'')
+            if (message.get('more_body', False)
+                    or len(body) < self.minimum_size
+                    or 'content-encoding' in headers
+                    or headers.get('content-type', '').startswith(_INCOMPRESSIBLE_TYPES)):
+                await send(start)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+            headers['Content-Length'] = str(len(body))
+            headers.add_vary_header('Accept-Encoding')
+            await send(start)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
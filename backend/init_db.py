@@ -12,6 +12,8 @@ from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+from load_company_awards import award_frame_to_rows, transform_award_frame
+
 # 環境変数を読み込み
 load_dotenv()
 
@@ -115,26 +117,7 @@ def load_award_data(conn):
     df = pd.read_csv(csv_path)
     
     # データを準備
-    data = []
-    for _, row in df.iterrows():
-        data.append((
-            row.get('tender_id'),
-            row.get('project_name'),
-            row.get('publisher'),
-            row.get('prefecture'),
-            row.get('municipality'),
-            row.get('address'),
-            row.get('use_type'),
-            row.get('method'),
-            float(row.get('floor_area_m2', 0)) if pd.notna(row.get('floor_area_m2')) else None,
-            pd.to_datetime(row.get('award_date')).date() if pd.notna(row.get('award_date')) else None,
-            row.get('contractor'),
-            int(row.get('award_amount_jpy', 0)) if pd.notna(row.get('award_amount_jpy')) else None,
-            int(row.get('estimated_price_jpy', 0)) if pd.notna(row.get('estimated_price_jpy')) else None,
-            float(row.get('win_rate', 0)) if pd.notna(row.get('win_rate')) else None,
-            int(row.get('participants_count', 0)) if pd.notna(row.get('participants_count')) else None,
-            float(row.get('technical_score', 0)) if pd.notna(row.get('technical_score')) else None
-        ))
+    data = award_frame_to_rows(transform_award_frame(df))
     
     # バルクインサート
     query = """
@@ -217,26 +200,7 @@ def load_company_award_history(conn):
     df = pd.read_csv(csv_path)
     
     # awardsテーブルにデータを追加（company_award_historyは落札実績データ）
-    data = []
-    for _, row in df.iterrows():
-        data.append((
-            row.get('tender_id'),
-            row.get('project_name'),
-            row.get('publisher'),
-            row.get('prefecture'),
-            row.get('municipality'),
-            row.get('address'),
-            row.get('use_type'),
-            row.get('method'),
-            float(row.get('floor_area_m2', 0)) if pd.notna(row.get('floor_area_m2')) else None,
-            pd.to_datetime(row.get('award_date')).date() if pd.notna(row.get('award_date')) else None,
-            row.get('contractor', '星田建設株式会社'),  # デフォルトで自社名を設定
-            int(row.get('award_amount_jpy', 0)) if pd.notna(row.get('award_amount_jpy')) else None,
-            int(row.get('estimated_price_jpy', 0)) if pd.notna(row.get('estimated_price_jpy')) else None,
-            float(row.get('win_rate', 0)) if pd.notna(row.get('win_rate')) else None,
-            int(row.get('participants_count', 0)) if pd.notna(row.get('participants_count')) else None,
-            float(row.get('technical_score', 0)) if pd.notna(row.get('technical_score')) else None
-        ))
+    data = award_frame_to_rows(transform_award_frame(df, default_contractor='星田建設株式会社'))
     
     # バルクインサート
     query = """
@@ -4,6 +4,7 @@ company_award_history.csvをデータベースに投入するスクリプト
 """
 
 import os
+import numpy as np
 import pandas as pd
 import psycopg2
 from psycopg2.extras import execute_values
@@ -13,6 +14,56 @@ from urllib.parse import urlparse
 # 環境変数を読み込み
 load_dotenv()
 
+# awards テーブル（Azure版スキーマ）の投入カラム
+AWARD_TABLE_COLUMNS = [
+    'tender_id', 'project_name', 'publisher', 'prefecture', 'municipality',
+    'address', 'use_type', 'method', 'floor_area_m2', 'award_date',
+    'contractor', 'award_amount_jpy', 'estimated_price_jpy', 'win_rate',
+    'participants_count', 'technical_score'
+]
+
+# 投入カラムに対応するCSVのカラム（先に見つかったものを使用）
+AWARD_COLUMN_SOURCES = {
+    'award_date': ['contract_date', 'award_date'],
+    'method': ['bid_method', 'method'],
+    'award_amount_jpy': ['contract_amount', 'award_amount_jpy'],
+    'estimated_price_jpy': ['estimated_price', 'estimated_price_jpy'],
+    'technical_score': ['evaluation_score', 'technical_score'],
+}
+
+AWARD_INT_COLUMNS = ['award_amount_jpy', 'estimated_price_jpy', 'participants_count']
+AWARD_FLOAT_COLUMNS = ['floor_area_m2', 'win_rate', 'technical_score']
+
+BATCH_SIZE = 1000
+
+def transform_award_frame(df, default_contractor=None):
+    """落札実績CSVのDataFrameを awards テーブルの列構成に変換
+    
+    行ごとのループは使わず、列単位で変換する
+    - カラム名を awards のスキーマに合わせる
+    - 日付・数値は変換できない値を欠損値にする
+    """
+    out = pd.DataFrame(index=df.index)
+    for column in AWARD_TABLE_COLUMNS:
+        sources = [c for c in AWARD_COLUMN_SOURCES.get(column, [column]) if c in df.columns]
+        out[column] = df[sources[0]] if sources else None
+    
+    if default_contractor and 'contractor' not in df.columns:
+        out['contractor'] = default_contractor
+    
+    out['award_date'] = pd.to_datetime(out['award_date'], errors='coerce').dt.date
+    for column in AWARD_INT_COLUMNS:
+        out[column] = np.trunc(pd.to_numeric(out[column], errors='coerce')).astype('Int64')
+    for column in AWARD_FLOAT_COLUMNS:
+        out[column] = pd.to_numeric(out[column], errors='coerce').astype('float64')
+    
+    return out
+
+def award_frame_to_rows(frame):
+    """変換済みDataFrameを挿入用のタプルのリストに変換（欠損値は None = NULL）"""
+    values = frame.astype(object).where(frame.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
 def get_db_connection():
     """データベース接続を取得"""
     database_url = os.getenv('DATABASE_URL')
@@ -49,35 +100,8 @@ def load_company_awards(conn):
     print(f"Found {len(df)} company award records")
     print(f"Columns: {df.columns.tolist()}")
     
-    # データを準備
-    data = []
-    for _, row in df.iterrows():
-        # 日付の処理
-        award_date = None
-        if pd.notna(row.get('contract_date')):
-            try:
-                award_date = pd.to_datetime(row['contract_date']).date()
-            except:
-                pass
-        
-        data.append((
-            row.get('tender_id'),
-            row.get('project_name'),
-            None,  # publisher (CSVにない)
-            row.get('prefecture'),
-            row.get('municipality'),
-            None,  # address (CSVにない)
-            row.get('use_type'),
-            row.get('bid_method', row.get('method')),
-            float(row.get('floor_area_m2', 0)) if pd.notna(row.get('floor_area_m2')) else None,
-            award_date,
-            row.get('contractor', '星田建設株式会社'),
-            int(row.get('contract_amount', 0)) if pd.notna(row.get('contract_amount')) else None,
-            int(row.get('estimated_price', 0)) if pd.notna(row.get('estimated_price')) else None,
-            float(row.get('win_rate', 0)) if pd.notna(row.get('win_rate')) else None,
-            int(row.get('participants_count', 0)) if pd.notna(row.get('participants_count')) else None,
-            float(row.get('evaluation_score', row.get('technical_score', 0))) if pd.notna(row.get('evaluation_score', row.get('technical_score'))) else None
-        ))
+    # データを準備（列単位で変換）
+    data = award_frame_to_rows(transform_award_frame(df, default_contractor='星田建設株式会社'))
     
     # バルクインサート
     query = """
@@ -90,7 +114,7 @@ def load_company_awards(conn):
         ON CONFLICT DO NOTHING
     """
     
-    execute_values(cursor, query, data)
+    execute_values(cursor, query, data, page_size=BATCH_SIZE)
     conn.commit()
     print(f"Successfully loaded {len(data)} company award records")
 
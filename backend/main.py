@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import List, Optional
@@ -21,13 +21,18 @@ import database
 # 既存のPydanticモデル
 from old_models import (
     TenderSearch, PredictionRequest, BulkPredictionRequest,
-    PredictionResponse, TenderInfo
+    PredictionResponse, TenderInfo, OptimalBidRequest, OptimalBidResponse
 )
-from data_loader import DataLoader
+from data_loader import DataLoader, format_search_results
 from predictor import BidPredictor
+from http_responses import CompressionMiddleware, FastJSONResponse
+import http_cache
+import metrics
 
 # ルーター
-from routers import auth_router, csv_upload_router, company_router
+from routers import auth_router, csv_upload_router, company_router, opportunity_router
+import migrate
+from warmup import WarmUp
 
 # テーブル作成はスキップ（既にPostgreSQLで1_init.sqlで作成済み）
 # db_models.Base.metadata.create_all(bind=engine)
@@ -41,7 +46,8 @@ from routers import auth_router, csv_upload_router, company_router
 app = FastAPI(
     title="建築入札インテリジェンス・システム",
     description="AI駆動型入札分析システム",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 app.add_middleware(
@@ -53,13 +59,87 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-data_loader = DataLoader()
+# 大きな応答（案件検索・一括予測）は gzip / br で圧縮
+app.add_middleware(CompressionMiddleware)
+
+# ルートごとのリクエスト数・応答時間（最後に追加し、圧縮を含めた時間を計測する）
+app.add_middleware(metrics.MetricsMiddleware)
+
+# import 時には DB への接続・データの読み込みを行わない（起動後のウォームアップで読み込む）
+data_loader = DataLoader(preload=False)
 predictor = BidPredictor(data_loader)
+warm_up = WarmUp()
+
+
+def _snapshot_bytes():
+    return data_loader.snapshot.size_bytes() if data_loader.snapshot is not None else 0
+
+
+def _loaded_records():
+    return {
+        ('awards',): len(data_loader.award_data or []),
+        ('company_awards',): len(data_loader.company_data or []),
+        ('tenders',): len(data_loader.tender_data or []),
+    }
+
+
+metrics.Gauge('dataloader_snapshot_bytes', 'Size of the data snapshot in use (0 when loaded from the database)',
+              function=_snapshot_bytes)
+metrics.Gauge('dataloader_records', 'Records held in memory by the DataLoader', ('dataset',),
+              function=_loaded_records)
+metrics.Gauge('app_ready', '1 once the background warm-up has finished', function=lambda: int(warm_up.ready))
 
 # ルーターを登録
 app.include_router(auth_router.router)
 app.include_router(csv_upload_router.router)
 app.include_router(company_router.router)
+app.include_router(opportunity_router.router)
+
+# --- 起動後のウォームアップ（登録順に実行。/health/ready は完了まで 503） ---
+
+@warm_up.step("migrations", required=False)
+def apply_schema_migrations():
+    """未適用のスキーママイグレーション（migrations/）を適用"""
+    migrate.run_migrations(database.DATABASE_URL)
+
+@warm_up.step("data")
+def load_data():
+    """落札・案件データの読み込み（スナップショットまたはDB）"""
+    data_loader.preload()
+    if data_loader.snapshot_dir and data_loader.snapshot_managed:
+        # serve.py のワーカーとして起動された場合、ローダーが公開するスナップショットに追従する
+        data_loader.start_snapshot_watcher(float(os.getenv('SNAPSHOT_POLL_INTERVAL', '1')))
+
+@warm_up.step("dimensions", required=False)
+def load_dimensions():
+    data_loader.dimensions.reload()
+
+@warm_up.step("ai_analyzer", required=False)
+def init_ai_analyzer():
+    """AIAnalyzer の作成（openai の import）"""
+    predictor.init_ai_analyzer()
+
+@warm_up.step("csv_import_worker", required=False)
+def start_csv_import_worker():
+    """CSV取り込みワーカーの準備（pandas の import と未完了アップロードの再投入）"""
+    import csv_import_worker
+    if os.getenv('CSV_IMPORT_RECOVERY_MANAGED') != '1':
+        # serve.py のワーカーとして起動された場合、再投入はローダーが1回だけ行う
+        csv_import_worker.recover_pending_uploads()
+
+@app.on_event("startup")
+async def start_warm_up():
+    warm_up.start()
+
+@app.get("/health/live", include_in_schema=False)
+async def health_live():
+    """プロセスが応答できるか（ウォームアップ中も 200）"""
+    return {"status": "alive"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready():
+    """リクエストを受け付けられるか（ウォームアップが完了するまで 503）"""
+    return FastJSONResponse(warm_up.status(), status_code=200 if warm_up.ready else 503)
 
 # OAuth2-compatible login endpoint for form data
 @app.post("/token")
@@ -68,11 +148,11 @@ async def login_for_access_token(
     db: Session = Depends(database.get_db)
 ):
     """OAuth2 compatible login endpoint that accepts form data"""
-    from auth import authenticate_company, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+    from auth import authenticate_company_async, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
     from datetime import timedelta
     
     # Authenticate using email/username as email
-    company = authenticate_company(db, form_data.username, form_data.password)
+    company = await authenticate_company_async(db, form_data.username, form_data.password)
     if not company:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -95,6 +175,11 @@ async def login_for_access_token(
         "email": company.email
     }
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus のテキスト形式のメトリクス"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 def read_root():
     return {
@@ -109,13 +194,19 @@ def read_root():
             "/tenders/search - 案件検索",
             "/tenders/{tender_id} - 案件詳細",
             "/predict - 勝率予測",
-            "/predict-bulk - 一括予測"
+            "/predict-bulk - 一括予測",
+            "/predict/optimal-bid - 最適入札額の推奨",
+            "/opportunities/top - 有望案件ランキング"
         ]
     }
 
 @app.get("/filters/options")
-def get_filter_options():
+def get_filter_options(request: Request, response: Response):
     """フィルタオプションを取得"""
+    validators = http_cache.validators_for(['tenders_open'])
+    if http_cache.is_not_modified(request, validators):
+        return http_cache.not_modified(validators)
+    response.headers.update(http_cache.cache_headers(validators))
     try:
         return data_loader.get_filter_options()
     except Exception as e:
@@ -123,6 +214,7 @@ def get_filter_options():
 
 @app.get("/tenders/search")
 def search_tenders(
+    request: Request,
     prefecture: Optional[str] = None,
     municipality: Optional[str] = None,
     use_type: Optional[str] = None,
@@ -130,6 +222,9 @@ def search_tenders(
     max_price: Optional[int] = None,
     bid_method: Optional[str] = None
 ):
+    validators = http_cache.validators_for(['tenders_open'])
+    if http_cache.is_not_modified(request, validators):
+        return http_cache.not_modified(validators)
     try:
         filters = {}
         if prefecture:
@@ -149,29 +244,13 @@ def search_tenders(
         
         # 既に辞書のリストが返ってくるので、そのまま返す
         if not results:
-            return []
+            return FastJSONResponse([], headers=http_cache.cache_headers(validators))
         
-        # 日付フォーマットの処理
-        for result in results:
-            # 日付型を文字列に変換
-            if result.get('bid_date'):
-                result['bid_date'] = result['bid_date'].strftime('%Y-%m-%d') if result['bid_date'] else ''
-            if result.get('notice_date'):
-                result['notice_date'] = result['notice_date'].strftime('%Y-%m-%d') if result['notice_date'] else ''
-            
-            # Noneをデフォルト値に変換
-            result['floor_area_m2'] = result.get('floor_area_m2') or 0
-            result['estimated_price'] = result.get('estimated_price') or 0
-            result['minimum_price'] = result.get('minimum_price') or 0
-            result['jv_allowed'] = result.get('jv_allowed') or False
-            
-            # 文字列のNoneを空文字に
-            for key in ['tender_id', 'title', 'publisher', 'prefecture', 'municipality', 
-                       'address_text', 'use_type', 'bid_method', 'origin_url']:
-                if key in result and result[key] is None:
-                    result[key] = ''
+        # 日付を文字列に、None を既定値に整形
+        format_search_results(results)
         
-        return results
+        # 整形済みの dict をそのまま orjson でシリアライズ（jsonable_encoder を通さない）
+        return FastJSONResponse(results, headers=http_cache.cache_headers(validators))
     except Exception as e:
         print(f"Error in search_tenders: {e}")
         import traceback
@@ -179,10 +258,15 @@ def search_tenders(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/tenders/{tender_id}", response_model=TenderInfo)
-def get_tender(tender_id: str):
+def get_tender(tender_id: str, request: Request, response: Response):
+    # アーカイブへの移動も tenders_open のバージョンを進めるため、tenders_open のみで判定できる
+    validators = http_cache.validators_for(['tenders_open'])
+    if http_cache.is_not_modified(request, validators):
+        return http_cache.not_modified(validators)
     tender = data_loader.get_tender_by_id(tender_id)
     if not tender:
         raise HTTPException(status_code=404, detail="Tender not found")
+    response.headers.update(http_cache.cache_headers(validators))
     return tender
 
 @app.post("/predict", response_model=PredictionResponse)
@@ -192,7 +276,8 @@ def predict_single(request: PredictionRequest):
         result = predictor.predict_single(
             request.tender_id,
             request.bid_amount,
-            request.company_name
+            request.company_name,
+            mode=request.mode
         )
         print(f"Predict result: {result}")
         return result
@@ -225,16 +310,38 @@ def predict_bulk(request: BulkPredictionRequest):
             request.company_name,
             use_ratio=request.use_ratio,
             min_price=request.min_price,
-            max_price=request.max_price
+            max_price=request.max_price,
+            mode=request.mode
         )
         print(f"Bulk prediction results: {len(results) if results else 0} items")
-        return results
+        # predictor の結果は PredictionResponse と同じ形のため、再検証せずにシリアライズする
+        # （response_model は API ドキュメント用）
+        return FastJSONResponse(results or [])
     except Exception as e:
         print(f"Error in predict_bulk: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/optimal-bid", response_model=OptimalBidResponse)
+def predict_optimal_bid(request: OptimalBidRequest):
+    """期待利益が最大となる入札額を推奨"""
+    try:
+        return predictor.recommend_optimal_bid(
+            request.tender_id,
+            request.cost_estimate,
+            request.company_name,
+            mode=request.mode,
+            grid_points=request.grid_points
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"Error in predict_optimal_bid: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/company/strengths")
 def get_company_strengths(company_name: Optional[str] = None):
     try:
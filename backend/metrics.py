@@ -0,0 +1,257 @@
+"""
+プロセス内のメトリクス（Prometheus のテキスト形式で /metrics から公開）
+
+カウンタ・ゲージ・ヒストグラムはラベルの組ごとにメモリ上で集計し、スクレイプ時に文字列化する。
+値の更新はロック1回と辞書の更新のみのため、リクエストや DB 呼び出しごとに記録しても負荷は小さい。
+値はワーカープロセスごとに独立している（複数ワーカー時はプロセスごとにスクレイプする）
+"""
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 応答時間・処理時間の既定のバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List['_Metric'] = []
+_registry_lock = threading.Lock()
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Tuple = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Gauge(_Metric):
+    """値を設定するゲージ。function を渡した場合はスクレイプ時に呼び出して値を得る
+
+    function はラベルなしなら数値、ラベルありなら {ラベル値のタプル: 数値} を返す
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception as e:
+                print(f"⚠️ Metric {self.name} could not be collected: {e}")
+                return []
+            values = result if self.labelnames else {(): result}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items()) if value is not None]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの組 -> [バケットごとの件数（累積ではない）..., +Inf, 合計]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        lines = []
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', _format_value(bound)),))} "
+                             f"{_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}")
+        return lines
+
+
+def instrument(histogram: Histogram, errors: Optional[Counter] = None):
+    """関数の処理時間を method=関数名 のラベルで記録するデコレータ（例外は errors に数える）"""
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(method=name)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, method=name)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    """全メトリクスを Prometheus のテキスト形式で出力"""
+    with _registry_lock:
+        metrics = list(_registry)
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# --- 共通のメトリクス -------------------------------------------------------
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route template, method and status', ('route', 'method', 'status'))
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template', ('route', 'method'))
+
+DATALOADER_SECONDS = Histogram(
+    'dataloader_call_duration_seconds', 'DataLoader method latency (count is the number of calls)', ('method',))
+DATALOADER_ERRORS = Counter(
+    'dataloader_call_errors_total', 'DataLoader method calls that raised', ('method',))
+
+AI_REQUEST_SECONDS = Histogram(
+    'ai_request_duration_seconds', 'Azure OpenAI request latency', ('operation',),
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0))
+AI_TOKENS = Counter('ai_tokens_total', 'Azure OpenAI token usage', ('operation', 'kind'))
+AI_FAILURES = Counter('ai_request_failures_total', 'Azure OpenAI requests that failed', ('operation',))
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'In-process cache lookups', ('cache', 'result'))
+
+PREDICT_POOL_TASKS = Counter('predict_bulk_tasks_total', 'Predictions submitted to the predict_bulk thread pool')
+PREDICT_POOL_ACTIVE = Gauge('predict_bulk_active_tasks', 'Predictions currently running in predict_bulk')
+PREDICT_POOL_BUSY_SECONDS = Counter(
+    'predict_bulk_pool_busy_seconds_total', 'Worker time spent running predictions in predict_bulk')
+PREDICT_POOL_CAPACITY_SECONDS = Counter(
+    'predict_bulk_pool_capacity_seconds_total',
+    'Worker time available in predict_bulk (workers x wall time); busy / capacity = utilization')
+PREDICT_POOL_WAIT_SECONDS = Histogram(
+    'predict_bulk_task_wait_seconds', 'Time predictions waited for a predict_bulk worker')
+
+
+def cache_result(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+class MetricsMiddleware:
+    """ルート（パスのテンプレート）ごとのリクエスト数と応答時間を記録する ASGI ミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # ルーティング後の scope に一致したルートが入る（一致しない場合は個別のパスを記録しない）
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            HTTP_REQUESTS.inc(route=route_path, method=scope['method'], status=str(status))
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route=route_path, method=scope['method'])
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+スキーマのマイグレーション
+
+migrations/NNNN_name.sql を番号順に1ファイル1トランザクションで適用し、
+適用済みの番号とファイルのチェックサムを schema_migrations に記録する。
+適用済みのファイルが書き換えられている場合はエラーにする（変更は新しい番号のファイルで行う）
+
+複数のプロセス（APIの各ワーカー・ETL）から同時に実行されてもアドバイザリロックで直列化される
+（tenders_open のパーティション化と月別パーティションの作成も同じロックの中で行う）
+
+使い方:
+    python migrate.py              # 未適用のマイグレーションを適用
+    python migrate.py --status     # 適用状況を表示
+"""
+import argparse
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import List, NamedTuple
+
+import psycopg2
+
+from tender_partitions import ensure_partition_window, ensure_partitioned_tenders
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+
+# pg_advisory_lock のキー（任意の固定値）
+LOCK_KEY = 7_220_391
+
+_FILE_NAME = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+    checksum: str
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob('*.sql')):
+        match = _FILE_NAME.match(path.name)
+        if not match:
+            raise ValueError(f"Invalid migration file name: {path.name} (expected NNNN_name.sql)")
+        checksum = hashlib.sha256(path.read_bytes()).hexdigest()
+        migrations.append(Migration(int(match.group(1)), match.group(2), path, checksum))
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def _ensure_history_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _applied(cursor) -> dict:
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {version: checksum for version, checksum in cursor.fetchall()}
+
+
+def apply_migrations(conn, directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """未適用のマイグレーションを適用し、適用したものを返す"""
+    migrations = load_migrations(directory)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+    try:
+        conn.autocommit = False
+        _ensure_history_table(cursor)
+        conn.commit()
+
+        applied = _applied(cursor)
+        for migration in migrations:
+            if migration.version in applied and applied[migration.version].strip() != migration.checksum:
+                raise RuntimeError(
+                    f"Migration {migration.path.name} was modified after it was applied; "
+                    f"add a new migration instead"
+                )
+
+        pending = [m for m in migrations if m.version not in applied]
+        for migration in pending:
+            try:
+                cursor.execute(migration.path.read_text(encoding='utf-8'))
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print(f"❌ Migration {migration.path.name} failed")
+                raise
+            print(f"🛠️ Applied migration {migration.path.name}")
+
+        # 既存の通常テーブルの変換と、当月以降の月別パーティションの用意（同時に作成しないようロック中に行う）
+        ensure_partitioned_tenders(conn)
+        ensure_partition_window(conn)
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        cursor.close()
+        conn.autocommit = False
+    return pending
+
+
+def run_migrations(database_url: str) -> List[Migration]:
+    conn = psycopg2.connect(database_url)
+    try:
+        return apply_migrations(conn)
+    finally:
+        conn.close()
+
+
+def print_status(conn):
+    cursor = conn.cursor()
+    _ensure_history_table(cursor)
+    conn.commit()
+    cursor.execute("SELECT version, checksum, applied_at FROM schema_migrations")
+    applied = {version: (checksum, applied_at) for version, checksum, applied_at in cursor.fetchall()}
+    cursor.close()
+
+    for migration in load_migrations():
+        if migration.version not in applied:
+            state = 'pending'
+        elif applied[migration.version][0].strip() != migration.checksum:
+            state = 'MODIFIED'
+        else:
+            state = f"applied {applied[migration.version][1]:%Y-%m-%d %H:%M}"
+        print(f"  {migration.path.name:<40}{state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スキーマのマイグレーション")
+    parser.add_argument('--status', action='store_true', help="適用状況を表示")
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), help="既定は環境変数 DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    conn = psycopg2.connect(args.database_url)
+    try:
+        if args.status:
+            print_status(conn)
+        else:
+            applied = apply_migrations(conn)
+            print(f"✅ {len(applied)} migrations applied" if applied else "✅ Schema is up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
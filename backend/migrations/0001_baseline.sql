@@ -0,0 +1,257 @@
+-- 0001 ベースライン
+-- これまで sql/01〜06, seed_data.py, tender_sync.py などに分散していたDDLを1か所にまとめたもの。
+-- 既存DBにも適用できるよう、すべて IF NOT EXISTS / OR REPLACE で記述する
+
+-- 1. 建設会社マスタ
+CREATE TABLE IF NOT EXISTS companies (
+    id SERIAL PRIMARY KEY,
+    company_code VARCHAR(20) UNIQUE NOT NULL,
+    company_name VARCHAR(200) NOT NULL,
+    email VARCHAR(200) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    is_active BOOLEAN DEFAULT true,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 2. 会社別落札実績
+CREATE TABLE IF NOT EXISTS company_awards (
+    id SERIAL PRIMARY KEY,
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+    tender_id VARCHAR(100),
+    project_name VARCHAR(500),
+    publisher VARCHAR(200),
+    prefecture VARCHAR(50),
+    municipality VARCHAR(100),
+    address_text TEXT,
+    use_type VARCHAR(100),
+    method VARCHAR(100),
+    floor_area_m2 DECIMAL(10, 2),
+    award_date DATE,
+    award_amount_jpy BIGINT,
+    estimated_price_jpy BIGINT,
+    win_rate DECIMAL(5, 2), -- 落札率
+    participants_count INTEGER,
+    technical_score DECIMAL(5, 2), -- 総合評価方式の技術点
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (company_id, tender_id)
+);
+
+-- 3. CSVアップロード履歴（processed_count / error_count は csv_import_worker.py が取り込み中に更新）
+CREATE TABLE IF NOT EXISTS csv_upload_history (
+    id SERIAL PRIMARY KEY,
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+    file_name VARCHAR(255),
+    record_count INTEGER,
+    upload_status VARCHAR(50), -- 'queued', 'processing', 'completed', 'failed'
+    error_message TEXT,
+    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+ALTER TABLE csv_upload_history ADD COLUMN IF NOT EXISTS processed_count INTEGER DEFAULT 0;
+ALTER TABLE csv_upload_history ADD COLUMN IF NOT EXISTS error_count INTEGER DEFAULT 0;
+
+-- 4. CSVアップロードの行ごとの検証エラー
+CREATE TABLE IF NOT EXISTS csv_upload_errors (
+    id BIGSERIAL PRIMARY KEY,
+    upload_id INTEGER REFERENCES csv_upload_history(id) ON DELETE CASCADE,
+    row_number INTEGER NOT NULL, -- CSVの行番号（ヘッダーが1行目）
+    column_name VARCHAR(100),
+    reason TEXT
+);
+
+-- 5. ユーザーセッション
+CREATE TABLE IF NOT EXISTS user_sessions (
+    id SERIAL PRIMARY KEY,
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+    token VARCHAR(500) UNIQUE NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 6. 公開中案件（bid_date の月別パーティション。月別パーティションは tender_partitions.py が作成）
+CREATE TABLE IF NOT EXISTS tenders_open (
+    tender_id VARCHAR(100) NOT NULL,
+    source VARCHAR(50),
+    publisher VARCHAR(200),
+    title VARCHAR(500),
+    prefecture VARCHAR(50),
+    municipality VARCHAR(100),
+    address_text TEXT,
+    use_type VARCHAR(100),
+    method VARCHAR(100),
+    jv_allowed BOOLEAN DEFAULT FALSE,
+    floor_area_m2 DECIMAL(10, 2),
+    bid_date DATE NOT NULL,
+    notice_date DATE,
+    estimated_price_jpy BIGINT,
+    minimum_price_jpy BIGINT,
+    origin_url TEXT,
+    last_seen_at TIMESTAMP,
+    content_hash CHAR(32),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (tender_id, bid_date)
+) PARTITION BY RANGE (bid_date);
+
+-- 既存の通常テーブルの場合は migrate.py の後処理でパーティションテーブルに変換する
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'tenders_open'::regclass) = 'p' THEN
+        CREATE TABLE IF NOT EXISTS tenders_open_default PARTITION OF tenders_open DEFAULT;
+    END IF;
+END $$;
+
+ALTER TABLE tenders_open ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+ALTER TABLE tenders_open ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+-- 7. 落札結果
+CREATE TABLE IF NOT EXISTS awards (
+    award_id VARCHAR(100) PRIMARY KEY,
+    tender_id VARCHAR(100),
+    project_name VARCHAR(500),
+    contractor VARCHAR(200),
+    contractor_id VARCHAR(50),
+    contract_amount BIGINT,
+    contract_date DATE,
+    participants_count INTEGER,
+    prefecture VARCHAR(50),
+    municipality VARCHAR(100),
+    use_type VARCHAR(100),
+    floor_area_m2 DECIMAL(10, 2),
+    bid_method VARCHAR(100),
+    evaluation_score DECIMAL(5, 2),
+    price_score DECIMAL(5, 2),
+    estimated_price BIGINT,
+    win_rate DECIMAL(5, 2),
+    jv_partner VARCHAR(200),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 8. 公開中案件の変更ログ（tender_sync.py の差分同期で記録）
+CREATE TABLE IF NOT EXISTS tender_change_log (
+    id BIGSERIAL PRIMARY KEY,
+    tender_id VARCHAR(100) NOT NULL,
+    change_type VARCHAR(10) NOT NULL, -- insert / update
+    changed_columns TEXT[], -- update時に値が変わったカラム
+    old_hash CHAR(32),
+    new_hash CHAR(32),
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 9. 勝率スコアの事前計算（opportunity_scorer.py）
+CREATE TABLE IF NOT EXISTS tender_opportunity_scores (
+    company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    tender_id VARCHAR(100) NOT NULL,
+    bid_ratio SMALLINT NOT NULL, -- 予定価格比(%)
+    prefecture VARCHAR(50),
+    use_type VARCHAR(100),
+    bid_date DATE,
+    estimated_price_jpy BIGINT,
+    win_probability REAL NOT NULL,
+    rank CHAR(1),
+    confidence VARCHAR(10),
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (company_id, tender_id, bid_ratio)
+);
+
+CREATE TABLE IF NOT EXISTS opportunity_score_progress (
+    run_date DATE NOT NULL,
+    company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    prefecture VARCHAR(50) NOT NULL,
+    tender_count INTEGER,
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_date, company_id, prefecture)
+);
+
+-- 10. ETLのバッチ単位チェックポイント（etl/daily_batch.py）
+CREATE TABLE IF NOT EXISTS etl_checkpoints (
+    job_name VARCHAR(100) NOT NULL,
+    run_key TEXT NOT NULL, -- ソースファイルの識別子（パス・サイズ・更新時刻）とバッチサイズ
+    batch_no INTEGER NOT NULL,
+    record_count INTEGER NOT NULL,
+    inserted_count INTEGER NOT NULL,
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (job_name, run_key, batch_no)
+);
+
+-- 11. データセットのバージョン（data_version.py。スナップショットの鮮度判定に使う）
+CREATE TABLE IF NOT EXISTS data_versions (
+    dataset VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions (dataset, version, updated_at)
+    VALUES (TG_TABLE_NAME, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (dataset) DO UPDATE
+    SET version = data_versions.version + 1, updated_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+INSERT INTO data_versions (dataset) VALUES ('awards'), ('tenders_open') ON CONFLICT (dataset) DO NOTHING;
+
+DROP TRIGGER IF EXISTS trg_awards_data_version ON awards;
+CREATE TRIGGER trg_awards_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON awards
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS trg_tenders_open_data_version ON tenders_open;
+CREATE TRIGGER trg_tenders_open_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tenders_open
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+-- updated_at の自動更新（seed_data_azure.py で作成されたテーブルには updated_at がないため追加）
+ALTER TABLE companies ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE company_awards ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_companies_updated_at ON companies;
+CREATE TRIGGER update_companies_updated_at BEFORE UPDATE ON companies
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_company_awards_updated_at ON company_awards;
+CREATE TRIGGER update_company_awards_updated_at BEFORE UPDATE ON company_awards
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- インデックス（これまでの定義をそのまま引き継ぐ）
+CREATE INDEX IF NOT EXISTS idx_companies_email ON companies(email);
+CREATE INDEX IF NOT EXISTS idx_awards_company_id ON company_awards(company_id);
+CREATE INDEX IF NOT EXISTS idx_awards_award_date ON company_awards(award_date DESC);
+CREATE INDEX IF NOT EXISTS idx_awards_municipality ON company_awards(municipality);
+CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(token);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON user_sessions(expires_at);
+CREATE INDEX IF NOT EXISTS idx_csv_upload_errors_upload ON csv_upload_errors(upload_id, row_number);
+CREATE INDEX IF NOT EXISTS idx_tenders_prefecture ON tenders_open(prefecture);
+CREATE INDEX IF NOT EXISTS idx_tenders_bid_date ON tenders_open(bid_date);
+CREATE INDEX IF NOT EXISTS idx_tenders_use_type ON tenders_open(use_type);
+CREATE INDEX IF NOT EXISTS idx_awards_contractor ON awards(contractor);
+CREATE INDEX IF NOT EXISTS idx_awards_contract_date ON awards(contract_date);
+CREATE INDEX IF NOT EXISTS idx_tender_change_log_tender ON tender_change_log(tender_id);
+CREATE INDEX IF NOT EXISTS idx_opportunity_scores_lookup
+    ON tender_opportunity_scores (company_id, prefecture, use_type, bid_date)
+    INCLUDE (bid_ratio, win_probability);
+
+COMMENT ON TABLE companies IS '建設会社マスタ - マルチテナント管理';
+COMMENT ON TABLE company_awards IS '会社別落札実績データ';
+COMMENT ON TABLE csv_upload_history IS 'CSVアップロード履歴管理';
+COMMENT ON TABLE user_sessions IS 'ユーザーセッション管理';
+COMMENT ON TABLE tender_change_log IS '公開中案件の新規・変更ログ';
+COMMENT ON TABLE tender_opportunity_scores IS '公開中案件の事前計算済み勝率スコア';
+COMMENT ON TABLE opportunity_score_progress IS '勝率スコア計算バッチの進捗管理';
+COMMENT ON COLUMN companies.password_hash IS 'bcryptでハッシュ化されたパスワード (デフォルト: password123)';
+COMMENT ON COLUMN company_awards.win_rate IS '落札率 = (落札額 / 予定価格) * 100';
+COMMENT ON COLUMN csv_upload_history.processed_count IS '読み込んだ行数';
+COMMENT ON COLUMN csv_upload_history.error_count IS '検証エラーで除外した行数';
+COMMENT ON COLUMN tender_opportunity_scores.bid_ratio IS '予定価格に対する入札額の比率(%)';
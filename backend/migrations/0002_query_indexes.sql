@@ -0,0 +1,42 @@
+-- 0002 DataLoader の検索条件に合わせたインデックス
+-- 検証: python benchmarks/check_query_plans.py（各クエリの EXPLAIN に Seq Scan が出ないこと）
+
+-- 類似落札実績（get_similar_awards）: 等価条件3つ + 予定価格の範囲
+CREATE INDEX IF NOT EXISTS idx_awards_similar
+    ON awards (prefecture, use_type, bid_method, estimated_price);
+
+-- 延床面積・落札金額の範囲検索（get_similar_awards の条件緩和時）
+CREATE INDEX IF NOT EXISTS idx_awards_floor_area ON awards (floor_area_m2);
+CREATE INDEX IF NOT EXISTS idx_awards_contract_amount ON awards (contract_amount);
+
+-- 落札実績の一括読み込み（load_all_data / スナップショット）は awards を全件読むため対象外
+
+-- 案件検索（search_tenders）: 都道府県で絞り込み bid_date 順に LIMIT。
+-- prefecture 単独のインデックスはこの先頭列で代替できるため削除する
+CREATE INDEX IF NOT EXISTS idx_tenders_prefecture_bid_date ON tenders_open (prefecture, bid_date);
+DROP INDEX IF EXISTS idx_tenders_prefecture;
+
+-- 会社別落札実績の一覧（/csv/company-awards: company_id で絞り award_date の降順）
+CREATE INDEX IF NOT EXISTS idx_company_awards_company_date ON company_awards (company_id, award_date DESC);
+DROP INDEX IF EXISTS idx_awards_company_id;
+
+-- sql/01_init.sql が company_awards に作成していた idx_awards_prefecture は
+-- awards 用の同名インデックス（seed_data.py）の作成を妨げていたため改名する
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_indexes WHERE indexname = 'idx_awards_prefecture' AND tablename = 'company_awards'
+    ) THEN
+        ALTER INDEX idx_awards_prefecture RENAME TO idx_company_awards_prefecture;
+    ELSE
+        CREATE INDEX IF NOT EXISTS idx_company_awards_prefecture ON company_awards (prefecture);
+    END IF;
+END $$;
+
+-- 変更ログは追記のみで changed_at と物理的な並びが一致するため BRIN で十分（B-tree の数百分の一のサイズ）
+CREATE INDEX IF NOT EXISTS idx_tender_change_log_changed_at
+    ON tender_change_log USING brin (changed_at) WITH (pages_per_range = 32);
+
+-- 会社別落札実績は award_date とほぼ同じ順に格納される（pg_stats の相関 0.99）ため、期間での絞り込みは BRIN で足りる
+CREATE INDEX IF NOT EXISTS idx_company_awards_award_date_brin
+    ON company_awards USING brin (award_date) WITH (pages_per_range = 32);
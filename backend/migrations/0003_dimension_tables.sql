@@ -0,0 +1,111 @@
+-- 0003 カテゴリ値のディメンションテーブル
+-- 都道府県・市区町村・用途・入札方式・落札業者の文字列に整数コードを割り当て、
+-- awards / tenders_open / company_awards に *_code カラムとして持たせる。
+-- 絞り込み・集計はコードで行い、文字列は API の応答を作るときに dimensions.py で引く。
+-- 文字列カラムは既存の投入スクリプト・Azure 環境との互換のため残している
+
+CREATE TABLE IF NOT EXISTS dim_prefecture (
+    id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(50) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dim_municipality (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dim_use_type (
+    id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dim_method (
+    id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dim_contractor (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(200) UNIQUE NOT NULL
+);
+
+ALTER TABLE awards
+    ADD COLUMN IF NOT EXISTS prefecture_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS municipality_code INTEGER,
+    ADD COLUMN IF NOT EXISTS use_type_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS bid_method_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS contractor_code INTEGER;
+
+ALTER TABLE tenders_open
+    ADD COLUMN IF NOT EXISTS prefecture_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS municipality_code INTEGER,
+    ADD COLUMN IF NOT EXISTS use_type_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS method_code SMALLINT;
+
+-- 履歴テーブルは tenders_open とカラム構成が一致している必要がある（パーティションの ATTACH のため）
+ALTER TABLE IF EXISTS tenders_archive
+    ADD COLUMN IF NOT EXISTS prefecture_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS municipality_code INTEGER,
+    ADD COLUMN IF NOT EXISTS use_type_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS method_code SMALLINT;
+
+ALTER TABLE company_awards
+    ADD COLUMN IF NOT EXISTS prefecture_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS municipality_code INTEGER,
+    ADD COLUMN IF NOT EXISTS use_type_code SMALLINT,
+    ADD COLUMN IF NOT EXISTS method_code SMALLINT;
+
+-- 文字列カラムの値をディメンションに登録し、コードカラムを埋める
+-- （投入時のステージングテーブルにも dimensions.py から使う）
+CREATE OR REPLACE FUNCTION encode_dimension(
+    target regclass, text_column TEXT, code_column TEXT, dimension regclass, only_missing BOOLEAN DEFAULT FALSE
+) RETURNS void AS $$
+BEGIN
+    -- 未登録の値だけを INSERT する（ON CONFLICT で IDENTITY の値を無駄に消費しないように）
+    EXECUTE format(
+        'INSERT INTO %s (name) SELECT DISTINCT t.%I FROM %s t
+         WHERE t.%I IS NOT NULL AND NOT EXISTS (SELECT 1 FROM %s d WHERE d.name = t.%I)
+         ON CONFLICT (name) DO NOTHING',
+        dimension, text_column, target, text_column, dimension, text_column
+    );
+    EXECUTE format(
+        'UPDATE %s t SET %I = d.id FROM %s d
+         WHERE t.%I = d.name AND t.%I IS DISTINCT FROM d.id' || CASE WHEN only_missing THEN format(' AND t.%I IS NULL', code_column) ELSE '' END,
+        target, code_column, dimension, text_column, code_column
+    );
+    IF NOT only_missing THEN
+        EXECUTE format('UPDATE %s SET %I = NULL WHERE %I IS NULL AND %I IS NOT NULL',
+                       target, code_column, text_column, code_column);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 既存行のコードを埋める
+SELECT encode_dimension('awards', 'prefecture', 'prefecture_code', 'dim_prefecture');
+SELECT encode_dimension('awards', 'municipality', 'municipality_code', 'dim_municipality');
+SELECT encode_dimension('awards', 'use_type', 'use_type_code', 'dim_use_type');
+SELECT encode_dimension('awards', 'bid_method', 'bid_method_code', 'dim_method');
+SELECT encode_dimension('awards', 'contractor', 'contractor_code', 'dim_contractor');
+SELECT encode_dimension('tenders_open', 'prefecture', 'prefecture_code', 'dim_prefecture');
+SELECT encode_dimension('tenders_open', 'municipality', 'municipality_code', 'dim_municipality');
+SELECT encode_dimension('tenders_open', 'use_type', 'use_type_code', 'dim_use_type');
+SELECT encode_dimension('tenders_open', 'method', 'method_code', 'dim_method');
+SELECT encode_dimension('company_awards', 'prefecture', 'prefecture_code', 'dim_prefecture');
+SELECT encode_dimension('company_awards', 'municipality', 'municipality_code', 'dim_municipality');
+SELECT encode_dimension('company_awards', 'use_type', 'use_type_code', 'dim_use_type');
+SELECT encode_dimension('company_awards', 'method', 'method_code', 'dim_method');
+
+-- 文字列のインデックスをコードのインデックスに置き換える
+DROP INDEX IF EXISTS idx_awards_similar;
+CREATE INDEX IF NOT EXISTS idx_awards_similar_codes
+    ON awards (prefecture_code, use_type_code, bid_method_code, estimated_price);
+DROP INDEX IF EXISTS idx_awards_contractor;
+CREATE INDEX IF NOT EXISTS idx_awards_contractor_code ON awards (contractor_code);
+
+DROP INDEX IF EXISTS idx_tenders_prefecture_bid_date;
+CREATE INDEX IF NOT EXISTS idx_tenders_prefecture_code_bid_date ON tenders_open (prefecture_code, bid_date);
+DROP INDEX IF EXISTS idx_tenders_use_type;
+CREATE INDEX IF NOT EXISTS idx_tenders_use_type_code ON tenders_open (use_type_code);
+
+DROP INDEX IF EXISTS idx_company_awards_prefecture;
+DROP INDEX IF EXISTS idx_awards_municipality;
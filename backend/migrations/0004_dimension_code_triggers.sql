@@ -0,0 +1,164 @@
+-- 0004 コードカラムを埋める行トリガー
+-- 0003 以降、絞り込み・類似案件の抽出・集計は *_code カラムで行うが、コードを埋めるのは
+-- ステージング経由の投入（dimensions.encode_stage）と encode_missing だけだった。
+-- 文字列だけを INSERT する投入スクリプト（seed_data_azure.py・init_db.py・load_company_awards.py など）の行は
+-- コードが NULL のまま検索・集計から漏れるため、INSERT / UPDATE 時にトリガーで埋める。
+-- トリガーの引数は (文字列カラム, コードカラム, ディメンションテーブル) の組の並び
+
+CREATE OR REPLACE FUNCTION fill_dimension_codes() RETURNS trigger AS $$
+DECLARE
+    new_row jsonb := to_jsonb(NEW);
+    old_row jsonb;
+    codes jsonb := '{}'::jsonb;
+    text_column TEXT;
+    code_column TEXT;
+    dimension TEXT;
+    text_value TEXT;
+    code_value BIGINT;
+    stale BOOLEAN;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        old_row := to_jsonb(OLD);
+    END IF;
+    FOR i IN 0 .. TG_NARGS / 3 - 1 LOOP
+        text_column := TG_ARGV[i * 3];
+        code_column := TG_ARGV[i * 3 + 1];
+        dimension := TG_ARGV[i * 3 + 2];
+        text_value := new_row ->> text_column;
+        -- UPDATE で文字列だけが変わった場合はコードを付け直す
+        stale := TG_OP = 'UPDATE'
+            AND (new_row -> text_column) IS DISTINCT FROM (old_row -> text_column)
+            AND (new_row -> code_column) IS NOT DISTINCT FROM (old_row -> code_column);
+
+        IF text_value IS NULL THEN
+            IF stale THEN
+                codes := codes || jsonb_build_object(code_column, NULL);
+            END IF;
+            CONTINUE;
+        END IF;
+        IF (new_row ->> code_column) IS NOT NULL AND NOT stale THEN
+            CONTINUE;
+        END IF;
+
+        EXECUTE format('SELECT id FROM %I WHERE name = $1', dimension) INTO code_value USING text_value;
+        IF code_value IS NULL THEN
+            EXECUTE format('INSERT INTO %I (name) VALUES ($1) ON CONFLICT (name) DO NOTHING RETURNING id', dimension)
+                INTO code_value USING text_value;
+            -- 別のトランザクションが同時に登録した場合
+            IF code_value IS NULL THEN
+                EXECUTE format('SELECT id FROM %I WHERE name = $1', dimension) INTO code_value USING text_value;
+            END IF;
+        END IF;
+        codes := codes || jsonb_build_object(code_column, code_value);
+    END LOOP;
+
+    IF codes <> '{}'::jsonb THEN
+        NEW := jsonb_populate_record(NEW, codes);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- WHEN 条件で、コードが揃っている行（ステージング経由の投入）ではトリガー関数を呼ばない
+DROP TRIGGER IF EXISTS trg_awards_dimension_codes ON awards;
+CREATE TRIGGER trg_awards_dimension_codes
+    BEFORE INSERT ON awards
+    FOR EACH ROW
+    WHEN (NEW.prefecture_code IS NULL AND NEW.prefecture IS NOT NULL
+          OR NEW.municipality_code IS NULL AND NEW.municipality IS NOT NULL
+          OR NEW.use_type_code IS NULL AND NEW.use_type IS NOT NULL
+          OR NEW.bid_method_code IS NULL AND NEW.bid_method IS NOT NULL
+          OR NEW.contractor_code IS NULL AND NEW.contractor IS NOT NULL)
+    EXECUTE FUNCTION fill_dimension_codes(
+        'prefecture', 'prefecture_code', 'dim_prefecture',
+        'municipality', 'municipality_code', 'dim_municipality',
+        'use_type', 'use_type_code', 'dim_use_type',
+        'bid_method', 'bid_method_code', 'dim_method',
+        'contractor', 'contractor_code', 'dim_contractor');
+
+DROP TRIGGER IF EXISTS trg_awards_dimension_codes_update ON awards;
+CREATE TRIGGER trg_awards_dimension_codes_update
+    BEFORE UPDATE OF prefecture, municipality, use_type, bid_method, contractor ON awards
+    FOR EACH ROW
+    WHEN (NEW.prefecture IS DISTINCT FROM OLD.prefecture
+          OR NEW.municipality IS DISTINCT FROM OLD.municipality
+          OR NEW.use_type IS DISTINCT FROM OLD.use_type
+          OR NEW.bid_method IS DISTINCT FROM OLD.bid_method
+          OR NEW.contractor IS DISTINCT FROM OLD.contractor)
+    EXECUTE FUNCTION fill_dimension_codes(
+        'prefecture', 'prefecture_code', 'dim_prefecture',
+        'municipality', 'municipality_code', 'dim_municipality',
+        'use_type', 'use_type_code', 'dim_use_type',
+        'bid_method', 'bid_method_code', 'dim_method',
+        'contractor', 'contractor_code', 'dim_contractor');
+
+DROP TRIGGER IF EXISTS trg_tenders_open_dimension_codes ON tenders_open;
+CREATE TRIGGER trg_tenders_open_dimension_codes
+    BEFORE INSERT ON tenders_open
+    FOR EACH ROW
+    WHEN (NEW.prefecture_code IS NULL AND NEW.prefecture IS NOT NULL
+          OR NEW.municipality_code IS NULL AND NEW.municipality IS NOT NULL
+          OR NEW.use_type_code IS NULL AND NEW.use_type IS NOT NULL
+          OR NEW.method_code IS NULL AND NEW.method IS NOT NULL)
+    EXECUTE FUNCTION fill_dimension_codes(
+        'prefecture', 'prefecture_code', 'dim_prefecture',
+        'municipality', 'municipality_code', 'dim_municipality',
+        'use_type', 'use_type_code', 'dim_use_type',
+        'method', 'method_code', 'dim_method');
+
+DROP TRIGGER IF EXISTS trg_tenders_open_dimension_codes_update ON tenders_open;
+CREATE TRIGGER trg_tenders_open_dimension_codes_update
+    BEFORE UPDATE OF prefecture, municipality, use_type, method ON tenders_open
+    FOR EACH ROW
+    WHEN (NEW.prefecture IS DISTINCT FROM OLD.prefecture
+          OR NEW.municipality IS DISTINCT FROM OLD.municipality
+          OR NEW.use_type IS DISTINCT FROM OLD.use_type
+          OR NEW.method IS DISTINCT FROM OLD.method)
+    EXECUTE FUNCTION fill_dimension_codes(
+        'prefecture', 'prefecture_code', 'dim_prefecture',
+        'municipality', 'municipality_code', 'dim_municipality',
+        'use_type', 'use_type_code', 'dim_use_type',
+        'method', 'method_code', 'dim_method');
+
+DROP TRIGGER IF EXISTS trg_company_awards_dimension_codes ON company_awards;
+CREATE TRIGGER trg_company_awards_dimension_codes
+    BEFORE INSERT ON company_awards
+    FOR EACH ROW
+    WHEN (NEW.prefecture_code IS NULL AND NEW.prefecture IS NOT NULL
+          OR NEW.municipality_code IS NULL AND NEW.municipality IS NOT NULL
+          OR NEW.use_type_code IS NULL AND NEW.use_type IS NOT NULL
+          OR NEW.method_code IS NULL AND NEW.method IS NOT NULL)
+    EXECUTE FUNCTION fill_dimension_codes(
+        'prefecture', 'prefecture_code', 'dim_prefecture',
+        'municipality', 'municipality_code', 'dim_municipality',
+        'use_type', 'use_type_code', 'dim_use_type',
+        'method', 'method_code', 'dim_method');
+
+DROP TRIGGER IF EXISTS trg_company_awards_dimension_codes_update ON company_awards;
+CREATE TRIGGER trg_company_awards_dimension_codes_update
+    BEFORE UPDATE OF prefecture, municipality, use_type, method ON company_awards
+    FOR EACH ROW
+    WHEN (NEW.prefecture IS DISTINCT FROM OLD.prefecture
+          OR NEW.municipality IS DISTINCT FROM OLD.municipality
+          OR NEW.use_type IS DISTINCT FROM OLD.use_type
+          OR NEW.method IS DISTINCT FROM OLD.method)
+    EXECUTE FUNCTION fill_dimension_codes(
+        'prefecture', 'prefecture_code', 'dim_prefecture',
+        'municipality', 'municipality_code', 'dim_municipality',
+        'use_type', 'use_type_code', 'dim_use_type',
+        'method', 'method_code', 'dim_method');
+
+-- トリガー作成前に文字列だけで投入された行のコードを埋める
+SELECT encode_dimension('awards', 'prefecture', 'prefecture_code', 'dim_prefecture', true);
+SELECT encode_dimension('awards', 'municipality', 'municipality_code', 'dim_municipality', true);
+SELECT encode_dimension('awards', 'use_type', 'use_type_code', 'dim_use_type', true);
+SELECT encode_dimension('awards', 'bid_method', 'bid_method_code', 'dim_method', true);
+SELECT encode_dimension('awards', 'contractor', 'contractor_code', 'dim_contractor', true);
+SELECT encode_dimension('tenders_open', 'prefecture', 'prefecture_code', 'dim_prefecture', true);
+SELECT encode_dimension('tenders_open', 'municipality', 'municipality_code', 'dim_municipality', true);
+SELECT encode_dimension('tenders_open', 'use_type', 'use_type_code', 'dim_use_type', true);
+SELECT encode_dimension('tenders_open', 'method', 'method_code', 'dim_method', true);
+SELECT encode_dimension('company_awards', 'prefecture', 'prefecture_code', 'dim_prefecture', true);
+SELECT encode_dimension('company_awards', 'municipality', 'municipality_code', 'dim_municipality', true);
+SELECT encode_dimension('company_awards', 'use_type', 'use_type_code', 'dim_use_type', true);
+SELECT encode_dimension('company_awards', 'method', 'method_code', 'dim_method', true);
@@ -0,0 +1,57 @@
+-- 0005 内容の変わらない書き込みでは data_versions を進めない
+-- 0001 のトリガーはすべてのステートメントで発火していたため、差分同期の last_seen_at だけの UPDATE や
+-- 1行も入らなかった INSERT ... ON CONFLICT DO NOTHING でもバージョンが進み、
+-- ETag（http_cache）とスナップショット（serve.py が全件を書き出し直す）が毎回無効になっていた。
+-- - INSERT / DELETE: 遷移テーブル changed_rows が空なら何もしない
+-- - UPDATE: last_seen_at・created_at・updated_at 以外のカラムを SET するものだけ
+-- - TRUNCATE: 常に進める
+-- （data_version.ensure_data_versions と同じ定義）
+
+CREATE OR REPLACE FUNCTION bump_data_version_if_changed() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM changed_rows) THEN
+        INSERT INTO data_versions (dataset, version, updated_at)
+        VALUES (TG_TABLE_NAME, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (dataset) DO UPDATE
+        SET version = data_versions.version + 1, updated_at = CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    versioned_table TEXT;
+    columns TEXT;
+BEGIN
+    FOREACH versioned_table IN ARRAY ARRAY['awards', 'tenders_open'] LOOP
+        IF to_regclass(versioned_table) IS NULL THEN
+            CONTINUE;
+        END IF;
+        SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position) INTO columns
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = versioned_table
+        AND column_name <> ALL(ARRAY['last_seen_at', 'created_at', 'updated_at']);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || versioned_table || '_data_version', versioned_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER UPDATE OF %s OR TRUNCATE ON %I
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()',
+            'trg_' || versioned_table || '_data_version', columns, versioned_table
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || versioned_table || '_data_version_insert', versioned_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS changed_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version_if_changed()',
+            'trg_' || versioned_table || '_data_version_insert', versioned_table
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || versioned_table || '_data_version_delete', versioned_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS changed_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version_if_changed()',
+            'trg_' || versioned_table || '_data_version_delete', versioned_table
+        );
+    END LOOP;
+END $$;
@@ -0,0 +1,44 @@
+-- 0006 company_awards / companies の data_versions
+-- company_stats（企業の集計）と auth（認証済み企業）のキャッシュはプロセスごとに持つため、
+-- serve.py の複数ワーカーでは取り込み・更新を行ったワーカー以外のキャッシュが TTL まで古いままだった。
+-- 0005 と同じトリガーでバージョンを進め、各ワーカーはキャッシュしたときのバージョンと比べて破棄する
+-- （data_version.ensure_data_versions と同じ定義。スナップショットの鮮度判定には使わない）
+
+DO $$
+DECLARE
+    versioned_table TEXT;
+    columns TEXT;
+BEGIN
+    FOREACH versioned_table IN ARRAY ARRAY['company_awards', 'companies'] LOOP
+        IF to_regclass(versioned_table) IS NULL THEN
+            CONTINUE;
+        END IF;
+        INSERT INTO data_versions (dataset) VALUES (versioned_table) ON CONFLICT (dataset) DO NOTHING;
+
+        SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position) INTO columns
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = versioned_table
+        AND column_name <> ALL(ARRAY['last_seen_at', 'created_at', 'updated_at']);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || versioned_table || '_data_version', versioned_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER UPDATE OF %s OR TRUNCATE ON %I
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()',
+            'trg_' || versioned_table || '_data_version', columns, versioned_table
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || versioned_table || '_data_version_insert', versioned_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS changed_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version_if_changed()',
+            'trg_' || versioned_table || '_data_version_insert', versioned_table
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || versioned_table || '_data_version_delete', versioned_table);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS changed_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version_if_changed()',
+            'trg_' || versioned_table || '_data_version_delete', versioned_table
+        );
+    END LOOP;
+END $$;
@@ -0,0 +1,40 @@
+-- 0007 company_awards の (company_id, tender_id) 一意制約
+-- 0001 は既存のテーブルを CREATE TABLE IF NOT EXISTS でそのまま採用するため、旧 seed_data_azure.py で
+-- 作成したDBには UNIQUE (company_id, tender_id) がなく、CSV取り込み（csv_import_worker の
+-- ON CONFLICT (company_id, tender_id)）がすべて失敗していた。
+-- 制約がない場合は重複する行を除いて（更新日時が新しい行、同じなら id の大きい行を残す）制約を追加する
+
+DO $$
+BEGIN
+    IF to_regclass('company_awards') IS NULL THEN
+        RETURN;
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint c
+        WHERE c.conrelid = 'company_awards'::regclass
+        AND c.contype IN ('u', 'p')
+        AND (
+            SELECT array_agg(a.attname::text ORDER BY a.attname::text)
+            FROM pg_attribute a
+            WHERE a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+        ) = ARRAY['company_id', 'tender_id']
+    ) THEN
+        RETURN;
+    END IF;
+
+    DELETE FROM company_awards
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY company_id, tender_id
+                ORDER BY updated_at DESC NULLS LAST, id DESC
+            ) AS position
+            FROM company_awards
+            WHERE company_id IS NOT NULL AND tender_id IS NOT NULL
+        ) ranked
+        WHERE position > 1
+    );
+
+    ALTER TABLE company_awards
+    ADD CONSTRAINT company_awards_company_id_tender_id_key UNIQUE (company_id, tender_id);
+END $$;
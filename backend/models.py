@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, Float, Date, DateTime, Boolean, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -50,6 +50,11 @@ class CompanyAward(Base):
     win_rate = Column(Float)
     participants_count = Column(Integer)
     technical_score = Column(Float)
+    # dim_* テーブルの整数コード（migrations/0003_dimension_tables.sql）
+    prefecture_code = Column(Integer)
+    municipality_code = Column(Integer)
+    use_type_code = Column(Integer)
+    method_code = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -88,10 +93,40 @@ class CSVUploadHistory(Base):
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id"))
     file_name = Column(String(500))
-    upload_status = Column(String(50))  # 'processing', 'completed', 'failed'
+    upload_status = Column(String(50))  # 'queued', 'processing', 'completed', 'failed'
     record_count = Column(Integer)
+    processed_count = Column(Integer, default=0)  # 読み込んだ行数（処理中に随時更新）
+    error_count = Column(Integer, default=0)  # 検証エラーで除外した行数（詳細は csv_upload_errors）
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     error_message = Column(Text, nullable=True)
     
-    company = relationship("Company", backref="csv_uploads")
\ No newline at end of file
+    company = relationship("Company", backref="csv_uploads")
+
+class CSVUploadError(Base):
+    __tablename__ = "csv_upload_errors"
+    
+    id = Column(BigInteger, primary_key=True)
+    upload_id = Column(Integer, ForeignKey("csv_upload_history.id", ondelete="CASCADE"), index=True)
+    row_number = Column(Integer, nullable=False)  # CSVの行番号（ヘッダーが1行目）
+    column_name = Column(String(100))
+    reason = Column(Text)
+
+class TenderOpportunityScore(Base):
+    __tablename__ = "tender_opportunity_scores"
+    
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    tender_id = Column(String(100), primary_key=True)
+    bid_ratio = Column(SmallInteger, primary_key=True)  # 予定価格比(%)
+    prefecture = Column(String(50))
+    use_type = Column(String(100))
+    bid_date = Column(Date)
+    estimated_price_jpy = Column(BigInteger)
+    win_probability = Column(Float, nullable=False)
+    rank = Column(String(1))
+    confidence = Column(String(10))
+    scored_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_opportunity_scores_lookup', 'company_id', 'prefecture', 'use_type', 'bid_date'),
+    )
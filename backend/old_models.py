@@ -1,8 +1,8 @@
 """
 旧Pydanticモデル定義（既存コードとの互換性維持用）
 """
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 
 class TenderSearch(BaseModel):
@@ -32,6 +32,7 @@ class PredictionRequest(BaseModel):
     tender_id: str
     bid_amount: int
     company_name: str = "星田建設株式会社"
+    mode: Optional[Literal['rule', 'monte_carlo']] = None  # 予測モード（省略時はサーバー既定）
 
 class BulkPredictionRequest(BaseModel):
     prefecture: Optional[str] = None
@@ -42,6 +43,35 @@ class BulkPredictionRequest(BaseModel):
     use_ratio: bool = True
     min_price: Optional[int] = None
     max_price: Optional[int] = None
+    mode: Optional[Literal['rule', 'monte_carlo']] = None
+
+class OptimalBidRequest(BaseModel):
+    tender_id: str
+    cost_estimate: int  # 自社の見積原価
+    company_name: str = "星田建設株式会社"
+    mode: Optional[Literal['rule', 'monte_carlo']] = None
+    grid_points: int = Field(200, ge=10, le=2000)  # 探索グリッドの分割数
+
+class BidCurvePoint(BaseModel):
+    bid_amount: int
+    bid_ratio: float
+    win_probability: float
+    expected_profit: int
+
+class OptimalBidResponse(BaseModel):
+    tender_id: str
+    title: str
+    mode: str
+    cost_estimate: int
+    estimated_price: int
+    minimum_price: Optional[int] = None
+    optimal_bid: int
+    optimal_bid_ratio: float
+    win_probability: float
+    expected_profit: int
+    profitable: bool
+    n_similar: int
+    curve: List[BidCurvePoint]
 
 class SimilarCase(BaseModel):
     contractor: str
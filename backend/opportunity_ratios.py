@@ -0,0 +1,9 @@
+"""
+有望案件スコアの予定価格比
+
+夜間バッチ（opportunity_scorer.py）が既定でスコアを事前計算する比率。
+/opportunities/top（routers/opportunity_router.py）も参照するため、バッチのモジュール
+（multiprocessing・DataLoader・BidPredictor を読み込む）とは分けて定義する
+"""
+
+DEFAULT_RATIOS = [80, 85, 90, 95, 100]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+公開中案件の勝率スコアを事前計算する夜間バッチ
+
+登録済みの各企業について、tenders_open の入札日が今日以降の全案件を
+標準の予定価格比（既定: 80, 85, 90, 95, 100%）でスコアリングし、
+tender_opportunity_scores テーブルに保存する。
+/opportunities/top はこのテーブルを1回のインデックス検索で参照する。
+
+- 企業 × 都道府県 を1パーティションとして複数プロセスで並列に処理
+- 類似案件は /predict と同じ DataLoader.select_similar_awards で選ぶ。企業によらないため、
+  パーティションを都道府県順に並べ、ワーカーは同じ都道府県が続く間は案件ごとの結果を再利用する
+- パーティション単位で「削除 → 挿入 → 進捗記録」を1トランザクションで行うため、
+  中断しても同じ --run-date で再実行すれば未完了のパーティションから再開できる
+
+使い方:
+    python opportunity_scorer.py --workers 4
+    python opportunity_scorer.py --run-date 2026-10-18      # 中断したバッチの再開
+    python opportunity_scorer.py --ratios 85,90,95 --restart
+
+cron例（毎日 02:00）:
+    0 2 * * * cd /app && python opportunity_scorer.py --workers 4
+"""
+import argparse
+import os
+import time
+from datetime import date
+from multiprocessing import Pool
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+from data_loader import DataLoader
+from opportunity_ratios import DEFAULT_RATIOS
+from predictor import BidPredictor
+
+# ワーカープロセスごとに保持するオブジェクト
+_data_loader = None
+_predictor = None
+# 類似案件は企業によらないため、同じ都道府県のパーティションが続く間は案件ごとに再利用する
+_similar_prefecture = None
+_similar_awards = {}
+
+
+def _init_worker():
+    """ワーカープロセスの初期化（DB接続文字列と予測ロジックのみ用意）"""
+    global _data_loader, _predictor
+    _data_loader = DataLoader(preload=False)
+    _predictor = BidPredictor(_data_loader, use_ai=False)
+
+
+def score_partition(task):
+    """1パーティション（企業 × 都道府県）をスコアリングして保存"""
+    global _similar_prefecture, _similar_awards
+    run_date, company_id, company_name, prefecture, ratios = task
+    start_time = time.time()
+
+    company_strengths = _data_loader.get_company_strengths(company_name)
+
+    conn = psycopg2.connect(_data_loader.db_connection_str, cursor_factory=RealDictCursor)
+    try:
+        cursor = conn.cursor()
+        prefecture_code = _data_loader.dimensions.code('prefecture', prefecture)
+        if _similar_prefecture != prefecture:
+            _similar_prefecture, _similar_awards = prefecture, {}
+
+        cursor.execute("""
+            SELECT tender_id, prefecture, use_type, method as bid_method, floor_area_m2,
+                   bid_date, estimated_price_jpy as estimated_price,
+                   minimum_price_jpy as minimum_price
+            FROM tenders_open
+            WHERE prefecture_code = %s
+            AND bid_date >= CURRENT_DATE
+            AND tender_id NOT LIKE 'tender_id%%'
+            AND estimated_price_jpy > 0
+        """, (prefecture_code,))
+        tenders = cursor.fetchall()
+
+        rows = []
+        for tender in tenders:
+            similar_awards = _similar_awards.get(tender['tender_id'])
+            if similar_awards is None:
+                similar_awards = _data_loader.select_similar_awards(
+                    cursor,
+                    prefecture=tender['prefecture'],
+                    use_type=tender['use_type'],
+                    floor_area=tender['floor_area_m2'],
+                    bid_method=tender['bid_method'],
+                    estimated_price=tender['estimated_price']
+                )
+                _similar_awards[tender['tender_id']] = similar_awards
+            for ratio in ratios:
+                bid_amount = int(tender['estimated_price'] * ratio / 100)
+                rank, win_prob, confidence = _predictor._calculate_prediction(
+                    bid_amount, tender, similar_awards, company_strengths
+                )
+                rows.append((
+                    company_id, tender['tender_id'], ratio, tender['prefecture'],
+                    tender['use_type'], tender['bid_date'], tender['estimated_price'],
+                    win_prob, rank, confidence
+                ))
+
+        # パーティション単位で置き換え、進捗を同じトランザクションで記録
+        cursor.execute(
+            "DELETE FROM tender_opportunity_scores WHERE company_id = %s AND prefecture = %s",
+            (company_id, prefecture)
+        )
+        execute_values(cursor, """
+            INSERT INTO tender_opportunity_scores (
+                company_id, tender_id, bid_ratio, prefecture, use_type, bid_date,
+                estimated_price_jpy, win_probability, rank, confidence
+            ) VALUES %s
+        """, rows, page_size=1000)
+        cursor.execute("""
+            INSERT INTO opportunity_score_progress (run_date, company_id, prefecture, tender_count)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (run_date, company_id, prefecture)
+            DO UPDATE SET tender_count = EXCLUDED.tender_count, completed_at = CURRENT_TIMESTAMP
+        """, (run_date, company_id, prefecture, len(tenders)))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    return company_name, prefecture, len(tenders), len(rows), time.time() - start_time
+
+
+def build_tasks(conn, run_date, ratios, restart=False):
+    """未完了のパーティション一覧を作成"""
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, company_name FROM companies WHERE is_active = true ORDER BY id")
+    companies = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT DISTINCT prefecture FROM tenders_open
+        WHERE bid_date >= CURRENT_DATE AND prefecture IS NOT NULL
+        ORDER BY prefecture
+    """)
+    prefectures = [row['prefecture'] for row in cursor.fetchall()]
+
+    if restart:
+        cursor.execute("DELETE FROM opportunity_score_progress WHERE run_date = %s", (run_date,))
+        conn.commit()
+        completed = set()
+    else:
+        cursor.execute(
+            "SELECT company_id, prefecture FROM opportunity_score_progress WHERE run_date = %s",
+            (run_date,)
+        )
+        completed = {(row['company_id'], row['prefecture']) for row in cursor.fetchall()}
+    cursor.close()
+
+    # 都道府県ごとにまとめて並べる（ワーカーが類似案件を再利用できるように）
+    tasks = []
+    for prefecture in prefectures:
+        for company in companies:
+            if (company['id'], prefecture) in completed:
+                continue
+            tasks.append((run_date, company['id'], company['company_name'], prefecture, ratios))
+
+    return tasks, len(companies) * len(prefectures)
+
+
+def purge_expired_scores(conn):
+    """入札日を過ぎた案件のスコアを削除"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM tender_opportunity_scores WHERE bid_date < CURRENT_DATE")
+    deleted = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="公開中案件の勝率スコアを事前計算")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+    parser.add_argument('--ratios', default=','.join(str(r) for r in DEFAULT_RATIOS),
+                        help="予定価格比(%%)のカンマ区切りリスト")
+    parser.add_argument('--run-date', default=date.today().isoformat(),
+                        help="実行日（同じ日付で再実行すると未完了分から再開）")
+    parser.add_argument('--restart', action='store_true', help="進捗を破棄して最初から実行")
+    args = parser.parse_args()
+
+    ratios = sorted({int(r) for r in args.ratios.split(',') if r.strip()})
+    start_time = time.time()
+
+    loader = DataLoader(preload=False)
+    conn = psycopg2.connect(loader.db_connection_str, cursor_factory=RealDictCursor)
+    try:
+        tasks, total = build_tasks(conn, args.run_date, ratios, restart=args.restart)
+        print(f"🚀 Scoring run {args.run_date}: {len(tasks)}/{total} partitions remaining, ratios={ratios}")
+
+        scored_rows = 0
+        if tasks:
+            with Pool(processes=max(1, args.workers), initializer=_init_worker) as pool:
+                for i, (company_name, prefecture, n_tenders, n_rows, elapsed) in enumerate(
+                        pool.imap_unordered(score_partition, tasks), start=1):
+                    scored_rows += n_rows
+                    print(f"  [{i}/{len(tasks)}] {company_name} / {prefecture}: "
+                          f"{n_tenders:,} tenders, {n_rows:,} scores ({elapsed:.1f}s)")
+
+        deleted = purge_expired_scores(conn)
+        print(f"  Removed {deleted:,} expired scores")
+    finally:
+        conn.close()
+
+    elapsed_time = time.time() - start_time
+    print(f"✅ Scoring completed: {scored_rows:,} scores in {elapsed_time:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
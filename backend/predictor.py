@@ -1,20 +1,62 @@
+import os
 import statistics
-from typing import Dict, List, Tuple
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
 from ai_analyzer import AIAnalyzer
+from competitor_simulator import CompetitorSimulator
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+from metrics import (
+    PREDICT_POOL_ACTIVE, PREDICT_POOL_BUSY_SECONDS, PREDICT_POOL_CAPACITY_SECONDS,
+    PREDICT_POOL_TASKS, PREDICT_POOL_WAIT_SECONDS
+)
+
+# 予測モード
+# - rule: 予定価格比から固定の勝率テーブルで算出（従来方式）
+# - monte_carlo: 類似案件の落札率・参加社数から競合入札をシミュレーション
+PREDICTION_MODES = ('rule', 'monte_carlo')
+
+# ruleモードの勝率テーブル（予定価格比の区切りと基本勝率）
+# 75%未満: 0.90, 82%未満: 0.75, 88%未満: 0.65, 92%未満: 0.55, 96%未満: 0.45,
+# 99%未満: 0.35, 102%未満: 0.25, 105%未満: 0.15, 105%以上: 0.08
+RULE_RATIO_THRESHOLDS = [0.75, 0.82, 0.88, 0.92, 0.96, 0.99, 1.02, 1.05]
+RULE_WIN_PROBS = [0.90, 0.75, 0.65, 0.55, 0.45, 0.35, 0.25, 0.15, 0.08]
 
 class BidPredictor:
-    def __init__(self, data_loader):
+    def __init__(self, data_loader, use_ai: bool = True, mode: Optional[str] = None):
         self.data_loader = data_loader
-        self.ai_analyzer = None
-        try:
-            self.ai_analyzer = AIAnalyzer()
-        except Exception as e:
-            print(f"AI Analyzer initialization failed: {e}")
-            self.ai_analyzer = None
-        
-    def predict_single(self, tender_id: str, bid_amount: int, company_name: str) -> Dict:
+        self.mode = mode or os.getenv('PREDICTOR_MODE', 'rule')
+        if self.mode not in PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode: {self.mode}")
+        self.simulator = CompetitorSimulator()
+        # AIAnalyzer（openai の import を含む）は初回の利用時に作成する
+        # バッチ計算などAI分析を使わない用途では作成しない
+        self._ai_analyzer = None
+        self._ai_initialized = not use_ai
+        self._ai_lock = threading.Lock()
+    
+    @property
+    def ai_analyzer(self) -> Optional[AIAnalyzer]:
+        if not self._ai_initialized:
+            self.init_ai_analyzer()
+        return self._ai_analyzer
+    
+    def init_ai_analyzer(self):
+        """AIAnalyzer を作成（作成済みなら何もしない）"""
+        with self._ai_lock:
+            if self._ai_initialized:
+                return
+            try:
+                self._ai_analyzer = AIAnalyzer()
+            except Exception as e:
+                print(f"AI Analyzer initialization failed: {e}")
+                self._ai_analyzer = None
+            self._ai_initialized = True
+        
+    def predict_single(self, tender_id: str, bid_amount: int, company_name: str,
+                       mode: Optional[str] = None) -> Dict:
         """単一案件の落札確率を予測"""
         tender = self.data_loader.get_tender_by_id(tender_id)
         if not tender:
@@ -34,7 +76,7 @@ class BidPredictor:
         
         # 予測を実行
         rank, win_prob, confidence = self._calculate_prediction(
-            bid_amount, tender, similar_awards, company_strengths
+            bid_amount, tender, similar_awards, company_strengths, mode=mode
         )
         
         # 根拠データを生成
@@ -110,7 +152,8 @@ class BidPredictor:
         }
         
     def predict_bulk(self, search_params: Dict, bid_amount: int, company_name: str, 
-                     use_ratio: bool = False, min_price: int = None, max_price: int = None) -> List[Dict]:
+                     use_ratio: bool = False, min_price: int = None, max_price: int = None,
+                     mode: Optional[str] = None) -> List[Dict]:
         """複数案件の一括予測（並行処理版）
         
         Args:
@@ -120,6 +163,7 @@ class BidPredictor:
             use_ratio: Trueの場合、bid_amountを予定価格比率(%)として扱う
             min_price: 入札額の最小値フィルター
             max_price: 入札額の最大値フィルター
+            mode: 予測モード（省略時はインスタンスの既定値）
         """
         start_time = time.time()
         tenders = self.data_loader.search_tenders(search_params)
@@ -148,25 +192,35 @@ class BidPredictor:
             return []
         
         # 並行処理で予測を実行
-        def predict_wrapper(tender_data):
+        def predict_wrapper(tender_data, submitted_at):
             tender, actual_bid_amount = tender_data
+            started_at = time.perf_counter()
+            PREDICT_POOL_WAIT_SECONDS.observe(started_at - submitted_at)
+            PREDICT_POOL_ACTIVE.inc()
             try:
-                return self.predict_single(tender['tender_id'], actual_bid_amount, company_name)
+                return self.predict_single(tender['tender_id'], actual_bid_amount, company_name, mode=mode)
             except Exception as e:
                 print(f"Prediction error for {tender['tender_id']}: {e}")
                 return None
+            finally:
+                PREDICT_POOL_ACTIVE.dec()
+                PREDICT_POOL_BUSY_SECONDS.inc(time.perf_counter() - started_at)
         
         # ThreadPoolExecutorで並行実行（最大8スレッド）
-        with ThreadPoolExecutor(max_workers=min(8, max(1, len(target_tenders)))) as executor:
+        max_workers = min(8, max(1, len(target_tenders)))
+        pool_started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # 全ての予測タスクを投入
-            future_to_tender = {executor.submit(predict_wrapper, tender_data): tender_data 
+            future_to_tender = {executor.submit(predict_wrapper, tender_data, time.perf_counter()): tender_data 
                               for tender_data in target_tenders}
+            PREDICT_POOL_TASKS.inc(len(future_to_tender))
             
             # 完了したタスクから結果を収集
             for future in as_completed(future_to_tender):
                 result = future.result()
                 if result:
                     results.append(result)
+        PREDICT_POOL_CAPACITY_SECONDS.inc(max_workers * (time.perf_counter() - pool_started_at))
         
         # 勝率の高い順にソート
         results.sort(key=lambda x: x['win_probability'], reverse=True)
@@ -176,9 +230,91 @@ class BidPredictor:
         
         return results
         
+    def recommend_optimal_bid(self, tender_id: str, cost_estimate: int, company_name: str,
+                              mode: Optional[str] = None, grid_points: int = 200) -> Dict:
+        """期待利益 (入札額 - 原価) × 勝率 が最大となる入札額を探索
+        
+        最低制限価格から予定価格までを等間隔のグリッドで評価し、
+        期待利益の曲線と最大値を返す
+        """
+        tender = self.data_loader.get_tender_by_id(tender_id)
+        if not tender:
+            raise ValueError(f"Tender {tender_id} not found")
+        if not tender.get('estimated_price'):
+            raise ValueError(f"Tender {tender_id} has no estimated price")
+            
+        similar_awards = self.data_loader.get_similar_awards(
+            prefecture=tender['prefecture'],
+            use_type=tender['use_type'],
+            floor_area=tender.get('floor_area_m2'),
+            bid_method=tender['bid_method'],
+            estimated_price=tender['estimated_price']
+        )
+        company_strengths = self.data_loader.get_company_strengths(company_name)
+        mode = mode or self.mode
+        
+        # 探索範囲: 最低制限価格（なければ予定価格の70%）〜予定価格
+        estimated_price = tender['estimated_price']
+        low = tender.get('minimum_price') or int(estimated_price * 0.7)
+        bid_amounts = np.unique(np.linspace(low, estimated_price, grid_points).astype(np.int64))
+        
+        win_probs = self._win_probability_curve(bid_amounts, tender, similar_awards, company_strengths, mode)
+        expected_profits = (bid_amounts - cost_estimate) * win_probs
+        best = int(np.argmax(expected_profits))
+        
+        curve = [
+            {
+                'bid_amount': int(bid),
+                'bid_ratio': round(bid / estimated_price * 100, 2),
+                'win_probability': round(float(prob), 3),
+                'expected_profit': int(profit)
+            }
+            for bid, prob, profit in zip(bid_amounts, win_probs, expected_profits)
+        ]
+        
+        return {
+            'tender_id': tender_id,
+            'title': tender['title'],
+            'mode': mode,
+            'cost_estimate': cost_estimate,
+            'estimated_price': estimated_price,
+            'minimum_price': tender.get('minimum_price'),
+            'optimal_bid': curve[best]['bid_amount'],
+            'optimal_bid_ratio': curve[best]['bid_ratio'],
+            'win_probability': curve[best]['win_probability'],
+            'expected_profit': curve[best]['expected_profit'],
+            'profitable': curve[best]['expected_profit'] > 0,
+            'n_similar': len(similar_awards),
+            'curve': curve
+        }
+        
+    def _win_probability_curve(self, bid_amounts: np.ndarray, tender: Dict, similar_awards: list,
+                               company_strengths: Dict, mode: Optional[str] = None) -> np.ndarray:
+        """複数の入札額に対する勝率をまとめて計算（_calculate_predictionのベクトル版）"""
+        mode = mode or self.mode
+        estimated_price = tender['estimated_price']
+        ratios = np.asarray(bid_amounts, dtype=np.float64) / estimated_price
+        
+        if mode == 'monte_carlo':
+            base_win_probs = self.simulator.win_probabilities(ratios, tender, similar_awards)
+        else:
+            base_win_probs = np.asarray(RULE_WIN_PROBS)[
+                np.searchsorted(RULE_RATIO_THRESHOLDS, ratios, side='right')
+            ]
+        
+        win_probs = base_win_probs + self._strength_adjustment(tender, company_strengths)
+        
+        # 最低制限価格未満は失格
+        if tender.get('minimum_price'):
+            win_probs[np.asarray(bid_amounts) < tender['minimum_price']] = 0.0
+        
+        return np.clip(win_probs, 0.0, 1.0)
+        
     def _calculate_prediction(self, bid_amount: int, tender: Dict, 
-                            similar_awards: list, company_strengths: Dict) -> Tuple[str, float, str]:
+                            similar_awards: list, company_strengths: Dict,
+                            mode: Optional[str] = None) -> Tuple[str, float, str]:
         """予測計算のコアロジック"""
+        mode = mode or self.mode
         
         # 基準価格の計算（類似案件の中央値）
         if len(similar_awards) > 0:
@@ -198,55 +334,16 @@ class BidPredictor:
         # 予定価格との比率も考慮
         estimated_ratio = bid_amount / tender['estimated_price'] if tender['estimated_price'] > 0 else 1.0
         
-        # 基本勝率の計算（価格ベース）
-        # より現実的な分布にするため、予定価格との比率も考慮
-        if estimated_ratio < 0.75:  # 予定価格の75%未満
-            base_win_prob = 0.90
-            rank = 'A'
-        elif estimated_ratio < 0.82:  # 予定価格の82%未満
-            base_win_prob = 0.75
-            rank = 'A'
-        elif estimated_ratio < 0.88:  # 予定価格の88%未満
-            base_win_prob = 0.65
-            rank = 'B'
-        elif estimated_ratio < 0.92:  # 予定価格の92%未満
-            base_win_prob = 0.55
-            rank = 'B'
-        elif estimated_ratio < 0.96:  # 予定価格の96%未満
-            base_win_prob = 0.45
-            rank = 'C'
-        elif estimated_ratio < 0.99:  # 予定価格の99%未満
-            base_win_prob = 0.35
-            rank = 'C'
-        elif estimated_ratio < 1.02:  # 予定価格の102%未満
-            base_win_prob = 0.25
-            rank = 'D'
-        elif estimated_ratio < 1.05:  # 予定価格の105%未満
-            base_win_prob = 0.15
-            rank = 'D'
-        else:  # 予定価格の105%以上
-            base_win_prob = 0.08
-            rank = 'E'
+        if mode == 'monte_carlo':
+            # 競合入札のシミュレーションによる基本勝率
+            base_win_prob = self.simulator.win_probability(bid_amount, tender, similar_awards)
+        else:
+            # 基本勝率の計算（価格ベース）
+            # より現実的な分布にするため、予定価格との比率も考慮
+            base_win_prob = RULE_WIN_PROBS[bisect_right(RULE_RATIO_THRESHOLDS, estimated_ratio)]
             
         # 自社の強みによる補正
-        win_prob = base_win_prob
-        
-        # 地域での実績による補正
-        if company_strengths.get('top_prefectures', {}).get(tender['prefecture'], 0) > 10:
-            win_prob += 0.10  # 該当地域で10件以上の実績があれば+10%
-        elif company_strengths.get('top_prefectures', {}).get(tender['prefecture'], 0) > 5:
-            win_prob += 0.05  # 5件以上なら+5%
-            
-        # 用途での実績による補正（現時点ではデータがないのでスキップ）
-        # if company_strengths.get('use_types', {}).get(tender['use_type'], 0) > 15:
-        #     win_prob += 0.08  # 該当用途で15件以上の実績があれば+8%
-        # elif company_strengths.get('use_types', {}).get(tender['use_type'], 0) > 8:
-        #     win_prob += 0.04  # 8件以上なら+4%
-            
-        # 総合評価方式での技術力補正
-        if tender['bid_method'] == '総合評価方式' and company_strengths.get('avg_tech_score'):
-            if company_strengths['avg_tech_score'] and company_strengths['avg_tech_score'] > 80:
-                win_prob += 0.12  # 技術点が高ければ+12%
+        win_prob = base_win_prob + self._strength_adjustment(tender, company_strengths)
                 
         # 最低制限価格との関係
         if tender.get('minimum_price') and bid_amount < tender['minimum_price']:
@@ -278,6 +375,29 @@ class BidPredictor:
             
         return rank, round(win_prob, 3), confidence
         
+    def _strength_adjustment(self, tender: Dict, company_strengths: Dict) -> float:
+        """自社の強みによる勝率の補正値"""
+        adjustment = 0.0
+        
+        # 地域での実績による補正
+        if company_strengths.get('top_prefectures', {}).get(tender['prefecture'], 0) > 10:
+            adjustment += 0.10  # 該当地域で10件以上の実績があれば+10%
+        elif company_strengths.get('top_prefectures', {}).get(tender['prefecture'], 0) > 5:
+            adjustment += 0.05  # 5件以上なら+5%
+            
+        # 用途での実績による補正（現時点ではデータがないのでスキップ）
+        # if company_strengths.get('use_types', {}).get(tender['use_type'], 0) > 15:
+        #     adjustment += 0.08  # 該当用途で15件以上の実績があれば+8%
+        # elif company_strengths.get('use_types', {}).get(tender['use_type'], 0) > 8:
+        #     adjustment += 0.04  # 8件以上なら+4%
+            
+        # 総合評価方式での技術力補正
+        if tender['bid_method'] == '総合評価方式' and company_strengths.get('avg_tech_score'):
+            if company_strengths['avg_tech_score'] and company_strengths['avg_tech_score'] > 80:
+                adjustment += 0.12  # 技術点が高ければ+12%
+        
+        return adjustment
+        
     def _generate_basis(self, bid_amount: int, tender: Dict, similar_awards: list) -> Dict:
         """予測根拠の生成"""
         if len(similar_awards) > 0:
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from database import get_db
 from auth import (
-    authenticate_company,
+    authenticate_company_async,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     get_current_company
@@ -44,7 +44,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
     メールアドレスとパスワードで認証し、JWTトークンを返す
     """
     # 企業を認証
-    company = authenticate_company(db, request.email, request.password)
+    company = await authenticate_company_async(db, request.email, request.password)
     if not company:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -4,14 +4,18 @@
 from typing import Dict, List
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from pydantic import BaseModel
-from database import get_db
+from database import engine, get_db
 from auth import get_current_company
+from dimensions import shared_cache
+import company_stats
 import models
 
 router = APIRouter(prefix="/company", tags=["会社分析"])
 
+# 集計はコードで行い、文字列はレスポンスを作るときに引く（DataLoader と同じキャッシュ）
+dimensions = shared_cache(engine.raw_connection)
+
 class CompanyStrengthsResponse(BaseModel):
     """会社の強み分析レスポンス"""
     company_name: str
@@ -42,18 +46,12 @@ async def get_company_strengths(
     - 平均技術点
     """
     
-    # 基本統計を取得
-    stats = db.query(
-        func.count(models.CompanyAward.id).label("total_awards"),
-        func.sum(models.CompanyAward.award_amount_jpy).label("total_amount"),
-        func.avg(models.CompanyAward.award_amount_jpy).label("avg_amount"),
-        func.avg(models.CompanyAward.win_rate).label("avg_win_rate")
-    ).filter(
-        models.CompanyAward.company_id == current_company.id
-    ).first()
+    # 集計（1クエリ、キャッシュ済みならクエリなし）
+    stats = company_stats.get_company_stats(db, current_company.id)
+    totals = stats['totals']
     
     # データが存在しない場合のデフォルト値
-    if not stats.total_awards:
+    if totals is None or not totals.count:
         return CompanyStrengthsResponse(
             company_name=current_company.company_name,
             total_awards=0,
@@ -66,51 +64,34 @@ async def get_company_strengths(
         )
     
     # 都道府県別実績
-    prefecture_stats = db.query(
-        models.CompanyAward.prefecture,
-        func.count(models.CompanyAward.id).label("count")
-    ).filter(
-        models.CompanyAward.company_id == current_company.id
-    ).group_by(models.CompanyAward.prefecture).all()
-    
-    prefectures = {p.prefecture: p.count for p in prefecture_stats if p.prefecture}
+    prefectures = {
+        dimensions.name('prefecture', p.prefecture_code): p.count
+        for p in stats['prefectures'] if p.prefecture_code is not None
+    }
     strongest_prefecture = max(prefectures, key=prefectures.get) if prefectures else None
     
     # 用途別実績
-    use_type_stats = db.query(
-        models.CompanyAward.use_type,
-        func.count(models.CompanyAward.id).label("count")
-    ).filter(
-        models.CompanyAward.company_id == current_company.id
-    ).group_by(models.CompanyAward.use_type).all()
-    
-    use_types = {u.use_type: u.count for u in use_type_stats if u.use_type}
+    use_types = {
+        dimensions.name('use_type', u.use_type_code): u.count
+        for u in stats['use_types'] if u.use_type_code is not None
+    }
     strongest_use_type = max(use_types, key=use_types.get) if use_types else None
     
     # 入札方式別実績
-    method_stats = db.query(
-        models.CompanyAward.method,
-        func.count(models.CompanyAward.id).label("count")
-    ).filter(
-        models.CompanyAward.company_id == current_company.id
-    ).group_by(models.CompanyAward.method).all()
-    
-    bid_methods = {m.method: m.count for m in method_stats if m.method}
+    bid_methods = {
+        dimensions.name('method', m.method_code): m.count
+        for m in stats['methods'] if m.method_code is not None
+    }
     
-    # 平均技術点（総合評価方式のみ）
-    avg_tech_score = db.query(
-        func.avg(models.CompanyAward.technical_score)
-    ).filter(
-        models.CompanyAward.company_id == current_company.id,
-        models.CompanyAward.technical_score.isnot(None)
-    ).scalar()
+    # 平均技術点（技術点のある実績のみ）
+    avg_tech_score = totals.avg_tech_score
     
     return CompanyStrengthsResponse(
         company_name=current_company.company_name,
-        total_awards=stats.total_awards or 0,
-        total_amount=int(stats.total_amount or 0),
-        avg_amount=float(stats.avg_amount or 0),
-        avg_win_rate=float(stats.avg_win_rate or 0),
+        total_awards=totals.count,
+        total_amount=int(totals.total_amount or 0),
+        avg_amount=float(totals.avg_amount or 0),
+        avg_win_rate=float(totals.avg_win_rate or 0),
         strongest_prefecture=strongest_prefecture,
         prefectures=prefectures,
         strongest_use_type=strongest_use_type,
@@ -127,25 +108,12 @@ async def get_performance_by_region(
     """
     地域別のパフォーマンス詳細を取得
     """
-    results = db.query(
-        models.CompanyAward.prefecture,
-        models.CompanyAward.municipality,
-        func.count(models.CompanyAward.id).label("count"),
-        func.avg(models.CompanyAward.win_rate).label("avg_win_rate"),
-        func.sum(models.CompanyAward.award_amount_jpy).label("total_amount")
-    ).filter(
-        models.CompanyAward.company_id == current_company.id
-    ).group_by(
-        models.CompanyAward.prefecture,
-        models.CompanyAward.municipality
-    ).order_by(
-        func.count(models.CompanyAward.id).desc()
-    ).all()
+    results = company_stats.get_company_stats(db, current_company.id)['regions']
     
     return [
         {
-            "prefecture": r.prefecture,
-            "municipality": r.municipality,
+            "prefecture": dimensions.name('prefecture', r.prefecture_code),
+            "municipality": dimensions.name('municipality', r.municipality_code),
             "count": r.count,
             "avg_win_rate": float(r.avg_win_rate) if r.avg_win_rate else 0,
             "total_amount": int(r.total_amount) if r.total_amount else 0
@@ -161,23 +129,11 @@ async def get_performance_by_type(
     """
     用途種別別のパフォーマンス詳細を取得
     """
-    results = db.query(
-        models.CompanyAward.use_type,
-        func.count(models.CompanyAward.id).label("count"),
-        func.avg(models.CompanyAward.win_rate).label("avg_win_rate"),
-        func.avg(models.CompanyAward.floor_area_m2).label("avg_floor_area"),
-        func.sum(models.CompanyAward.award_amount_jpy).label("total_amount")
-    ).filter(
-        models.CompanyAward.company_id == current_company.id
-    ).group_by(
-        models.CompanyAward.use_type
-    ).order_by(
-        func.count(models.CompanyAward.id).desc()
-    ).all()
+    results = company_stats.get_company_stats(db, current_company.id)['use_types']
     
     return [
         {
-            "use_type": r.use_type,
+            "use_type": dimensions.name('use_type', r.use_type_code),
             "count": r.count,
             "avg_win_rate": float(r.avg_win_rate) if r.avg_win_rate else 0,
             "avg_floor_area": float(r.avg_floor_area) if r.avg_floor_area else 0,
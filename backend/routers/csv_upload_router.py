@@ -2,16 +2,19 @@
 CSVアップロード関連のAPIエンドポイント
 """
 import io
+import os
 import csv
+import shutil
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from database import get_db
 from auth import get_current_company
 import models
-from datetime import datetime as dt
+import http_cache
 
 router = APIRouter(prefix="/csv", tags=["CSVアップロード"])
 
@@ -20,10 +23,32 @@ class UploadHistoryResponse(BaseModel):
     id: int
     file_name: str
     record_count: int
+    processed_count: int = 0
+    error_count: int = 0
     upload_status: str
-    error_message: str = None
+    error_message: Optional[str] = None
     uploaded_at: datetime
-    completed_at: datetime = None
+    completed_at: Optional[datetime] = None
+
+class UploadErrorResponse(BaseModel):
+    """CSVの行ごとの検証エラー"""
+    row: int
+    column: Optional[str] = None
+    reason: str
+
+class UploadErrorsResponse(BaseModel):
+    """アップロードの検証エラー一覧"""
+    upload_id: int
+    rejected_rows: int
+    errors: List[UploadErrorResponse]
+
+class ValidationReportResponse(BaseModel):
+    """CSV検証結果（取り込みは行わない）"""
+    total_rows: int
+    valid_rows: int
+    rejected_rows: int
+    error_count: int
+    errors: List[UploadErrorResponse]
 
 class CompanyAwardResponse(BaseModel):
     """会社落札実績レスポンス"""
@@ -43,7 +68,7 @@ class CompanyAwardResponse(BaseModel):
     participants_count: int
     technical_score: float = None
 
-@router.post("/upload-awards")
+@router.post("/upload-awards", status_code=status.HTTP_202_ACCEPTED)
 async def upload_company_awards(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -52,6 +77,12 @@ async def upload_company_awards(
     """
     会社の落札実績CSVをアップロード
     
+    ファイルを受け付けた時点で応答し、取り込みはバックグラウンドで行う。
+    進捗は /csv/upload-history で確認できる（同じ案件IDの既存データは上書き）
+    
+    検証エラーのある行は除外し、残りの行を取り込む。
+    除外した行と理由は /csv/upload-history/{upload_id}/errors で確認できる
+    
     CSVフォーマット:
     - tender_id: 案件ID
     - project_name: 工事名
@@ -80,104 +111,43 @@ async def upload_company_awards(
     upload_history = models.CSVUploadHistory(
         company_id=current_company.id,
         file_name=file.filename,
-        upload_status="processing",
+        upload_status="queued",
+        processed_count=0,
+        error_count=0,
         uploaded_at=datetime.utcnow()
     )
     db.add(upload_history)
     db.commit()
     
-    try:
-        # CSVファイルを読み込む
-        contents = await file.read()
-        csv_reader = csv.DictReader(io.StringIO(contents.decode('utf-8')))
-        
-        # 必須カラムの確認
-        required_columns = [
-            'tender_id', 'project_name', 'publisher', 'prefecture',
-            'municipality', 'use_type', 'method', 'floor_area_m2',
-            'award_date', 'award_amount_jpy', 'estimated_price_jpy',
-            'win_rate', 'participants_count'
-        ]
-        
-        # 最初の行でヘッダーを確認
-        rows = list(csv_reader)
-        if not rows:
-            raise ValueError("CSVファイルが空です")
-        
-        headers = set(rows[0].keys())
-        missing_columns = set(required_columns) - headers
-        if missing_columns:
-            raise ValueError(f"必須カラムが不足しています: {', '.join(missing_columns)}")
-        
-        # 既存のデータを削除（オプション：重複を避けるため）
-        existing_tender_ids = [row['tender_id'] for row in rows]
-        if existing_tender_ids:
-            db.query(models.CompanyAward).filter(
-                models.CompanyAward.company_id == current_company.id,
-                models.CompanyAward.tender_id.in_(existing_tender_ids)
-            ).delete(synchronize_session=False)
-        
-        # データを登録
-        records_added = 0
-        for row in rows:
-            # 日付の変換
-            award_date_str = row['award_date']
-            award_date = dt.strptime(award_date_str, '%Y-%m-%d').date()
-            
-            # technical_scoreの処理
-            technical_score = None
-            if row.get('technical_score') and row['technical_score'].strip():
-                try:
-                    technical_score = float(row['technical_score'])
-                except ValueError:
-                    pass
-            
-            award = models.CompanyAward(
-                company_id=current_company.id,
-                tender_id=str(row['tender_id']),
-                project_name=str(row['project_name']),
-                publisher=str(row['publisher']),
-                prefecture=str(row['prefecture']),
-                municipality=str(row['municipality']),
-                use_type=str(row['use_type']),
-                method=str(row['method']),
-                floor_area_m2=float(row['floor_area_m2']),
-                award_date=award_date,
-                award_amount_jpy=int(row['award_amount_jpy']),
-                estimated_price_jpy=int(row['estimated_price_jpy']),
-                win_rate=float(row['win_rate']),
-                participants_count=int(row['participants_count']),
-                technical_score=technical_score
-            )
-            db.add(award)
-            records_added += 1
-        
-        # コミット
-        db.commit()
-        
-        # アップロード履歴を更新
-        upload_history.upload_status = "completed"
-        upload_history.record_count = records_added
-        upload_history.completed_at = datetime.utcnow()
-        db.commit()
-        
-        return {
-            "message": f"{records_added}件のデータを正常にアップロードしました",
-            "upload_id": upload_history.id,
-            "record_count": records_added
-        }
-        
-    except Exception as e:
-        # エラー時の処理
+    # pandas を使うため初回の利用時に import する（起動時間の短縮）
+    import csv_import_worker
+    
+    # 一時ファイルに保存（メモリに全体を読み込まない）
+    path = csv_import_worker.upload_path(upload_history.id)
+    with open(path, 'wb') as out:
+        await run_in_threadpool(shutil.copyfileobj, file.file, out)
+    
+    # 必須カラムの確認（ヘッダーのみ）
+    missing = csv_import_worker.missing_columns(path)
+    if missing:
+        os.remove(path)
         upload_history.upload_status = "failed"
-        upload_history.error_message = str(e)
+        upload_history.error_message = f"必須カラムが不足しています: {', '.join(missing)}"
         upload_history.completed_at = datetime.utcnow()
         db.commit()
-        
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"CSVの処理中にエラーが発生しました: {str(e)}"
+            detail=f"CSVの処理中にエラーが発生しました: {upload_history.error_message}"
         )
+    
+    csv_import_worker.submit_upload(upload_history.id, current_company.id, path)
+    
+    return {
+        "message": "アップロードを受け付けました。取り込み状況はアップロード履歴で確認できます",
+        "upload_id": upload_history.id,
+        "upload_status": upload_history.upload_status,
+        "record_count": 0
+    }
 
 @router.get("/upload-history", response_model=List[UploadHistoryResponse])
 async def get_upload_history(
@@ -196,6 +166,8 @@ async def get_upload_history(
             id=h.id,
             file_name=h.file_name,
             record_count=h.record_count or 0,
+            processed_count=h.processed_count or 0,
+            error_count=h.error_count or 0,
             upload_status=h.upload_status,
             error_message=h.error_message,
             uploaded_at=h.uploaded_at,
@@ -204,6 +176,66 @@ async def get_upload_history(
         for h in history
     ]
 
+@router.post("/validate-awards", response_model=ValidationReportResponse)
+async def validate_company_awards(
+    file: UploadFile = File(...),
+    limit: int = 1000,
+    current_company: models.Company = Depends(get_current_company)
+):
+    """
+    落札実績CSVを検証のみ行う（取り込みは行わない）
+    
+    行ごとのエラー（行番号・カラム・理由）を最大 limit 件返す
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSVファイルのみアップロード可能です"
+        )
+    
+    import csv_validation
+    
+    try:
+        result = await run_in_threadpool(csv_validation.validate_award_csv, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return ValidationReportResponse(
+        **result.summary(),
+        errors=[UploadErrorResponse(**e) for e in result.error_report(limit)]
+    )
+
+@router.get("/upload-history/{upload_id}/errors", response_model=UploadErrorsResponse)
+async def get_upload_errors(
+    upload_id: int,
+    skip: int = 0,
+    limit: int = 1000,
+    db: Session = Depends(get_db),
+    current_company: models.Company = Depends(get_current_company)
+):
+    """
+    アップロードで除外された行のエラー一覧を取得（行番号順）
+    """
+    history = db.query(models.CSVUploadHistory).filter(
+        models.CSVUploadHistory.id == upload_id,
+        models.CSVUploadHistory.company_id == current_company.id
+    ).first()
+    if not history:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="アップロード履歴が見つかりません")
+    
+    errors = db.query(models.CSVUploadError).filter(
+        models.CSVUploadError.upload_id == upload_id
+    ).order_by(models.CSVUploadError.row_number, models.CSVUploadError.id).offset(skip).limit(limit).all()
+    
+    return UploadErrorsResponse(
+        upload_id=upload_id,
+        rejected_rows=history.error_count or 0,
+        errors=[
+            UploadErrorResponse(row=e.row_number, column=e.column_name, reason=e.reason)
+            for e in errors
+        ]
+    )
+
 @router.get("/company-awards", response_model=List[CompanyAwardResponse])
 async def get_company_awards(
     skip: int = 0,
@@ -239,8 +271,11 @@ async def get_company_awards(
         for a in awards
     ]
 
+# テンプレートは固定の内容のため、ブラウザ・プロキシに1日キャッシュさせる
+TEMPLATE_MAX_AGE = 60 * 60 * 24
+
 @router.get("/download-template")
-async def download_csv_template():
+async def download_csv_template(request: Request):
     """
     CSVテンプレートをダウンロード
     """
@@ -291,14 +326,17 @@ async def download_csv_template():
     csv_writer = csv.DictWriter(output, fieldnames=headers)
     csv_writer.writeheader()
     csv_writer.writerows(template_rows)
-    output.seek(0)
+    content = output.getvalue().encode('utf-8-sig')
     
-    from fastapi.responses import StreamingResponse
+    validators = http_cache.validators_for_content(content, TEMPLATE_MAX_AGE)
+    if http_cache.is_not_modified(request, validators):
+        return http_cache.not_modified(validators)
     
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8-sig')),
+    return Response(
+        content,
         media_type="text/csv",
         headers={
-            "Content-Disposition": "attachment; filename=company_awards_template.csv"
+            "Content-Disposition": "attachment; filename=company_awards_template.csv",
+            **validators.headers()
         }
     )
\ No newline at end of file
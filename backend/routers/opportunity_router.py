@@ -0,0 +1,108 @@
+"""
+案件推薦関連のAPIエンドポイント
+"""
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from pydantic import BaseModel
+from database import get_db
+from auth import get_current_company
+import models
+from opportunity_ratios import DEFAULT_RATIOS
+
+router = APIRouter(prefix="/opportunities", tags=["案件推薦"])
+
+class OpportunityResponse(BaseModel):
+    """有望案件レスポンス"""
+    tender_id: str
+    title: Optional[str] = None
+    prefecture: Optional[str] = None
+    municipality: Optional[str] = None
+    use_type: Optional[str] = None
+    bid_method: Optional[str] = None
+    bid_date: Optional[date] = None
+    estimated_price: Optional[int] = None
+    bid_ratio: int
+    bid_amount: Optional[int] = None
+    win_probability: float
+    rank: Optional[str] = None
+    confidence: Optional[str] = None
+
+@router.get("/top", response_model=List[OpportunityResponse])
+async def get_top_opportunities(
+    bid_ratio: int = Query(90, ge=50, le=120,
+                           description=f"予定価格比(%)。スコアを事前計算した比率（既定: {', '.join(map(str, DEFAULT_RATIOS))}）のみ"),
+    prefecture: Optional[str] = None,
+    use_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_probability: float = Query(0.0, ge=0.0, le=1.0),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_company: models.Company = Depends(get_current_company)
+):
+    """
+    勝率の高い順に有望案件を取得
+
+    opportunity_scorer.py が事前計算したスコアを参照する。
+    指定した予定価格比でのスコアが対象（スコアのない比率は 422）
+    """
+    if bid_ratio not in DEFAULT_RATIOS:
+        # opportunity_scorer.py --ratios で既定以外の比率を計算している場合はそれも受け付ける
+        scored = db.execute(
+            text("SELECT DISTINCT bid_ratio FROM tender_opportunity_scores WHERE company_id = :company_id"),
+            {"company_id": current_company.id}
+        ).scalars().all()
+        if bid_ratio not in scored:
+            available = sorted(set(DEFAULT_RATIOS) | set(scored))
+            raise HTTPException(
+                status_code=422,
+                detail=f"bid_ratio must be one of the scored ratios: {', '.join(map(str, available))}"
+            )
+
+    conditions = [
+        "s.company_id = :company_id",
+        "s.bid_ratio = :bid_ratio",
+        "s.bid_date >= :date_from",
+        "s.win_probability >= :min_probability",
+    ]
+    params = {
+        "company_id": current_company.id,
+        "bid_ratio": bid_ratio,
+        "date_from": max(date_from, date.today()) if date_from else date.today(),
+        "min_probability": min_probability,
+        "limit": limit,
+    }
+
+    if prefecture:
+        conditions.append("s.prefecture = :prefecture")
+        params["prefecture"] = prefecture
+    if use_type:
+        conditions.append("s.use_type = :use_type")
+        params["use_type"] = use_type
+    if date_to:
+        conditions.append("s.bid_date <= :date_to")
+        params["date_to"] = date_to
+
+    query = text(f"""
+        SELECT s.tender_id, t.title, s.prefecture, t.municipality, s.use_type,
+               t.method as bid_method, s.bid_date, s.estimated_price_jpy as estimated_price,
+               s.bid_ratio, s.win_probability, s.rank, s.confidence
+        FROM tender_opportunity_scores s
+        LEFT JOIN tenders_open t ON t.tender_id = s.tender_id AND t.bid_date = s.bid_date
+        WHERE {' AND '.join(conditions)}
+        ORDER BY s.win_probability DESC, s.bid_date
+        LIMIT :limit
+    """)
+
+    rows = db.execute(query, params).mappings().all()
+
+    return [
+        OpportunityResponse(
+            **row,
+            bid_amount=int(row["estimated_price"] * row["bid_ratio"] / 100) if row["estimated_price"] else None
+        )
+        for row in rows
+    ]
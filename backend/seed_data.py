@@ -5,13 +5,17 @@ Seed data script for Docker PostgreSQL
 """
 import os
 import sys
-import json
 import csv
 import psycopg2
 from datetime import datetime
 import pandas as pd
 from pathlib import Path
 
+from bulk_loader import copy_tenders, insert_tenders_rowwise
+from dimensions import encode_missing
+from migrate import apply_migrations
+from tender_stream import stream_tender_batches
+
 # データベース接続設定（Docker環境用）
 # 環境変数から取得、なければデフォルト値を使用
 import os
@@ -52,67 +56,8 @@ def get_connection():
     return psycopg2.connect(**DB_CONFIG)
 
 def create_tables(conn):
-    """必要なテーブルを作成"""
-    cursor = conn.cursor()
-    
-    # 公開中案件テーブル
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tenders_open (
-            tender_id VARCHAR(100) PRIMARY KEY,
-            source VARCHAR(50),
-            publisher VARCHAR(200),
-            title VARCHAR(500),
-            prefecture VARCHAR(50),
-            municipality VARCHAR(100),
-            address_text TEXT,
-            use_type VARCHAR(100),
-            method VARCHAR(100),
-            jv_allowed BOOLEAN DEFAULT FALSE,
-            floor_area_m2 DECIMAL(10, 2),
-            bid_date DATE,
-            notice_date DATE,
-            estimated_price_jpy BIGINT,
-            minimum_price_jpy BIGINT,
-            origin_url TEXT,
-            last_seen_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # 落札結果テーブル
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS awards (
-            award_id VARCHAR(100) PRIMARY KEY,
-            tender_id VARCHAR(100),
-            project_name VARCHAR(500),
-            contractor VARCHAR(200),
-            contractor_id VARCHAR(50),
-            contract_amount BIGINT,
-            contract_date DATE,
-            participants_count INTEGER,
-            prefecture VARCHAR(50),
-            municipality VARCHAR(100),
-            use_type VARCHAR(100),
-            floor_area_m2 DECIMAL(10, 2),
-            bid_method VARCHAR(100),
-            evaluation_score DECIMAL(5, 2),
-            price_score DECIMAL(5, 2),
-            estimated_price BIGINT,
-            win_rate DECIMAL(5, 2),
-            jv_partner VARCHAR(200),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # インデックスの作成
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tenders_prefecture ON tenders_open(prefecture)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tenders_bid_date ON tenders_open(bid_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tenders_use_type ON tenders_open(use_type)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_awards_contractor ON awards(contractor)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_awards_prefecture ON awards(prefecture)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_awards_contract_date ON awards(contract_date)")
-    
-    conn.commit()
+    """必要なテーブルを作成（migrations/ の未適用のマイグレーションを適用）"""
+    apply_migrations(conn)
     print("✅ テーブル作成完了")
 
 def load_tender_data(conn):
@@ -125,59 +70,27 @@ def load_tender_data(conn):
     
     print(f"📄 読み込み中: {json_file}")
     
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    def records():
+        # ファイルを逐次パースし、先読みしたバッチ単位で流す
+        return (item for batch in stream_tender_batches(str(json_file), batch_size=5000) for item in batch)
     
+    # 既存データのクリアは投入と同じトランザクションで行う（失敗した場合は元に戻る）
     cursor = conn.cursor()
-    
-    # 既存データをクリア
     cursor.execute("TRUNCATE TABLE tenders_open CASCADE")
+    cursor.close()
+    try:
+        stats = copy_tenders(conn, records())
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        # 不正な値のレコードがあると COPY 全体が失敗するため、1件ずつ投入して不正なものだけスキップする
+        print(f"⚠️ COPY に失敗したため1件ずつ投入します: {str(e).splitlines()[0]}")
+        cursor = conn.cursor()
+        cursor.execute("TRUNCATE TABLE tenders_open CASCADE")
+        cursor.close()
+        stats = insert_tenders_rowwise(conn, records())
     
-    # データを挿入
-    insert_query = """
-        INSERT INTO tenders_open (
-            tender_id, source, publisher, title, prefecture, municipality,
-            address_text, use_type, method, jv_allowed, floor_area_m2,
-            bid_date, notice_date, estimated_price_jpy, minimum_price_jpy,
-            origin_url, last_seen_at
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        ) ON CONFLICT (tender_id) DO NOTHING
-    """
-    
-    count = 0
-    for item in data:
-        try:
-            cursor.execute(insert_query, (
-                item.get('tender_id'),
-                item.get('source'),
-                item.get('publisher'),
-                item.get('title'),
-                item.get('prefecture'),
-                item.get('municipality'),
-                item.get('address_text'),
-                item.get('use'),
-                item.get('method'),
-                item.get('jv_allowed', False),
-                item.get('floor_area_m2'),
-                item.get('bid_date'),
-                item.get('notice_date'),
-                item.get('estimated_price_jpy'),
-                item.get('minimum_price_jpy'),
-                item.get('origin_url'),
-                item.get('last_seen_at')
-            ))
-            count += 1
-            
-            if count % 10000 == 0:
-                conn.commit()
-                print(f"  - {count:,} 件処理済み...")
-        except Exception as e:
-            print(f"エラー (tender_id: {item.get('tender_id')}): {e}")
-            continue
-    
-    conn.commit()
-    print(f"✅ 公開中案件データ {count:,} 件を投入完了")
+    print(f"✅ 公開中案件データ {stats['inserted']:,} 件を投入完了")
+    if stats['rejected']:
+        print(f"⚠️ 入札日のない・不正なレコード {stats['rejected']:,} 件をスキップしました")
 
 def load_award_data(conn):
     """CSVファイルから落札結果データを読み込み"""
@@ -497,6 +410,9 @@ def main():
         load_tender_data(conn)
         load_award_data(conn)
         
+        # カテゴリ値の整数コード（dim_* テーブル）を埋める
+        encode_missing(conn)
+        
         # データ検証
         verify_data(conn)
         
@@ -5,7 +5,6 @@ Azure PostgreSQL用シードデータスクリプト
 """
 import os
 import sys
-import json
 import csv
 import psycopg2
 from datetime import datetime, timedelta
@@ -13,6 +12,10 @@ import random
 from pathlib import Path
 from urllib.parse import urlparse, unquote
 
+from bulk_loader import copy_tenders, insert_tenders_rowwise
+from migrate import apply_migrations
+from tender_stream import stream_tender_batches
+
 # データベース接続設定
 def get_db_config():
     """データベース接続設定を取得"""
@@ -36,119 +39,12 @@ def get_connection():
     return psycopg2.connect(**config)
 
 def create_tables(conn):
-    """必要なテーブルを作成"""
-    cursor = conn.cursor()
-    
+    """必要なテーブルを作成（migrations/ の未適用のマイグレーションを適用）
+
+    tenders_open の月別パーティション、*_code カラムとそれを埋めるトリガーも migrations/ で用意される
+    """
     print("📋 Creating tables...")
-    
-    # 公開中案件テーブル
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tenders_open (
-            tender_id VARCHAR(100) PRIMARY KEY,
-            source VARCHAR(50),
-            publisher VARCHAR(200),
-            title VARCHAR(500),
-            prefecture VARCHAR(50),
-            municipality VARCHAR(100),
-            address_text TEXT,
-            use_type VARCHAR(100),
-            method VARCHAR(100),
-            jv_allowed BOOLEAN DEFAULT FALSE,
-            floor_area_m2 DECIMAL(10, 2),
-            bid_date DATE,
-            notice_date DATE,
-            estimated_price_jpy BIGINT,
-            minimum_price_jpy BIGINT,
-            origin_url TEXT,
-            last_seen_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # 落札結果テーブル
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS awards (
-            award_id VARCHAR(100) PRIMARY KEY,
-            tender_id VARCHAR(100),
-            project_name VARCHAR(500),
-            contractor VARCHAR(200),
-            contractor_id VARCHAR(50),
-            contract_amount BIGINT,
-            contract_date DATE,
-            participants_count INTEGER,
-            prefecture VARCHAR(50),
-            municipality VARCHAR(100),
-            use_type VARCHAR(100),
-            floor_area_m2 DECIMAL(10, 2),
-            bid_method VARCHAR(100),
-            evaluation_score DECIMAL(5, 2),
-            price_score DECIMAL(5, 2),
-            estimated_price BIGINT,
-            win_rate DECIMAL(5, 2),
-            jv_partner VARCHAR(200),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # 会社テーブル
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS companies (
-            id SERIAL PRIMARY KEY,
-            company_name VARCHAR(200) UNIQUE NOT NULL,
-            email VARCHAR(255) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            is_active BOOLEAN DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # 会社の落札実績テーブル
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS company_awards (
-            id SERIAL PRIMARY KEY,
-            company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
-            tender_id VARCHAR(100),
-            project_name VARCHAR(500),
-            publisher VARCHAR(200),
-            prefecture VARCHAR(50),
-            municipality VARCHAR(100),
-            use_type VARCHAR(100),
-            method VARCHAR(100),
-            floor_area_m2 DECIMAL(10, 2),
-            award_date DATE,
-            award_amount_jpy BIGINT,
-            estimated_price_jpy BIGINT,
-            win_rate DECIMAL(5, 2),
-            participants_count INTEGER,
-            technical_score DECIMAL(5, 2),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # CSVアップロード履歴テーブル
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS csv_upload_history (
-            id SERIAL PRIMARY KEY,
-            company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
-            file_name VARCHAR(255),
-            record_count INTEGER,
-            upload_status VARCHAR(50),
-            error_message TEXT,
-            uploaded_at TIMESTAMP,
-            completed_at TIMESTAMP
-        )
-    """)
-    
-    # インデックスの作成
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tenders_prefecture ON tenders_open(prefecture)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tenders_bid_date ON tenders_open(bid_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tenders_use_type ON tenders_open(use_type)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_awards_contractor ON awards(contractor)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_awards_prefecture ON awards(prefecture)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_awards_contract_date ON awards(contract_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_company_awards_company_id ON company_awards(company_id)")
-    
-    conn.commit()
+    apply_migrations(conn)
     print("✅ Tables created successfully")
 
 def load_tender_data_from_file(conn, file_path):
@@ -159,59 +55,27 @@ def load_tender_data_from_file(conn, file_path):
     
     print(f"📄 Loading tender data from {file_path}...")
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    def records():
+        # ファイルを逐次パースし、先読みしたバッチ単位で流す
+        return (item for batch in stream_tender_batches(str(file_path), batch_size=5000) for item in batch)
     
+    # 既存データのクリアは投入と同じトランザクションで行う（失敗した場合は元に戻る）
     cursor = conn.cursor()
-    
-    # 既存データをクリア
     cursor.execute("TRUNCATE TABLE tenders_open CASCADE")
-    
-    # データを挿入
-    insert_query = """
-        INSERT INTO tenders_open (
-            tender_id, source, publisher, title, prefecture, municipality,
-            address_text, use_type, method, jv_allowed, floor_area_m2,
-            bid_date, notice_date, estimated_price_jpy, minimum_price_jpy,
-            origin_url, last_seen_at
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        ) ON CONFLICT (tender_id) DO NOTHING
-    """
-    
-    count = 0
-    for item in data:
-        try:
-            cursor.execute(insert_query, (
-                item.get('tender_id'),
-                item.get('source'),
-                item.get('publisher'),
-                item.get('title'),
-                item.get('prefecture'),
-                item.get('municipality'),
-                item.get('address_text'),
-                item.get('use'),
-                item.get('method'),
-                item.get('jv_allowed', False),
-                item.get('floor_area_m2'),
-                item.get('bid_date'),
-                item.get('notice_date'),
-                item.get('estimated_price_jpy'),
-                item.get('minimum_price_jpy'),
-                item.get('origin_url'),
-                item.get('last_seen_at')
-            ))
-            count += 1
-            
-            if count % 10000 == 0:
-                conn.commit()
-                print(f"  - {count:,} records processed...")
-        except Exception as e:
-            print(f"Error (tender_id: {item.get('tender_id')}): {e}")
-            continue
-    
-    conn.commit()
-    print(f"✅ Loaded {count:,} tender records")
+    cursor.close()
+    try:
+        stats = copy_tenders(conn, records())
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        # 不正な値のレコードがあると COPY 全体が失敗するため、1件ずつ投入して不正なものだけスキップする
+        print(f"⚠️ COPY failed, falling back to row-by-row inserts: {str(e).splitlines()[0]}")
+        cursor = conn.cursor()
+        cursor.execute("TRUNCATE TABLE tenders_open CASCADE")
+        cursor.close()
+        stats = insert_tenders_rowwise(conn, records())
+    
+    print(f"✅ Loaded {stats['inserted']:,} tender records")
+    if stats['rejected']:
+        print(f"⚠️ Skipped {stats['rejected']:,} records without bid_date or with invalid values")
     return True
 
 def load_award_data_from_csv(conn, file_paths):
@@ -498,18 +362,19 @@ def load_company_data(conn):
     cursor.execute("TRUNCATE TABLE companies CASCADE")
     
     # デモ用会社データを挿入
+    # company_code は migrations/ の companies で NOT NULL
     companies = [
-        ('星田建設株式会社', 'hoshida@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY.Q2JkB/EJ/d5.'),  # password: password123
-        ('デモ建設株式会社', 'demo@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY.Q2JkB/EJ/d5.'),
-        ('テスト工業株式会社', 'test@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY.Q2JkB/EJ/d5.')
+        ('HOSHIDA001', '星田建設株式会社', 'hoshida@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY.Q2JkB/EJ/d5.'),  # password: password123
+        ('DEMO001', 'デモ建設株式会社', 'demo@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY.Q2JkB/EJ/d5.'),
+        ('TEST001', 'テスト工業株式会社', 'test@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY.Q2JkB/EJ/d5.')
     ]
     
-    for company_name, email, password_hash in companies:
+    for company_code, company_name, email, password_hash in companies:
         cursor.execute("""
-            INSERT INTO companies (company_name, email, password_hash)
-            VALUES (%s, %s, %s)
+            INSERT INTO companies (company_code, company_name, email, password_hash)
+            VALUES (%s, %s, %s, %s)
             ON CONFLICT (email) DO NOTHING
-        """, (company_name, email, password_hash))
+        """, (company_code, company_name, email, password_hash))
     
     conn.commit()
     print(f"✅ Loaded {len(companies)} company records")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+複数ワーカーでのAPIサーバーの起動（スナップショット共有モード）
+
+`uvicorn main:app --workers N` ではワーカーごとに DataLoader がDBから全データを読み込み、
+それぞれがコピーを持つ。このスクリプトでは次のように役割を分ける:
+
+1. 親プロセス（ローダー）が DATA_SNAPSHOT_DIR のスナップショットをDBの data_versions と比較し、
+   存在しない・古い場合だけ1回書き出す
+2. uvicorn のワーカーを起動する。ワーカーは DATA_SNAPSHOT_MANAGED=1 で起動され、CURRENT が指す
+   スナップショットを読み取り専用でメモリマップする（OSのページキャッシュ上の1つのコピーを共有）
+3. ローダーは --refresh-interval 秒ごとに data_versions を確認し、変わっていれば新しいスナップショットを
+   書き出して、CURRENT に「--swap-delay 秒後に切り替え」として公開する。
+   ワーカーは CURRENT を SNAPSHOT_POLL_INTERVAL 秒ごとに確認して新しいスナップショットを先に開き、
+   指定時刻に一斉に切り替える（--swap-delay は SNAPSHOT_POLL_INTERVAL より長くする）
+4. 未完了のCSVアップロードの再投入はローダーが起動時に1回だけ行い、このプロセスで取り込む
+   （ワーカーごとに行うと、別のワーカーが取り込み中のアップロードを二重に処理してしまう）
+
+使い方:
+    DATA_SNAPSHOT_DIR=/app/data/snapshots python serve.py --workers 4
+    python serve.py --workers 4 --snapshot-dir ./snapshots --refresh-interval 60 --port 8000
+"""
+import argparse
+import os
+import threading
+import time
+
+import psycopg2
+import uvicorn
+from dotenv import load_dotenv
+
+from data_version import get_data_versions
+from snapshot import export_snapshot, open_current_snapshot
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+
+def refresh_snapshot(database_url: str, snapshot_dir: str, keep: int, swap_delay: float):
+    """スナップショットが古ければ書き出して公開し、そのパスを返す（最新なら None）"""
+    conn = psycopg2.connect(database_url)
+    try:
+        try:
+            current = open_current_snapshot(snapshot_dir)
+        except Exception as e:
+            print(f"⚠️ Could not open current snapshot: {e}")
+            current = None
+        if current is not None and current.is_current(get_data_versions(conn)):
+            return None
+
+        # 起動前の初回は即時、稼働中のワーカーがいる場合は切り替え時刻を揃える
+        activate_at = time.time() + swap_delay if current is not None else None
+        return export_snapshot(conn, snapshot_dir, keep=keep, activate_at=activate_at)
+    finally:
+        conn.close()
+
+
+def run_refresher(database_url: str, snapshot_dir: str, keep: int, interval: float, swap_delay: float):
+    while True:
+        time.sleep(interval)
+        try:
+            start_time = time.time()
+            path = refresh_snapshot(database_url, snapshot_dir, keep, swap_delay)
+            if path:
+                print(f"📦 Snapshot {os.path.basename(path)} written in {time.time() - start_time:.1f}s, "
+                      f"workers switch in {swap_delay:.0f}s")
+        except Exception as e:
+            print(f"⚠️ Snapshot refresh failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スナップショットを共有する複数ワーカーでAPIサーバーを起動")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', '2')))
+    parser.add_argument('--snapshot-dir', default=os.getenv('DATA_SNAPSHOT_DIR'),
+                        help="スナップショットの保存先（既定は環境変数 DATA_SNAPSHOT_DIR）")
+    parser.add_argument('--refresh-interval', type=float,
+                        default=float(os.getenv('SNAPSHOT_REFRESH_INTERVAL', '300')),
+                        help="data_versions を確認する間隔（秒）")
+    parser.add_argument('--swap-delay', type=float, default=float(os.getenv('SNAPSHOT_SWAP_DELAY', '5')),
+                        help="新しいスナップショットを公開してからワーカーが切り替えるまでの秒数")
+    parser.add_argument('--keep', type=int, default=3, help="残すスナップショットの数")
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        parser.error("DATABASE_URL is not set")
+    if not args.snapshot_dir:
+        parser.error("--snapshot-dir or DATA_SNAPSHOT_DIR is required")
+    if args.swap_delay <= float(os.getenv('SNAPSHOT_POLL_INTERVAL', '1')):
+        parser.error("--swap-delay must be longer than SNAPSHOT_POLL_INTERVAL")
+
+    start_time = time.time()
+    path = refresh_snapshot(database_url, args.snapshot_dir, args.keep, args.swap_delay)
+    if path:
+        print(f"📦 Snapshot {os.path.basename(path)} written in {time.time() - start_time:.1f}s")
+    else:
+        print(f"📦 Snapshot in {args.snapshot_dir} is up to date")
+
+    try:
+        import csv_import_worker
+        csv_import_worker.recover_pending_uploads()
+    except Exception as e:
+        print(f"⚠️ CSV upload recovery failed: {e}")
+
+    # ワーカーは起動時にこの環境変数を引き継ぐ
+    os.environ['DATA_SNAPSHOT_DIR'] = os.path.abspath(args.snapshot_dir)
+    os.environ['DATA_SNAPSHOT_MANAGED'] = '1'
+    os.environ['CSV_IMPORT_RECOVERY_MANAGED'] = '1'
+
+    threading.Thread(
+        target=run_refresher,
+        args=(database_url, args.snapshot_dir, args.keep, args.refresh_interval, args.swap_delay),
+        name='snapshot-refresher',
+        daemon=True
+    ).start()
+
+    print(f"🚀 Starting {args.workers} workers on {args.host}:{args.port}")
+    uvicorn.run('main:app', host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
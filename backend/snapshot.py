@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+落札実績・入札予定案件のカラム型スナップショット
+
+DataLoader が起動時に読み込むデータセットを、カラムごとの NumPy (.npy) ファイルとして書き出す。
+- 数値・日付は .npy の配列（欠損は NaN / NaT、整数・真偽値は別途マスク）
+- 種類の少ない文字列は辞書エンコード（コード配列 + manifest.json のカテゴリ一覧）
+- ID・件名などの一意な文字列は UTF-8 のバイト列 + オフセット配列
+
+読み込み側は np.load(mmap_mode='r') で読み取り専用にメモリマップするため、
+複数の uvicorn ワーカーがOSのページキャッシュ上の1つのコピーを共有し、起動時の読み込みもほぼ不要になる。
+
+出力ディレクトリの構成:
+    <DATA_SNAPSHOT_DIR>/CURRENT            現在のスナップショット名（2行目は切り替え時刻。serve.py を参照）
+    <DATA_SNAPSHOT_DIR>/<name>/manifest.json
+    <DATA_SNAPSHOT_DIR>/<name>/<dataset>.<column>.npy ...
+
+manifest.json には書き出し時点の data_versions を記録し、DBのバージョンと異なる場合は読み込まない
+
+使い方:
+    python snapshot.py                       # DATA_SNAPSHOT_DIR に書き出し
+    python snapshot.py --output ./snapshots --keep 3
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+
+from data_version import VERSIONED_TABLES, ensure_data_versions, get_data_versions
+
+SNAPSHOT_FORMAT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+FETCH_SIZE = 50000
+
+# 一意な値の割合がこれ以下の文字列カラムは辞書エンコード
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# 自社の落札実績として DataLoader.company_data に分ける落札者
+COMPANY_CONTRACTOR = '星田建設株式会社'
+
+# データセット名: (SQL, {カラム名: 型})
+DATASETS = {
+    'awards': ("""
+        SELECT
+            tender_id,
+            project_name,
+            contractor as publisher,
+            prefecture,
+            municipality,
+            prefecture || municipality as address,
+            use_type,
+            bid_method,
+            floor_area_m2,
+            contract_date as award_date,
+            contractor,
+            contract_amount,
+            estimated_price,
+            win_rate,
+            participants_count,
+            evaluation_score,
+            contract_date
+        FROM awards
+    """, {
+        'tender_id': 'str', 'project_name': 'str', 'publisher': 'str', 'prefecture': 'str',
+        'municipality': 'str', 'address': 'str', 'use_type': 'str', 'bid_method': 'str',
+        'floor_area_m2': 'float', 'award_date': 'date', 'contractor': 'str',
+        'contract_amount': 'int', 'estimated_price': 'int', 'win_rate': 'float',
+        'participants_count': 'int', 'evaluation_score': 'float', 'contract_date': 'date',
+    }),
+    # 入札日順に並べて保存し、読み込み時は二分探索で「今日以降」を切り出す
+    'tenders': ("""
+        SELECT
+            tender_id,
+            title,
+            publisher,
+            prefecture,
+            municipality,
+            address_text,
+            use_type as use,
+            method,
+            floor_area_m2,
+            bid_date,
+            notice_date,
+            estimated_price_jpy,
+            minimum_price_jpy,
+            jv_allowed,
+            origin_url,
+            last_seen_at
+        FROM tenders_open
+        WHERE bid_date >= CURRENT_DATE
+        AND tender_id NOT LIKE 'tender_id%'
+        ORDER BY bid_date
+    """, {
+        'tender_id': 'str', 'title': 'str', 'publisher': 'str', 'prefecture': 'str',
+        'municipality': 'str', 'address_text': 'str', 'use': 'str', 'method': 'str',
+        'floor_area_m2': 'float', 'bid_date': 'date', 'notice_date': 'date',
+        'estimated_price_jpy': 'int', 'minimum_price_jpy': 'int', 'jv_allowed': 'bool',
+        'origin_url': 'str', 'last_seen_at': 'datetime',
+    }),
+}
+
+
+# ---------------------------------------------------------------------------
+# 書き出し
+# ---------------------------------------------------------------------------
+
+def _save(directory: str, file_name: str, array: np.ndarray) -> str:
+    np.save(os.path.join(directory, file_name), array, allow_pickle=False)
+    return file_name
+
+
+def _encode_column(directory: str, prefix: str, kind: str, values: List) -> Dict:
+    """1カラムを .npy に書き出し、manifest に記録する情報を返す"""
+    spec = {'kind': kind}
+    if kind == 'str':
+        distinct = set(v for v in values if v is not None)
+        if len(distinct) <= max(1, int(len(values) * CATEGORY_MAX_UNIQUE_RATIO)):
+            categories = sorted(distinct)
+            lookup = {v: i for i, v in enumerate(categories)}
+            codes = np.fromiter((lookup[v] if v is not None else -1 for v in values),
+                                dtype=np.int32, count=len(values))
+            spec.update(encoding='category', categories=categories,
+                        codes=_save(directory, f"{prefix}.codes.npy", codes))
+        else:
+            encoded = [v.encode('utf-8') if v is not None else b'' for v in values]
+            offsets = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            spec.update(encoding='utf8',
+                        data=_save(directory, f"{prefix}.data.npy", blob),
+                        offsets=_save(directory, f"{prefix}.offsets.npy", offsets))
+            nulls = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+            if nulls.any():
+                spec['nulls'] = _save(directory, f"{prefix}.nulls.npy", nulls)
+        return spec
+
+    if kind == 'float':
+        array = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    elif kind == 'int':
+        nulls = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+        array = np.fromiter((0 if v is None else int(v) for v in values), dtype=np.int64, count=len(values))
+        if nulls.any():
+            spec['nulls'] = _save(directory, f"{prefix}.nulls.npy", nulls)
+    elif kind == 'bool':
+        array = np.fromiter((-1 if v is None else int(bool(v)) for v in values), dtype=np.int8, count=len(values))
+    elif kind == 'date':
+        array = np.array(['NaT' if v is None else v.isoformat() for v in values], dtype='datetime64[D]')
+    elif kind == 'datetime':
+        array = np.array(['NaT' if v is None else v.isoformat() for v in values], dtype='datetime64[us]')
+    else:
+        raise ValueError(f"Unknown column kind: {kind}")
+    spec['values'] = _save(directory, f"{prefix}.npy", array)
+    return spec
+
+
+def _export_dataset(conn, directory: str, name: str) -> Dict:
+    query, schema = DATASETS[name]
+    columns = {column: [] for column in schema}
+
+    # サーバーサイドカーソルで少しずつ取得
+    cursor = conn.cursor(name=f"snapshot_{name}", cursor_factory=psycopg2.extensions.cursor)
+    cursor.itersize = FETCH_SIZE
+    cursor.execute(query)
+    names = list(schema)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for i, column in enumerate(names):
+            columns[column].extend(row[i] for row in rows)
+    cursor.close()
+
+    row_count = len(columns[names[0]])
+    return {
+        'rows': row_count,
+        'columns': {
+            column: _encode_column(directory, f"{name}.{column}", schema[column], values)
+            for column, values in columns.items()
+        },
+    }
+
+
+def _prune(snapshot_dir: str, keep: int):
+    """古いスナップショットを削除（読み込み中のワーカーのmmapは削除後も有効）"""
+    current = _read_current(snapshot_dir)
+    names = sorted(
+        (d for d in os.listdir(snapshot_dir)
+         if not d.startswith('.') and os.path.isfile(os.path.join(snapshot_dir, d, 'manifest.json'))),
+        reverse=True
+    )
+    for name in names[keep:]:
+        if name != current:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+def export_snapshot(conn, snapshot_dir: str, keep: int = 2, activate_at: Optional[float] = None) -> str:
+    """スナップショットを書き出して CURRENT を切り替え、スナップショットのパスを返す
+
+    activate_at（UNIX 時間）を指定すると、CURRENT を監視しているワーカーはその時刻に一斉に切り替える
+    """
+    ensure_data_versions(conn)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    created_at = datetime.now()
+    snapshot_name = created_at.strftime('%Y%m%d%H%M%S%f')
+    work_dir = os.path.join(snapshot_dir, f".{snapshot_name}.tmp")
+    os.makedirs(work_dir)
+
+    try:
+        # バージョンとデータを同じトランザクションスナップショットから読む
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        try:
+            versions = get_data_versions(conn)
+            datasets = {name: _export_dataset(conn, work_dir, name) for name in DATASETS}
+            conn.commit()
+        finally:
+            conn.rollback()
+            conn.set_session(isolation_level='DEFAULT', readonly=False)
+
+        manifest = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'created_at': created_at.isoformat(),
+            'data_versions': {table: versions.get(table) for table in VERSIONED_TABLES},
+            'datasets': datasets,
+        }
+        with open(os.path.join(work_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        path = os.path.join(snapshot_dir, snapshot_name)
+        os.rename(work_dir, path)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    # CURRENT の書き換えはアトミックに行う
+    tmp_current = os.path.join(snapshot_dir, f".{CURRENT_FILE}.tmp")
+    with open(tmp_current, 'w') as f:
+        f.write(snapshot_name)
+        if activate_at:
+            f.write(f"\n{activate_at:.3f}")
+    os.replace(tmp_current, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    _prune(snapshot_dir, keep)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# 読み込み
+# ---------------------------------------------------------------------------
+
+def _load(directory: str, file_name: str) -> np.ndarray:
+    return np.load(os.path.join(directory, file_name), mmap_mode='r', allow_pickle=False)
+
+
+class SnapshotColumn:
+    """メモリマップされた1カラム。get(i) でPythonの値を返す"""
+
+    def __init__(self, directory: str, spec: Dict):
+        self.kind = spec['kind']
+        self.encoding = spec.get('encoding')
+        self.nulls = _load(directory, spec['nulls']) if spec.get('nulls') else None
+        if self.encoding == 'category':
+            self.categories = spec['categories']
+            self.codes = _load(directory, spec['codes'])
+        elif self.encoding == 'utf8':
+            self.data = _load(directory, spec['data'])
+            self.offsets = _load(directory, spec['offsets'])
+        else:
+            self.values = _load(directory, spec['values'])
+
+    def get(self, i: int):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        if self.encoding == 'category':
+            code = self.codes[i]
+            return self.categories[code] if code >= 0 else None
+        if self.encoding == 'utf8':
+            return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+        value = self.values[i]
+        if self.kind == 'float':
+            return None if np.isnan(value) else float(value)
+        if self.kind == 'int':
+            return int(value)
+        if self.kind == 'bool':
+            return None if value < 0 else bool(value)
+        # date / datetime（NaT は None になる）
+        return value.item()
+
+    def equals(self, value) -> np.ndarray:
+        """値が一致する行のマスク"""
+        if self.encoding == 'category':
+            if value not in self.categories:
+                return np.zeros(len(self.codes), dtype=bool)
+            return np.asarray(self.codes) == self.categories.index(value)
+        return np.array([self.get(i) == value for i in range(len(self))], dtype=bool)
+
+    def __len__(self):
+        if self.encoding == 'category':
+            return len(self.codes)
+        if self.encoding == 'utf8':
+            return len(self.offsets) - 1
+        return len(self.values)
+
+
+class SnapshotTable:
+    def __init__(self, directory: str, name: str, spec: Dict):
+        self.name = name
+        self.rows = spec['rows']
+        self.columns = {column: SnapshotColumn(directory, column_spec)
+                        for column, column_spec in spec['columns'].items()}
+
+    def row(self, i: int, rename: Optional[Dict[str, str]] = None) -> Dict:
+        rename = rename or {}
+        return {rename.get(column, column): col.get(i) for column, col in self.columns.items()}
+
+
+class SnapshotRecords(Sequence):
+    """スナップショットの行を辞書として返す読み取り専用のシーケンス
+
+    DBから読み込んだ場合の行のリストと同じように扱えるが、行の辞書はアクセス時に作成する
+    """
+
+    def __init__(self, table: SnapshotTable, indices=None, rename: Optional[Dict[str, str]] = None):
+        self.table = table
+        self.indices = range(table.rows) if indices is None else indices
+        self.rename = rename
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SnapshotRecords(self.table, self.indices[i], self.rename)
+        return self.table.row(int(self.indices[i]), self.rename)
+
+    def __iter__(self):
+        for i in self.indices:
+            yield self.table.row(int(i), self.rename)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {self.manifest.get('format_version')}")
+        self.data_versions = self.manifest['data_versions']
+        self.tables = {name: SnapshotTable(path, name, spec)
+                       for name, spec in self.manifest['datasets'].items()}
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def size_bytes(self) -> int:
+        """スナップショットのファイルの合計サイズ"""
+        return sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file())
+
+    def is_current(self, db_versions: Dict[str, int]) -> bool:
+        """DBの data_versions と一致するか"""
+        return all(
+            self.data_versions.get(table) is not None
+            and self.data_versions.get(table) == db_versions.get(table)
+            for table in VERSIONED_TABLES
+        )
+
+    def award_records(self):
+        """(市場全体の落札データ, 自社の落札実績) を DataLoader と同じカラム名で返す"""
+        awards = self.tables['awards']
+        is_company = awards.columns['contractor'].equals(COMPANY_CONTRACTOR)
+        market = SnapshotRecords(awards, np.flatnonzero(~is_company),
+                                 rename={'evaluation_score': 'technical_score'})
+        company = SnapshotRecords(awards, np.flatnonzero(is_company))
+        return market, company
+
+    def tender_records(self, today=None):
+        """入札日が today 以降の案件（入札日順）"""
+        tenders = self.tables['tenders']
+        bid_dates = tenders.columns['bid_date'].values
+        today = np.datetime64(today or datetime.now().date(), 'D')
+        start = int(np.searchsorted(bid_dates, today, side='left'))
+        return SnapshotRecords(tenders, range(start, tenders.rows))
+
+
+def read_current(snapshot_dir: str) -> Optional[Tuple[str, float]]:
+    """CURRENT の (スナップショット名, 切り替え時刻)。切り替え時刻の指定がなければ 0"""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            lines = f.read().split()
+    except FileNotFoundError:
+        return None
+    if not lines:
+        return None
+    return lines[0], float(lines[1]) if len(lines) > 1 else 0.0
+
+
+def _read_current(snapshot_dir: str) -> Optional[str]:
+    current = read_current(snapshot_dir)
+    return current[0] if current else None
+
+
+def open_current_snapshot(snapshot_dir: str) -> Optional[Snapshot]:
+    """CURRENT が指すスナップショットを開く（存在しなければ None）"""
+    name = _read_current(snapshot_dir)
+    if not name:
+        return None
+    return Snapshot(os.path.join(snapshot_dir, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DataLoader用のスナップショットを書き出す")
+    parser.add_argument('--output', default=os.getenv('DATA_SNAPSHOT_DIR'),
+                        help="出力ディレクトリ（既定は環境変数 DATA_SNAPSHOT_DIR）")
+    parser.add_argument('--keep', type=int, default=2, help="残すスナップショットの数")
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), help="既定は環境変数 DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.output:
+        parser.error("--output or DATA_SNAPSHOT_DIR is required")
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    start_time = time.time()
+    conn = psycopg2.connect(args.database_url)
+    try:
+        path = export_snapshot(conn, args.output, keep=args.keep)
+    finally:
+        conn.close()
+
+    snapshot = Snapshot(path)
+    print(f"✅ Snapshot written to {path} in {time.time() - start_time:.1f} seconds")
+    for name, table in snapshot.tables.items():
+        print(f"  {name}: {table.rows:,} rows")
+    print(f"  data_versions: {snapshot.data_versions}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 -- 初期化SQL: ユーザー管理と会社別データ
 -- Ver. 1.0 - マルチテナント対応
+-- ※ スキーマは backend/migrations で管理する（APIの起動時・seed_data.py で migrate.py が適用）。
+--   このファイルはDBコンテナの初回起動時のデモデータ投入のために残している
 
 -- 1. 建設会社マスタテーブル
 CREATE TABLE IF NOT EXISTS companies (
@@ -43,7 +45,7 @@ CREATE TABLE IF NOT EXISTS csv_upload_history (
     company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
     file_name VARCHAR(255),
     record_count INTEGER,
-    upload_status VARCHAR(50), -- 'processing', 'completed', 'failed'
+    upload_status VARCHAR(50), -- 'queued', 'processing', 'completed', 'failed'
     error_message TEXT,
     uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     completed_at TIMESTAMP
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+tenders_open の月別パーティション管理
+
+tenders_open は bid_date による月単位のレンジパーティション（tenders_open_pYYYYMM）で、
+主キーは (tender_id, bid_date)。範囲外の bid_date は既定パーティション（tenders_open_default）に入る。
+bid_date で絞り込む検索ではパーティションプルーニングにより対象月のパーティションだけが読まれる。
+
+メンテナンス（run_maintenance）で以下を行う
+- 既存の通常テーブルをパーティションテーブルに変換（初回のみ）
+- 当月から FUTURE_MONTHS か月先までのパーティションを作成
+- 既定パーティションに入った行を月別パーティションに移動
+- 入札日が当月より前のパーティションを DETACH し、履歴テーブル tenders_archive に ATTACH
+  （行のコピーは発生しない）
+
+使い方:
+    python tender_partitions.py              # メンテナンスを実行
+    python tender_partitions.py --status     # パーティションごとの件数を表示
+"""
+import argparse
+import os
+import re
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+import psycopg2
+
+from data_version import bump_data_version, ensure_data_versions
+from dimensions import ensure_code_triggers
+
+TABLE = 'tenders_open'
+ARCHIVE_TABLE = 'tenders_archive'
+PARTITION_KEY = 'bid_date'
+
+# 当月から何か月先までパーティションを事前に作成するか
+FUTURE_MONTHS = int(os.getenv('TENDER_PARTITION_FUTURE_MONTHS', '12'))
+
+_PARTITION_NAME = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def archive_cutoff(today: Optional[date] = None) -> date:
+    """これより前の入札日の案件はアーカイブ対象（当月の1日）"""
+    return month_start(today or date.today())
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _fetch_value(cursor):
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return list(row.values())[0] if isinstance(row, dict) else row[0]
+
+
+def _relkind(cursor, table: str) -> Optional[str]:
+    cursor.execute("""
+        SELECT c.relkind FROM pg_class c
+        WHERE c.oid = to_regclass(%s)
+    """, (table,))
+    return _fetch_value(cursor)
+
+
+def is_partitioned(cursor, table: str = TABLE) -> bool:
+    return _relkind(cursor, table) == 'p'
+
+
+def list_partitions(cursor, table: str) -> Dict[date, str]:
+    """月別パーティション {月初日: パーティション名}（既定パーティションは含まない）"""
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (table,))
+    partitions = {}
+    for row in cursor.fetchall():
+        name = row['relname'] if isinstance(row, dict) else row[0]
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _create_month_partition(cursor, table: str, month: date):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {partition_name(table, month)}
+        PARTITION OF {table}
+        FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')
+    """)
+
+
+def _move_default_rows(cursor, table: str, month: date) -> int:
+    """既定パーティションにある対象月の行を、新しい月別パーティションに移して ATTACH する"""
+    default = f"{table}_default"
+    name = partition_name(table, month)
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {default}
+            WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (lower, upper))
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+                   f"CHECK ({PARTITION_KEY} >= '{lower}' AND {PARTITION_KEY} < '{upper}')")
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    # ATTACH 時の検証を省くための制約なので、取り付け後は不要
+    cursor.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds")
+    return moved
+
+
+def ensure_partitions(conn, table: str, months: List[date]) -> int:
+    """指定した月のパーティションを作成（既定パーティションに該当行があれば移動）し、移動した行数を返す"""
+    cursor = conn.cursor()
+    existing = list_partitions(cursor, table)
+    moved = 0
+    for month in sorted(set(months)):
+        if month in existing:
+            continue
+        cursor.execute(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM {table}_default
+                WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s
+            )
+        """, (month, add_months(month, 1)))
+        if _fetch_value(cursor):
+            moved += _move_default_rows(cursor, table, month)
+        else:
+            _create_month_partition(cursor, table, month)
+    conn.commit()
+    cursor.close()
+    return moved
+
+
+def ensure_partition_window(conn, today: Optional[date] = None) -> int:
+    """当月から FUTURE_MONTHS か月先までのパーティションを用意"""
+    current = archive_cutoff(today)
+    return ensure_partitions(conn, TABLE, [add_months(current, i) for i in range(FUTURE_MONTHS + 1)])
+
+
+def _create_partitioned_parent(cursor, name: str, like: str):
+    cursor.execute(f"""
+        CREATE TABLE {name} (LIKE {like} INCLUDING DEFAULTS)
+        PARTITION BY RANGE ({PARTITION_KEY})
+    """)
+    cursor.execute(f"ALTER TABLE {name} ADD PRIMARY KEY (tender_id, {PARTITION_KEY})")
+
+
+def ensure_partitioned_tenders(conn) -> bool:
+    """tenders_open が通常テーブルならパーティションテーブルに変換する（変換した場合 True）
+
+    bid_date が NULL の行は主キーに含められないため移行されない
+    """
+    cursor = conn.cursor()
+    kind = _relkind(cursor, TABLE)
+    if kind is None or kind == 'p':
+        cursor.close()
+        return False
+
+    start_time = time.time()
+    cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+
+    # 主キー以外のインデックス定義を控えておき、変換後の親テーブルに作り直す
+    cursor.execute("""
+        SELECT i.indexdef FROM pg_indexes i
+        WHERE i.schemaname = current_schema() AND i.tablename = %s
+        AND i.indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)
+    """, (TABLE, TABLE))
+    index_definitions = [row['indexdef'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+    staging = f"{TABLE}_partitioned"
+    _create_partitioned_parent(cursor, staging, TABLE)
+    cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {staging} DEFAULT")
+
+    cursor.execute(f"""
+        SELECT DISTINCT date_trunc('month', {PARTITION_KEY})::date AS month
+        FROM {TABLE} WHERE {PARTITION_KEY} IS NOT NULL
+    """)
+    months = {row['month'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()}
+    current = archive_cutoff()
+    months.update(add_months(current, i) for i in range(FUTURE_MONTHS + 1))
+    for month in sorted(months):
+        cursor.execute(f"""
+            CREATE TABLE {partition_name(TABLE, month)} PARTITION OF {staging}
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')
+        """)
+
+    cursor.execute(f"INSERT INTO {staging} SELECT * FROM {TABLE} WHERE {PARTITION_KEY} IS NOT NULL")
+    migrated = cursor.rowcount
+    cursor.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE {PARTITION_KEY} IS NULL")
+    dropped = _fetch_value(cursor)
+
+    cursor.execute(f"DROP TABLE {TABLE}")
+    cursor.execute(f"ALTER TABLE {staging} RENAME TO {TABLE}")
+    cursor.execute(f"ALTER INDEX {staging}_pkey RENAME TO {TABLE}_pkey")
+    for definition in index_definitions:
+        cursor.execute(definition)
+    conn.commit()
+    cursor.close()
+
+    # 変更検知・コードを埋めるトリガーは旧テーブルとともに削除されたため作り直す
+    ensure_data_versions(conn)
+    ensure_code_triggers(conn, TABLE)
+    bump_data_version(conn, TABLE)
+
+    print(f"🗂️ {TABLE} converted to monthly partitions: {migrated:,} rows in {len(months)} partitions "
+          f"({time.time() - start_time:.1f} seconds)")
+    if dropped:
+        print(f"⚠️ {dropped:,} rows without {PARTITION_KEY} were not migrated")
+    return True
+
+
+def ensure_archive_table(conn):
+    """履歴テーブル tenders_archive を用意し、tenders_open に追加されたカラムを反映"""
+    cursor = conn.cursor()
+    if _relkind(cursor, ARCHIVE_TABLE) is None:
+        _create_partitioned_parent(cursor, ARCHIVE_TABLE, TABLE)
+    else:
+        # ATTACH にはカラム構成の一致が必要
+        cursor.execute("""
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod) AS column_type
+            FROM pg_attribute a
+            WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped
+            AND a.attname NOT IN (
+                SELECT attname FROM pg_attribute
+                WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+            )
+            ORDER BY a.attnum
+        """, (TABLE, ARCHIVE_TABLE))
+        for row in cursor.fetchall():
+            column, column_type = (row['attname'], row['column_type']) if isinstance(row, dict) else row
+            cursor.execute(f"ALTER TABLE {ARCHIVE_TABLE} ADD COLUMN {column} {column_type}")
+    conn.commit()
+    cursor.close()
+
+
+def archive_expired_partitions(conn, cutoff: Optional[date] = None) -> Dict:
+    """入札日が cutoff より前のパーティションを tenders_archive に移す"""
+    cutoff = cutoff or archive_cutoff()
+    ensure_archive_table(conn)
+    cursor = conn.cursor()
+    stats = {'partitions': 0, 'rows': 0, 'default_rows': 0}
+
+    archived = list_partitions(cursor, ARCHIVE_TABLE)
+    for month, name in sorted(list_partitions(cursor, TABLE).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        cursor.execute(f"SELECT COUNT(*) FROM {name}")
+        rows = _fetch_value(cursor)
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+        if month in archived:
+            # 同じ月の履歴パーティションが既にある場合は行を移す
+            cursor.execute(f"INSERT INTO {archived[month]} SELECT * FROM {name} ON CONFLICT DO NOTHING")
+            cursor.execute(f"DROP TABLE {name}")
+        else:
+            archive_name = partition_name(ARCHIVE_TABLE, month)
+            cursor.execute(f"ALTER TABLE {name} RENAME TO {archive_name}")
+            cursor.execute(f"""
+                ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {archive_name}
+                FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')
+            """)
+            archived[month] = archive_name
+        conn.commit()
+        stats['partitions'] += 1
+        stats['rows'] += rows
+        print(f"  📦 {name}: {rows:,} rows archived")
+
+    # 既定パーティションに残っている過去の案件も移す
+    cursor.execute(f"""
+        SELECT DISTINCT date_trunc('month', {PARTITION_KEY})::date AS month
+        FROM {TABLE}_default WHERE {PARTITION_KEY} < %s
+    """, (cutoff,))
+    for row in cursor.fetchall():
+        month = row['month'] if isinstance(row, dict) else row[0]
+        if month not in archived:
+            _create_month_partition(cursor, ARCHIVE_TABLE, month)
+            archived[month] = partition_name(ARCHIVE_TABLE, month)
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {TABLE}_default WHERE {PARTITION_KEY} < %s RETURNING *
+        )
+        INSERT INTO {ARCHIVE_TABLE} SELECT * FROM moved ON CONFLICT DO NOTHING
+    """, (cutoff,))
+    stats['default_rows'] = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    return stats
+
+
+def run_maintenance(conn, today: Optional[date] = None) -> Dict:
+    """変換・パーティション作成・アーカイブをまとめて実行"""
+    start_time = time.time()
+    converted = ensure_partitioned_tenders(conn)
+    if _relkind(conn.cursor(), TABLE) is None:
+        print(f"⚠️ {TABLE} does not exist, partition maintenance skipped")
+        return {}
+
+    moved = ensure_partition_window(conn, today)
+    archived = archive_expired_partitions(conn, archive_cutoff(today))
+
+    # 既定パーティションに残った当月以降の行を月別パーティションへ
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT DISTINCT date_trunc('month', {PARTITION_KEY})::date AS month FROM {TABLE}_default
+    """)
+    months = [row['month'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+    cursor.close()
+    moved += ensure_partitions(conn, TABLE, months)
+
+    # DETACH やパーティションへの直接の DELETE では親テーブルのトリガーが発火しないため、
+    # アーカイブした場合はバージョンを明示的に進める
+    if archived['partitions'] or archived['default_rows']:
+        bump_data_version(conn, TABLE)
+
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"ANALYZE {TABLE}")
+    cursor.close()
+    conn.autocommit = False
+
+    stats = {
+        'converted': converted,
+        'moved_from_default': moved,
+        'archived_partitions': archived['partitions'],
+        'archived_rows': archived['rows'] + archived['default_rows'],
+        'elapsed_seconds': time.time() - start_time,
+    }
+    print(f"🗂️ Partition maintenance: {stats['archived_partitions']} partitions / "
+          f"{stats['archived_rows']:,} rows archived, {moved:,} rows moved from default "
+          f"({stats['elapsed_seconds']:.1f} seconds)")
+    return stats
+
+
+def print_status(conn):
+    cursor = conn.cursor()
+    for table in (TABLE, ARCHIVE_TABLE):
+        if not is_partitioned(cursor, table):
+            print(f"{table}: not partitioned")
+            continue
+        cursor.execute("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound, c.reltuples::bigint AS rows
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+        """, (table,))
+        print(f"{table}:")
+        for row in cursor.fetchall():
+            name, bound, rows = (row['relname'], row['bound'], row['rows']) if isinstance(row, dict) else row
+            print(f"  {name:<32}{max(rows, 0):>12,}  {bound}")
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tenders_open の月別パーティションのメンテナンス")
+    parser.add_argument('--status', action='store_true', help="パーティションごとの件数（推定値）を表示")
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), help="既定は環境変数 DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    conn = psycopg2.connect(args.database_url)
+    try:
+        if args.status:
+            print_status(conn)
+        else:
+            run_maintenance(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+大規模な案件データファイルの逐次読み込み
+
+JSON配列（[{...}, {...}, ...]）と NDJSON（1行1レコード）のどちらにも対応し、
+ファイル全体をメモリに載せずにレコードを1件ずつ返す。
+バッチ化したレコードを別スレッドで先読みすることで、
+パースとDB書き込みを並行させつつメモリ使用量を一定に保つ。
+"""
+import itertools
+import json
+import queue
+import threading
+from typing import Dict, Iterable, Iterator, List
+
+CHUNK_SIZE = 1 << 20  # 1MB
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PREFETCH = 4
+
+_decoder = json.JSONDecoder()
+
+
+def _iter_json_array(f, head: str) -> Iterator[Dict]:
+    """JSON配列の要素を1件ずつデコード"""
+    buf = head
+    pos = buf.index('[') + 1
+    eof = False
+
+    while True:
+        # 区切りの空白とカンマを読み飛ばす
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("JSON array is not terminated")
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+
+        if buf[pos] == ']':
+            return
+
+        try:
+            record, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            record, end = None, None
+
+        # 要素がバッファの末尾で切れている可能性がある場合は追加で読み込む
+        if end is None or (end >= len(buf) and not eof):
+            if eof:
+                raise ValueError(f"Invalid JSON near offset {pos}")
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+
+        yield record
+        pos = end
+
+
+def _iter_ndjson(f, head: str) -> Iterator[Dict]:
+    """NDJSONを1行ずつデコード"""
+    lines = head.split('\n')
+    # 先読みした末尾の行は途中で切れているため、残りを読み足す
+    tail = lines.pop() + f.readline()
+    for line in itertools.chain(lines, [tail], f):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_tender_records(path: str) -> Iterator[Dict]:
+    """案件データファイル（JSON配列またはNDJSON）からレコードを1件ずつ返す"""
+    with open(path, 'r', encoding='utf-8') as f:
+        # 先頭の空白以外の文字で形式を判定（改行のない配列でも全体を読み込まない）
+        head = f.read(CHUNK_SIZE)
+        while head and not head.strip():
+            head = f.read(CHUNK_SIZE)
+        if not head:
+            return
+
+        if head.lstrip().startswith('['):
+            yield from _iter_json_array(f, head)
+        else:
+            yield from _iter_ndjson(f, head)
+
+
+def iter_batches(records: Iterable, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List]:
+    """レコードを batch_size 件ずつのリストにまとめる"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def prefetch(iterable: Iterable, max_pending: int = DEFAULT_PREFETCH) -> Iterator:
+    """別スレッドでイテレータを先読みする（最大 max_pending 件をキューに保持）
+
+    パース側のスレッドが次のバッチを準備している間に、
+    呼び出し側でDBへの書き込みを進められる
+    """
+    q = queue.Queue(maxsize=max_pending)
+    done = object()
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                q.put(item)
+            q.put(done)
+        except BaseException as e:  # 例外は呼び出し側のスレッドで再送出
+            q.put(e)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # 途中で中断された場合はプロデューサーを止める
+        stop.set()
+        while thread.is_alive():
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.1)
+
+
+def stream_tender_batches(path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                          max_pending: int = DEFAULT_PREFETCH) -> Iterator[List[Dict]]:
+    """案件データファイルをバッチ単位で先読みしながら返す"""
+    return prefetch(iter_batches(iter_tender_records(path), batch_size), max_pending)
@@ -0,0 +1,134 @@
+"""
+tenders_open の差分同期
+
+案件ごとに内容のハッシュ（content_hash）を保持し、
+- 新規・内容が変わった案件だけを COPY でステージングして UPSERT
+- 内容が変わっていない案件は last_seen_at のみを一括更新
+- 新規・変更は tender_change_log に記録（下流のキャッシュは id 順に読み進めて差分を反映する）
+を行う。日次の再投入でも書き換えるのは実際に変わった行だけになる
+
+tenders_open は bid_date で月別にパーティション分割されているため（tender_partitions）、
+bid_date が変わった案件は旧パーティションの行を削除してから投入する。
+入札日がアーカイブ済みの月（当月より前）の案件は投入しない。
+content_hash カラムと tender_change_log は migrations/0001_baseline.sql で作成する（migrate.apply_migrations）
+"""
+import hashlib
+from typing import Dict, Iterable, Tuple
+
+from bulk_loader import TENDER_COLUMNS, copy_rows, delete_moved_rows
+from dimensions import encode_stage
+from tender_partitions import archive_cutoff
+
+# ハッシュ・変更検出の対象カラム（tender_id と取得日時は除く）
+CONTENT_COLUMNS = [c for c in TENDER_COLUMNS if c not in ('tender_id', 'last_seen_at')]
+_CONTENT_INDEXES = [TENDER_COLUMNS.index(c) for c in CONTENT_COLUMNS]
+_BID_DATE_INDEX = TENDER_COLUMNS.index('bid_date')
+
+
+def tender_content_hash(row: Tuple) -> str:
+    """TENDER_COLUMNS 順の行から内容のハッシュを計算"""
+    parts = []
+    for i in _CONTENT_INDEXES:
+        value = row[i]
+        parts.append('\\N' if value is None else str(value))
+    return hashlib.md5('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _changed_columns_sql():
+    """ステージ(s)と既存行(t)で値が異なるカラム名の配列を返すSQL式"""
+    cases = ', '.join(
+        f"CASE WHEN s.{c} IS DISTINCT FROM t.{c} THEN '{c}' END" for c in CONTENT_COLUMNS
+    )
+    return f"array_remove(ARRAY[{cases}]::TEXT[], NULL)"
+
+
+def sync_tender_rows(cursor, rows: Iterable[Tuple]) -> Dict:
+    """案件行（TENDER_COLUMNS 順）を差分同期する
+
+    呼び出し側のトランザクション内で実行される
+
+    Returns:
+        staged（COPYした件数）, inserted, updated, unchanged, archived（入札日が過去のため投入しなかった件数）
+    """
+    # 同じ tender_id は後のレコードを優先（bid_date のない行はパーティションに入らないため除く）
+    latest = {}
+    for row in rows:
+        if row[0] is not None and row[_BID_DATE_INDEX] is not None:
+            latest[row[0]] = row
+    stats = {'staged': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'archived': 0}
+
+    # bid_date は date または ISO 形式の文字列
+    cutoff = archive_cutoff().isoformat()
+    for tender_id in [t for t, row in latest.items() if str(row[_BID_DATE_INDEX]) < cutoff]:
+        del latest[tender_id]
+        stats['archived'] += 1
+    if not latest:
+        return stats
+
+    cursor.execute(
+        "SELECT tender_id, content_hash FROM tenders_open WHERE tender_id = ANY(%s)",
+        (list(latest),)
+    )
+    existing = {}
+    for row in cursor.fetchall():
+        tender_id, content_hash = (row['tender_id'], row['content_hash']) if isinstance(row, dict) else row
+        existing[tender_id] = content_hash
+
+    changed = []
+    unchanged_ids = []
+    for tender_id, row in latest.items():
+        content_hash = tender_content_hash(row)
+        if existing.get(tender_id) == content_hash:
+            unchanged_ids.append(tender_id)
+        else:
+            changed.append(row + (content_hash,))
+
+    if changed:
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS tenders_sync_stage
+            (LIKE tenders_open INCLUDING DEFAULTS)
+            ON COMMIT DELETE ROWS
+        """)
+        cursor.execute("TRUNCATE tenders_sync_stage")
+        stats['staged'] = copy_rows(cursor, 'tenders_sync_stage', TENDER_COLUMNS + ['content_hash'], changed)
+
+        # 変更ログ（ハッシュ未設定の既存行で値が同じものは記録しない）
+        cursor.execute(f"""
+            INSERT INTO tender_change_log (tender_id, change_type, changed_columns, old_hash, new_hash)
+            SELECT tender_id, change_type, changed_columns, old_hash, new_hash
+            FROM (
+                SELECT s.tender_id,
+                       CASE WHEN t.tender_id IS NULL THEN 'insert' ELSE 'update' END AS change_type,
+                       CASE WHEN t.tender_id IS NULL THEN NULL ELSE {_changed_columns_sql()} END AS changed_columns,
+                       t.content_hash AS old_hash,
+                       s.content_hash AS new_hash
+                FROM tenders_sync_stage s
+                LEFT JOIN tenders_open t ON t.tender_id = s.tender_id
+            ) diff
+            WHERE change_type = 'insert' OR cardinality(changed_columns) > 0
+        """)
+
+        # bid_date が変わった案件は別パーティションに移るため、旧行を削除しておく
+        delete_moved_rows(cursor, 'tenders_open', 'tenders_sync_stage', 'tender_id', 'bid_date')
+
+        columns = TENDER_COLUMNS + ['content_hash'] + encode_stage(cursor, 'tenders_open', 'tenders_sync_stage')
+        select_list = ', '.join('CURRENT_TIMESTAMP' if c == 'last_seen_at' else c for c in columns)
+        update_list = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c not in ('tender_id', 'bid_date'))
+        cursor.execute(f"""
+            INSERT INTO tenders_open ({', '.join(columns)})
+            SELECT {select_list} FROM tenders_sync_stage
+            ORDER BY tender_id
+            ON CONFLICT (tender_id, bid_date) DO UPDATE
+            SET {update_list}, updated_at = CURRENT_TIMESTAMP
+        """)
+        stats['updated'] = sum(1 for row in changed if row[0] in existing)
+        stats['inserted'] = len(changed) - stats['updated']
+
+    if unchanged_ids:
+        cursor.execute(
+            "UPDATE tenders_open SET last_seen_at = CURRENT_TIMESTAMP WHERE tender_id = ANY(%s)",
+            (unchanged_ids,)
+        )
+        stats['unchanged'] = len(unchanged_ids)
+
+    return stats
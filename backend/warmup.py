@@ -0,0 +1,76 @@
+"""
+起動後のバックグラウンドのウォームアップ
+
+main.py の import 時には重い処理（全データの読み込み、openai・pandas の import など）を行わず、
+起動後に別スレッドで登録順に実行する。必須のステップは成功するまで WARMUP_RETRY_INTERVAL 秒ごとに再試行する。
+/health/ready はすべての必須ステップが完了するまで 503 を返す（/health/live は常に 200）
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+RETRY_INTERVAL = float(os.getenv('WARMUP_RETRY_INTERVAL', '10'))
+
+
+class WarmUp:
+    def __init__(self, retry_interval: float = RETRY_INTERVAL):
+        self.retry_interval = retry_interval
+        self.created_at = time.time()
+        self.ready_at = None
+        self._steps: List[Tuple[str, Callable, bool]] = []
+        self._status: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def step(self, name: str, required: bool = True):
+        """ウォームアップのステップを登録するデコレータ（required=False は失敗しても再試行しない）"""
+        def decorator(func):
+            self._steps.append((name, func, required))
+            self._status[name] = {'state': 'pending', 'required': required}
+            return func
+        return decorator
+
+    def _set(self, name: str, **fields):
+        with self._lock:
+            self._status[name].update(fields)
+
+    def _run(self):
+        for name, func, required in self._steps:
+            attempts = 0
+            while True:
+                attempts += 1
+                self._set(name, state='running', attempts=attempts)
+                start = time.perf_counter()
+                try:
+                    func()
+                except Exception as e:
+                    self._set(name, state='failed', error=str(e), seconds=round(time.perf_counter() - start, 3))
+                    print(f"⚠️ Warm-up step {name} failed: {e}")
+                    if not required:
+                        break
+                    time.sleep(self.retry_interval)
+                    continue
+                self._set(name, state='done', error=None, seconds=round(time.perf_counter() - start, 3))
+                break
+        self.ready_at = time.time()
+        print(f"✅ Warm-up finished {self.ready_at - self.created_at:.1f}s after import")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='warm-up', daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def status(self) -> Dict:
+        with self._lock:
+            steps = {name: dict(status) for name, status in self._status.items()}
+        return {
+            'status': 'ready' if self.ready else 'warming_up',
+            'uptime_seconds': round(time.time() - self.created_at, 3),
+            'ready_after_seconds': round(self.ready_at - self.created_at, 3) if self.ready else None,
+            'steps': steps,
+        }
@@ -45,8 +45,18 @@ function CSVUpload() {
     fetchUploadHistory();
   }, []);
 
-  const fetchUploadHistory = async () => {
-    setLoading(true);
+  // 取り込み待ち・処理中のアップロードがある間は履歴を定期的に更新
+  useEffect(() => {
+    const hasPending = uploadHistory.some(
+      (h) => h.upload_status === 'queued' || h.upload_status === 'processing'
+    );
+    if (!hasPending) return undefined;
+    const timer = setTimeout(() => fetchUploadHistory(true), 2000);
+    return () => clearTimeout(timer);
+  }, [uploadHistory]);
+
+  const fetchUploadHistory = async (silent = false) => {
+    if (!silent) setLoading(true);
     try {
       const token = localStorage.getItem('token');
       const apiUrl = window.location.hostname.includes('azurewebsites.net') 
@@ -108,7 +118,7 @@ function CSVUpload() {
 
       if (response.ok) {
         const data = await response.json();
-        setSuccess(`${data.record_count}件のデータを正常にアップロードしました`);
+        setSuccess(data.message);
         setSelectedFile(null);
         // ファイル入力をリセット
         document.getElementById('file-input').value = '';
@@ -166,6 +176,8 @@ function CSVUpload() {
     switch (status) {
       case 'completed':
         return <Chip label="完了" sx={{ backgroundColor: '#1e3a5f', color: '#ffffff' }} size="small" icon={<CheckCircleIcon sx={{ color: '#ffffff' }} />} />;
+      case 'queued':
+        return <Chip label="待機中" size="small" icon={<HourglassEmptyIcon />} />;
       case 'processing':
         return <Chip label="処理中" color="warning" size="small" icon={<HourglassEmptyIcon />} />;
       case 'failed':
@@ -404,7 +416,14 @@ function CSVUpload() {
                       </Box>
                     </TableCell>
                     <TableCell align="center">
-                      {history.record_count || '-'}
+                      {history.upload_status === 'queued' || history.upload_status === 'processing'
+                        ? `${history.processed_count || 0}行 読込中`
+                        : (history.record_count || '-')}
+                      {history.error_count > 0 && (
+                        <Typography variant="caption" color="error" display="block" title={history.error_message || ''}>
+                          エラー {history.error_count}行
+                        </Typography>
+                      )}
                     </TableCell>
                     <TableCell align="center">
                       {getStatusChip(history.upload_status)}
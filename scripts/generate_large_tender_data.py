@@ -1,12 +1,35 @@
 #!/usr/bin/env python3
+"""
+Generate synthetic tender data for load tests
+
+Work is split into fixed-size partitions, each generated by a worker process
+with its own random.Random seeded from (--seed, partition number). The output
+therefore depends only on --records / --seed / --partition-size and the date
+range, not on the number of workers. Partitions are streamed to part files and
+never held in memory as a whole.
+
+Usage:
+    python scripts/generate_large_tender_data.py --records 1000000 --output data/raw/tenders_1m.ndjson
+    python scripts/generate_large_tender_data.py --records 10000000 --workers 8 \
+        --start-date 2024-04-01 --end-date 2025-03-31 --output data/raw/tenders_10m.ndjson
+    python scripts/generate_large_tender_data.py --records 1000000 --format parquet --output data/raw/tenders_1m
+"""
+import argparse
+import hashlib
 import json
+import os
 import random
-from datetime import datetime, timedelta
-import hashlib
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from multiprocessing import Pool
 
-# Constants
-TOTAL_RECORDS = 224560
-OUTPUT_FILE = '/Users/anemoto/bid_kacho/data/raw/mock_tender_data_224560.json'
+# Defaults
+DEFAULT_RECORDS = 224560
+DEFAULT_PARTITION_SIZE = 100000
+DEFAULT_SEED = 42
 
 # Prefecture data
 PREFECTURES = {
@@ -77,47 +100,96 @@ PROJECT_NAME_PATTERNS = [
     '{}グラウンド改修工事'
 ]
 
-def generate_tender_id(index, date):
-    """Generate a unique tender ID"""
-    date_str = date.strftime('%Y%m%d')
-    hash_str = hashlib.md5(f"{index}{date_str}".encode()).hexdigest()[:6]
-    return f"KKJ-{date_str}-{hash_str.upper()}"
+# Location-specific names per use type
+LOCATION_NAMES = {
+    '学校': ['第一', '第二', '第三', '中央', '東', '西', '南', '北', '緑', '桜', '富士', '青葉', '若葉', '向陽', '朝日'],
+    '庁舎': ['本', '新', '第二', '北', '南', '東', '西', '中央'],
+    '文化施設': ['市民', '文化', '総合', '中央', '地域', 'コミュニティ'],
+    '体育施設': ['総合', '市民', '中央', '東', '西', '南', '北', 'スポーツ'],
+    '病院': ['総合', '中央', '市民', '地域医療', '救急医療'],
+    '公営住宅': ['市営', '県営', '公営', '緑ヶ丘', '桜ヶ丘', '青葉', '若葉', '中央'],
+    '福祉施設': ['総合', '地域', '高齢者', '障害者', '児童'],
+    '図書館': ['中央', '市立', '県立', '地域', '子ども'],
+    '公民館': ['中央', '地区', '市民', 'コミュニティ'],
+    '保育園': ['中央', '第一', '第二', 'ひまわり', 'さくら', 'つくし', 'わかば']
+}
+DEFAULT_LOCATION_NAMES = ['中央', '市民', '総合']
+
+PREFECTURE_NAMES = list(PREFECTURES.keys())
+
+# Base price per m2 (in JPY)
+BASE_PRICES = {
+    '学校': 280000,
+    '庁舎': 320000,
+    '文化施設': 350000,
+    '体育施設': 300000,
+    '病院': 450000,
+    '公営住宅': 220000,
+    '福祉施設': 260000,
+    '図書館': 310000,
+    '公民館': 250000,
+    '保育園': 240000,
+    '消防署': 340000,
+    '警察署': 360000,
+    '市民センター': 270000,
+    '研究施設': 380000,
+    '環境施設': 290000,
+    '観光施設': 330000,
+    '駐車場': 150000,
+    '公園施設': 180000,
+    '交通施設': 400000,
+    '下水道施設': 350000
+}
+
+# Floor area distribution: (min, max, weight)
+FLOOR_AREA_WEIGHTS = [
+    (500, 2000, 0.3),    # Small projects: 30%
+    (2000, 5000, 0.25),   # Medium-small: 25%
+    (5000, 10000, 0.20),  # Medium: 20%
+    (10000, 20000, 0.15), # Medium-large: 15%
+    (20000, 50000, 0.08), # Large: 8%
+    (50000, 100000, 0.02) # Very large: 2%
+]
+
+
+@lru_cache(maxsize=8192)
+def format_date(value, fmt='%Y-%m-%d'):
+    """strftime with a cache (only a few hundred distinct dates are generated)"""
+    return value.strftime(fmt)
+
+
+def generate_tender_id(index, bid_date):
+    """Generate a unique tender ID
 
-def generate_tender_title(prefecture, municipality, use_type):
+    The global record index is part of the ID so IDs stay unique at any size;
+    the short hash keeps the previous look of the IDs.
+    """
+    date_str = format_date(bid_date, '%Y%m%d')
+    hash_str = hashlib.md5(f"{index}{date_str}".encode()).hexdigest()[:4]
+    return f"KKJ-{date_str}-{hash_str.upper()}{index:08X}"
+
+
+def generate_tender_title(rng, municipality, use_type):
     """Generate a realistic tender title"""
-    # Location-specific names
-    location_names = {
-        '学校': ['第一', '第二', '第三', '中央', '東', '西', '南', '北', '緑', '桜', '富士', '青葉', '若葉', '向陽', '朝日'],
-        '庁舎': ['本', '新', '第二', '北', '南', '東', '西', '中央'],
-        '文化施設': ['市民', '文化', '総合', '中央', '地域', 'コミュニティ'],
-        '体育施設': ['総合', '市民', '中央', '東', '西', '南', '北', 'スポーツ'],
-        '病院': ['総合', '中央', '市民', '地域医療', '救急医療'],
-        '公営住宅': ['市営', '県営', '公営', '緑ヶ丘', '桜ヶ丘', '青葉', '若葉', '中央'],
-        '福祉施設': ['総合', '地域', '高齢者', '障害者', '児童'],
-        '図書館': ['中央', '市立', '県立', '地域', '子ども'],
-        '公民館': ['中央', '地区', '市民', 'コミュニティ'],
-        '保育園': ['中央', '第一', '第二', 'ひまわり', 'さくら', 'つくし', 'わかば']
-    }
-    
-    name_prefix = random.choice(location_names.get(use_type, ['中央', '市民', '総合']))
-    
+    name_prefix = rng.choice(LOCATION_NAMES.get(use_type, DEFAULT_LOCATION_NAMES))
+
     if use_type == '学校':
-        school_type = random.choice(['小学校', '中学校', '高等学校'])
+        school_type = rng.choice(['小学校', '中学校', '高等学校'])
         facility_name = f"{municipality}{name_prefix}{school_type}"
     elif use_type == '病院':
         facility_name = f"{municipality}{name_prefix}病院"
     elif use_type == '庁舎':
         facility_name = f"{municipality}{name_prefix}庁舎"
     elif use_type == '文化施設':
-        facility_type = random.choice(['文化会館', 'ホール', '文化センター', '市民会館'])
+        facility_type = rng.choice(['文化会館', 'ホール', '文化センター', '市民会館'])
         facility_name = f"{municipality}{name_prefix}{facility_type}"
     elif use_type == '体育施設':
-        facility_type = random.choice(['体育館', 'スポーツセンター', '運動公園', 'アリーナ'])
+        facility_type = rng.choice(['体育館', 'スポーツセンター', '運動公園', 'アリーナ'])
         facility_name = f"{municipality}{name_prefix}{facility_type}"
     elif use_type == '公営住宅':
         facility_name = f"{name_prefix}団地"
     elif use_type == '福祉施設':
-        facility_type = random.choice(['福祉センター', '福祉会館', 'ケアセンター'])
+        facility_type = rng.choice(['福祉センター', '福祉会館', 'ケアセンター'])
         facility_name = f"{municipality}{name_prefix}{facility_type}"
     elif use_type == '図書館':
         facility_name = f"{municipality}{name_prefix}図書館"
@@ -127,63 +199,31 @@ def generate_tender_title(prefecture, municipality, use_type):
         facility_name = f"{municipality}{name_prefix}保育園"
     else:
         facility_name = f"{municipality}{use_type}"
-    
-    project_pattern = random.choice(PROJECT_NAME_PATTERNS)
+
+    project_pattern = rng.choice(PROJECT_NAME_PATTERNS)
     return project_pattern.format(facility_name)
 
-def generate_floor_area():
+
+def generate_floor_area(rng):
     """Generate realistic floor area based on distribution"""
-    # Weighted distribution
-    weights = [
-        (500, 2000, 0.3),    # Small projects: 30%
-        (2000, 5000, 0.25),   # Medium-small: 25%
-        (5000, 10000, 0.20),  # Medium: 20%
-        (10000, 20000, 0.15), # Medium-large: 15%
-        (20000, 50000, 0.08), # Large: 8%
-        (50000, 100000, 0.02) # Very large: 2%
-    ]
-    
-    rand = random.random()
+    rand = rng.random()
     cumulative = 0
-    for min_area, max_area, weight in weights:
+    for min_area, max_area, weight in FLOOR_AREA_WEIGHTS:
         cumulative += weight
         if rand <= cumulative:
-            return round(random.uniform(min_area, max_area), 1)
-    
-    return round(random.uniform(500, 2000), 1)  # Default to small
+            return round(rng.uniform(min_area, max_area), 1)
+
+    return round(rng.uniform(500, 2000), 1)  # Default to small
 
-def generate_price(floor_area, use_type):
+
+def generate_price(rng, floor_area, use_type):
     """Generate estimated price based on floor area and use type"""
-    # Base price per m2 (in JPY)
-    base_prices = {
-        '学校': 280000,
-        '庁舎': 320000,
-        '文化施設': 350000,
-        '体育施設': 300000,
-        '病院': 450000,
-        '公営住宅': 220000,
-        '福祉施設': 260000,
-        '図書館': 310000,
-        '公民館': 250000,
-        '保育園': 240000,
-        '消防署': 340000,
-        '警察署': 360000,
-        '市民センター': 270000,
-        '研究施設': 380000,
-        '環境施設': 290000,
-        '観光施設': 330000,
-        '駐車場': 150000,
-        '公園施設': 180000,
-        '交通施設': 400000,
-        '下水道施設': 350000
-    }
-    
-    base_price = base_prices.get(use_type, 250000)
+    base_price = BASE_PRICES.get(use_type, 250000)
     # Add some variation (±20%)
-    price_per_m2 = base_price * random.uniform(0.8, 1.2)
-    
+    price_per_m2 = base_price * rng.uniform(0.8, 1.2)
+
     estimated_price = int(floor_area * price_per_m2)
-    
+
     # Round to nearest million for large projects
     if estimated_price > 100000000:
         estimated_price = round(estimated_price / 1000000) * 1000000
@@ -191,60 +231,58 @@ def generate_price(floor_area, use_type):
         estimated_price = round(estimated_price / 100000) * 100000
     else:
         estimated_price = round(estimated_price / 10000) * 10000
-    
+
     return estimated_price
 
-def generate_dates():
+
+def generate_dates(rng, start_date, span_days):
     """Generate bid date and notice date"""
-    today = datetime.now()
-    # Bid date: from 1 month ago to 4 months in the future
-    start_date = today - timedelta(days=30)
-    end_date = today + timedelta(days=120)
-    
-    bid_date = start_date + timedelta(days=random.randint(0, 150))
-    
+    bid_date = start_date + timedelta(days=rng.randint(0, span_days))
+
     # Notice date: 2-4 weeks before bid date
-    notice_days_before = random.randint(14, 28)
+    notice_days_before = rng.randint(14, 28)
     notice_date = bid_date - timedelta(days=notice_days_before)
-    
+
     return bid_date, notice_date
 
-def generate_single_tender(index):
+
+def generate_single_tender(rng, index, start_date, span_days, last_seen_at):
     """Generate a single tender record"""
     # Select random location
-    prefecture = random.choice(list(PREFECTURES.keys()))
-    municipality = random.choice(PREFECTURES[prefecture])
-    
+    prefecture = rng.choice(PREFECTURE_NAMES)
+    municipality = rng.choice(PREFECTURES[prefecture])
+
     # Select use type and method
-    use_type = random.choice(USE_TYPES)
-    method = random.choice(METHODS)
-    
+    use_type = rng.choice(USE_TYPES)
+    method = rng.choice(METHODS)
+
     # Generate dates
-    bid_date, notice_date = generate_dates()
-    
+    bid_date, notice_date = generate_dates(rng, start_date, span_days)
+
     # Generate other attributes
-    floor_area = generate_floor_area()
-    estimated_price = generate_price(floor_area, use_type)
-    
+    floor_area = generate_floor_area(rng)
+    estimated_price = generate_price(rng, floor_area, use_type)
+
     # Generate minimum price (70-85% of estimated price)
-    min_price_ratio = random.uniform(0.70, 0.85)
+    min_price_ratio = rng.uniform(0.70, 0.85)
     minimum_price = int(estimated_price * min_price_ratio)
-    
+
     # Generate publisher
-    publisher_pattern = random.choice(PUBLISHER_PATTERNS)
+    publisher_pattern = rng.choice(PUBLISHER_PATTERNS)
     if '市' in municipality or '区' in municipality:
         publisher = publisher_pattern.format(municipality)
     else:
         publisher = publisher_pattern.format(prefecture)
-    
+
     # JV allowed (more likely for large projects)
-    jv_allowed = random.random() < 0.3 if floor_area > 10000 else random.random() < 0.1
-    
-    tender = {
-        'tender_id': generate_tender_id(index, bid_date),
+    jv_allowed = rng.random() < 0.3 if floor_area > 10000 else rng.random() < 0.1
+
+    tender_id = generate_tender_id(index, bid_date)
+    return {
+        'tender_id': tender_id,
         'source': 'KKJ',
         'publisher': publisher,
-        'title': generate_tender_title(prefecture, municipality, use_type),
+        'title': generate_tender_title(rng, municipality, use_type),
         'prefecture': prefecture,
         'municipality': municipality,
         'address_text': f"{prefecture}{municipality}",
@@ -252,51 +290,199 @@ def generate_single_tender(index):
         'method': method,
         'jv_allowed': jv_allowed,
         'floor_area_m2': floor_area,
-        'bid_date': bid_date.strftime('%Y-%m-%d'),
-        'notice_date': notice_date.strftime('%Y-%m-%d'),
+        'bid_date': format_date(bid_date),
+        'notice_date': format_date(notice_date),
         'estimated_price_jpy': estimated_price,
         'minimum_price_jpy': minimum_price,
-        'origin_url': f"https://www.kkj.go.jp/tenders/{generate_tender_id(index, bid_date)}",
-        'last_seen_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        'origin_url': f"https://www.kkj.go.jp/tenders/{tender_id}",
+        'last_seen_at': last_seen_at
     }
-    
-    return tender
+
+
+def partition_seed(seed, partition_no):
+    """Seed for one partition (stable across runs and Python versions)"""
+    return int(hashlib.sha256(f"{seed}:{partition_no}".encode()).hexdigest()[:16], 16)
+
+
+def iter_partition(task):
+    """Yield the tender records of one partition"""
+    partition_no, first_index, count, seed, start_date, span_days, last_seen_at = task
+    rng = random.Random(partition_seed(seed, partition_no))
+    for index in range(first_index, first_index + count):
+        yield generate_single_tender(rng, index, start_date, span_days, last_seen_at)
+
+
+def _new_stats():
+    return {
+        'records': 0, 'min_date': None, 'max_date': None,
+        'prefectures': set(), 'uses': set(),
+        'floor_area_sum': 0.0, 'price_sum': 0
+    }
+
+
+def _add_stats(stats, tender):
+    stats['records'] += 1
+    bid_date = tender['bid_date']
+    if stats['min_date'] is None or bid_date < stats['min_date']:
+        stats['min_date'] = bid_date
+    if stats['max_date'] is None or bid_date > stats['max_date']:
+        stats['max_date'] = bid_date
+    stats['prefectures'].add(tender['prefecture'])
+    stats['uses'].add(tender['use'])
+    stats['floor_area_sum'] += tender['floor_area_m2']
+    stats['price_sum'] += tender['estimated_price_jpy']
+
+
+def _merge_stats(total, stats):
+    total['records'] += stats['records']
+    for key, pick in (('min_date', min), ('max_date', max)):
+        values = [v for v in (total[key], stats[key]) if v is not None]
+        total[key] = pick(values) if values else None
+    total['prefectures'] |= stats['prefectures']
+    total['uses'] |= stats['uses']
+    total['floor_area_sum'] += stats['floor_area_sum']
+    total['price_sum'] += stats['price_sum']
+
+
+def write_ndjson_partition(task, path):
+    stats = _new_stats()
+    with open(path, 'w', encoding='utf-8') as f:
+        for tender in iter_partition(task):
+            f.write(json.dumps(tender, ensure_ascii=False))
+            f.write('\n')
+            _add_stats(stats, tender)
+    return stats
+
+
+def write_parquet_partition(task, path, chunk_size=50000):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    stats = _new_stats()
+    writer = None
+    chunk = []
+    try:
+        for tender in iter_partition(task):
+            chunk.append(tender)
+            _add_stats(stats, tender)
+            if len(chunk) >= chunk_size:
+                table = pa.Table.from_pylist(chunk)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                chunk = []
+        if chunk:
+            table = pa.Table.from_pylist(chunk)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer:
+            writer.close()
+    return stats
+
+
+def generate_partition(args):
+    """Worker: generate one partition into its part file"""
+    output_format, path, task = args
+    if output_format == 'parquet':
+        stats = write_parquet_partition(task, path)
+    else:
+        stats = write_ndjson_partition(task, path)
+    return task[0], stats
+
+
+def build_tasks(records, partition_size, seed, start_date, span_days, last_seen_at):
+    tasks = []
+    for partition_no, first_index in enumerate(range(0, records, partition_size)):
+        count = min(partition_size, records - first_index)
+        tasks.append((partition_no, first_index, count, seed, start_date, span_days, last_seen_at))
+    return tasks
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
 
 def main():
     """Main function to generate all tender data"""
-    print(f"Generating {TOTAL_RECORDS:,} tender records...")
-    
-    tenders = []
-    
-    # Generate records with progress updates
-    for i in range(TOTAL_RECORDS):
-        if i % 10000 == 0:
-            print(f"Progress: {i:,}/{TOTAL_RECORDS:,} ({i*100/TOTAL_RECORDS:.1f}%)")
-        
-        tender = generate_single_tender(i)
-        tenders.append(tender)
-    
-    # Sort by bid_date (most recent first)
-    tenders.sort(key=lambda x: x['bid_date'], reverse=True)
-    
-    # Save to JSON file
-    print(f"Saving to {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(tenders, f, ensure_ascii=False, indent=2)
-    
-    print(f"Successfully generated {TOTAL_RECORDS:,} tender records!")
-    
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Generate synthetic tender data")
+    parser.add_argument('--records', type=int, default=DEFAULT_RECORDS, help="Number of tender records")
+    parser.add_argument('--output', required=True,
+                        help="Output file (ndjson) or directory of part files (parquet)")
+    parser.add_argument('--format', choices=['ndjson', 'parquet'], default='ndjson')
+    parser.add_argument('--start-date', type=parse_date, default=today - timedelta(days=30),
+                        help="First bid date (YYYY-MM-DD, default: 30 days ago)")
+    parser.add_argument('--end-date', type=parse_date, default=today + timedelta(days=120),
+                        help="Last bid date (YYYY-MM-DD, default: 120 days ahead)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Base random seed")
+    parser.add_argument('--partition-size', type=int, default=DEFAULT_PARTITION_SIZE,
+                        help="Records per partition (changing it changes the generated data)")
+    args = parser.parse_args()
+
+    if args.records <= 0:
+        parser.error("--records must be positive")
+    if args.partition_size <= 0:
+        parser.error("--partition-size must be positive")
+    if args.end_date < args.start_date:
+        parser.error("--end-date must not be before --start-date")
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet requires pyarrow (pip install pyarrow)")
+
+    span_days = (args.end_date - args.start_date).days
+    last_seen_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    tasks = build_tasks(args.records, args.partition_size, args.seed,
+                        args.start_date, span_days, last_seen_at)
+
+    print(f"Generating {args.records:,} tender records "
+          f"({len(tasks)} partitions, {args.workers} workers, seed={args.seed})...")
+    start_time = time.time()
+
+    if args.format == 'parquet':
+        os.makedirs(args.output, exist_ok=True)
+        part_dir = args.output
+        part_paths = [os.path.join(part_dir, f"part-{t[0]:05d}.parquet") for t in tasks]
+    else:
+        output_dir = os.path.dirname(os.path.abspath(args.output))
+        os.makedirs(output_dir, exist_ok=True)
+        part_dir = tempfile.mkdtemp(prefix='tender_parts_', dir=output_dir)
+        part_paths = [os.path.join(part_dir, f"part-{t[0]:05d}.ndjson") for t in tasks]
+
+    total = _new_stats()
+    try:
+        jobs = [(args.format, path, task) for path, task in zip(part_paths, tasks)]
+        with Pool(processes=max(1, args.workers)) as pool:
+            for done, (_, stats) in enumerate(pool.imap_unordered(generate_partition, jobs), start=1):
+                _merge_stats(total, stats)
+                print(f"Progress: {total['records']:,}/{args.records:,} "
+                      f"({total['records'] * 100 / args.records:.1f}%), {done}/{len(tasks)} partitions")
+
+        if args.format == 'ndjson':
+            # Concatenate part files in partition order
+            print(f"Saving to {args.output}...")
+            with open(args.output, 'wb') as out:
+                for path in part_paths:
+                    with open(path, 'rb') as part:
+                        shutil.copyfileobj(part, out, 1024 * 1024)
+    finally:
+        if args.format == 'ndjson':
+            shutil.rmtree(part_dir, ignore_errors=True)
+
+    elapsed = time.time() - start_time
+    print(f"Successfully generated {total['records']:,} tender records in {elapsed:.1f} seconds "
+          f"({total['records'] / elapsed:,.0f} records/sec)")
+
     # Print some statistics
-    bid_dates = [datetime.strptime(t['bid_date'], '%Y-%m-%d') for t in tenders]
-    min_date = min(bid_dates)
-    max_date = max(bid_dates)
-    
     print(f"\nStatistics:")
-    print(f"  Date range: {min_date.strftime('%Y-%m-%d')} to {max_date.strftime('%Y-%m-%d')}")
-    print(f"  Total prefectures: {len(set(t['prefecture'] for t in tenders))}")
-    print(f"  Total use types: {len(set(t['use'] for t in tenders))}")
-    print(f"  Average floor area: {sum(t['floor_area_m2'] for t in tenders) / len(tenders):.1f} m²")
-    print(f"  Average estimated price: ¥{sum(t['estimated_price_jpy'] for t in tenders) / len(tenders):,.0f}")
+    print(f"  Date range: {total['min_date']} to {total['max_date']}")
+    print(f"  Total prefectures: {len(total['prefectures'])}")
+    print(f"  Total use types: {len(total['uses'])}")
+    print(f"  Average floor area: {total['floor_area_sum'] / total['records']:.1f} m²")
+    print(f"  Average estimated price: ¥{total['price_sum'] / total['records']:,.0f}")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()